@@ -3,10 +3,26 @@
 import os
 import asyncio
 import json
+import time
 import traceback
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 
 from openai import AsyncOpenAI
+
+import resilience
+import single_flight
+import supabase_rpc
+from config import env_flag
+from embedding_cache import embedding_cache
+from intent_classifier import INTENT_CLASSIFIER_MIN_CONFIDENCE, classify_intent, intent_stats
+from filter_extractor import FILTER_EXTRACTOR_MIN_CONFIDENCE, extract_filters_locally, filter_stats
+from listing_index import listing_index
+from pdf_prefetch import pdf_prefetcher
+from response_cache import response_cache
+from openai_scheduler import PRIORITY_CLASSIFIER, chat_completion, create_embedding, current_client, openai_slot
+from stage_timings import record_stage
+from text_utils import normalize_query
+
 try:
     from supabase import create_client, Client
     SUPABASE_AVAILABLE = True
@@ -22,7 +38,8 @@ SB_ANON_KEY = os.getenv("SUPABASE_KEY")
 if not all([OAI_KEY, SB_URL, SB_ANON_KEY]):
     raise RuntimeError("Eksik API anahtarı veya Supabase bilgisi (URL ve KEY).")
 
-openai_client = AsyncOpenAI(api_key=OAI_KEY)
+# Yeniden denemeler resilience katmanında yapılır; SDK'nın kendi denemeleri kapatılır
+openai_client = AsyncOpenAI(api_key=OAI_KEY, max_retries=0)
 supabase: Optional[Client] = None
 if SUPABASE_AVAILABLE:
     supabase = create_client(SB_URL, SB_ANON_KEY)
@@ -32,6 +49,23 @@ EMBEDDING_MODEL = "text-embedding-3-small"
 MATCH_THRESHOLD = 0.4
 MATCH_COUNT = 25
 
+# Gayrimenkul modunda sınıflandırma, filtre, embedding ve konu çağrılarını aynı anda başlatır.
+# Kapatılırsa (CHAT_SPECULATIVE_FANOUT=0) eski sıralı akış kullanılır.
+SPECULATIVE_FANOUT = env_flag("CHAT_SPECULATIVE_FANOUT", True)
+
+# "router": ilan tespiti, konu ve filtreler tek bir JSON-şema çağrısıyla alınır.
+# "legacy": üç ayrı gpt-4o-mini çağrısı (A/B karşılaştırması için korunuyor).
+CLASSIFIER_MODE = os.getenv("CHAT_CLASSIFIER_MODE", "router").strip().lower()
+
+# Hibrit arama RPC'si httpx ile doğrudan PostgREST'e gider; kapatılırsa supabase-py + to_thread kullanılır.
+SUPABASE_ASYNC_RPC = env_flag("SUPABASE_ASYNC_RPC", True)
+
+# Filtreler önce kural tabanlı çıkarıcıyla denenir; güven düşükse gpt-4o-mini'ye düşülür.
+LOCAL_FILTER_EXTRACTION = env_flag("LOCAL_FILTER_EXTRACTION", True)
+
+# İlan tespiti ve konu önce yerel anahtar kelime sınıflandırıcısıyla denenir; emin değilse LLM'e düşülür.
+LOCAL_INTENT_CLASSIFIER = env_flag("LOCAL_INTENT_CLASSIFIER", True)
+
 # ==============================================================================
 # ==================== PROMPTLAR VE YÖNLENDİRME MESAJLARI ======================
 # ==============================================================================
@@ -95,11 +129,41 @@ REDIRECTION_MESSAGES = {
 # ==================== YARDIMCI FONKSİYONLAR ===============================
 # ==============================================================================
 
+async def _timed(stage: str, coro):
+    """Bir coroutine'i bekler ve süresini aşama metriği olarak kaydeder.
+
+    İptal edilen (kullanılmayan spekülatif) çağrılar ölçüme dahil edilmez.
+    """
+    start = time.perf_counter()
+    result = await coro
+    record_stage(stage, time.perf_counter() - start)
+    return result
+
+def _cancel_pending(*tasks: asyncio.Task) -> None:
+    """Sonucuna ihtiyaç kalmayan spekülatif görevleri iptal eder.
+
+    Paylaşılan (single-flight) embedding çağrısı, onu bekleyen başka istek yoksa OpenAI
+    isteğiyle birlikte iptal edilir.
+    """
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+
 async def get_embedding(text: str) -> Optional[List[float]]:
-    """Metin için OpenAI embedding'i oluşturur."""
+    """Metin için OpenAI embedding'i oluşturur (önbellekte varsa API'ye gitmez)."""
+    cached = await embedding_cache.get(text, EMBEDDING_MODEL)
+    if cached is not None:
+        return cached
+    # Aynı metin için eş zamanlı istekler tek bir API çağrısını paylaşır
+    key = (EMBEDDING_MODEL, normalize_query(text))
+    return await single_flight.group("embedding").do(key, lambda: _create_embedding(text))
+
+async def _create_embedding(text: str) -> Optional[List[float]]:
     try:
-        resp = await openai_client.embeddings.create(model=EMBEDDING_MODEL, input=[text.strip()])
-        return resp.data[0].embedding
+        resp = await create_embedding(openai_client, model=EMBEDDING_MODEL, input=[text.strip()])
+        embedding = resp.data[0].embedding
+        await embedding_cache.set(text, EMBEDDING_MODEL, embedding)
+        return embedding
     except Exception as e:
         print(f"❌ Embedding hatası: {e}")
         return None
@@ -108,7 +172,8 @@ async def detect_topic(question: str) -> str:
     """Kullanıcının sorusunun ana konusunu (topic) tespit eder."""
     print(f"🔎 Konu tespiti başlatıldı: {question[:50]}...")
     try:
-        resp = await openai_client.chat.completions.create(
+        resp = await chat_completion(
+            openai_client, PRIORITY_CLASSIFIER,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "Kullanıcının sorusunu analiz et ve SADECE şu üç kategoriden birini döndür: real-estate, mind-coach, finance. Eğer hiçbiriyle ilgili değilse veya bir selamlama ise 'general' de."},
@@ -126,6 +191,14 @@ async def detect_topic(question: str) -> str:
 async def extract_filters_from_query(question: str) -> Dict:
     """Sorgudan yapısal filtreleri çıkarır (v3 - Daha Akıllı)."""
     print(f"🔍 Akıllı filtre çıkarma işlemi başlatıldı: {question}")
+    if LOCAL_FILTER_EXTRACTION:
+        local_filters, confidence = extract_filters_locally(question)
+        if confidence >= FILTER_EXTRACTOR_MIN_CONFIDENCE:
+            filter_stats.record(True, local_filters)
+            print(f"✅ Kural tabanlı filtreler (güven {confidence:.2f}): {local_filters}")
+            return local_filters
+        filter_stats.record(False, local_filters)
+        print(f"↪️ Kural tabanlı filtre güveni düşük ({confidence:.2f}), LLM'e geçiliyor")
     system_content = """Sen bir emlak arama asistanısın. Kullanıcının sorgusundan SADECE şu filtreleri JSON olarak çıkar: "min_fiyat", "max_fiyat", "oda_sayisi", ve "lokasyon".
 ÖNEMLİ: Türkçe'deki yer bildiren ekleri (-de, -da, -'te, -'ta, -'deki, -'daki) yok sayarak lokasyonun kök/yalın halini çıkar.
 Örnek 1: "kadıköy'de 5 milyona kadar 2+1 daire" -> {"max_fiyat": 5000000, "oda_sayisi": "2+1", "lokasyon": "Kadıköy"}
@@ -133,7 +206,8 @@ async def extract_filters_from_query(question: str) -> Dict:
 Örnek 3: "Bostancı" -> {"lokasyon": "Bostancı"}
 Sadece bulabildiklerini JSON'a ekle. Eğer hiçbir şey bulamazsan boş bir JSON: {} döndür."""
     try:
-        resp = await openai_client.chat.completions.create(
+        resp = await chat_completion(
+            openai_client, PRIORITY_CLASSIFIER,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system_content},
@@ -148,15 +222,39 @@ Sadece bulabildiklerini JSON'a ekle. Eğer hiçbir şey bulamazsan boş bir JSON
         print(f"❌ Filtre çıkarma hatası: {e}")
         return {}
 
-async def hybrid_search_listings(question: str) -> List[Dict]:
-    """Supabase'de HIZLI hibrit arama yapar."""
-    if not supabase: return []
+async def hybrid_search_listings(question: str, filters: Optional[Dict] = None,
+                                 query_embedding: Optional[List[float]] = None) -> List[Dict]:
+    """Supabase'de HIZLI hibrit arama yapar.
+
+    `filters` ve `query_embedding` önceden (paralel olarak) hesaplandıysa tekrar istenmez;
+    eksik olanlar aynı anda hesaplanır.
+    """
+    use_local_index = listing_index.ready
+    use_async_rpc = SUPABASE_ASYNC_RPC and supabase_rpc.rpc_client is not None
+    if not use_local_index and not use_async_rpc and not supabase: return []
+    if not use_local_index and resilience.is_open("supabase"):
+        print("⚠️ Supabase devresi açık, ilan araması atlanıyor (degrade mod)")
+        return []
     
-    filters = await extract_filters_from_query(question)
-    query_embedding = await get_embedding(question)
+    if filters is None and query_embedding is None:
+        filters, query_embedding = await asyncio.gather(
+            _timed("filters", extract_filters_from_query(question)),
+            _timed("embedding", get_embedding(question)),
+        )
+    elif filters is None:
+        filters = await _timed("filters", extract_filters_from_query(question))
+    elif query_embedding is None:
+        query_embedding = await _timed("embedding", get_embedding(question))
     if not query_embedding: return []
         
     try:
+        if use_local_index:
+            search_start = time.perf_counter()
+            listings = listing_index.search(query_embedding, filters, MATCH_THRESHOLD, MATCH_COUNT)
+            record_stage("listing_search", time.perf_counter() - search_start)
+            print(f"✅ Yerel indeks araması tamamlandı. {len(listings)} ilan bulundu.")
+            return listings
+
         print("⚡️ Supabase'de hibrit arama yapılıyor...")
         rpc_params = {
             "query_embedding": query_embedding,
@@ -168,8 +266,13 @@ async def hybrid_search_listings(question: str) -> List[Dict]:
             "p_lokasyon": filters.get("lokasyon")
         }
         rpc_params = {k: v for k, v in rpc_params.items() if v is not None}
-        response = await asyncio.to_thread(supabase.rpc("search_listings_hybrid", rpc_params).execute)
-        listings = response.data if hasattr(response, 'data') and response.data else []
+        search_start = time.perf_counter()
+        if use_async_rpc:
+            listings = await supabase_rpc.rpc_client.rpc("search_listings_hybrid", rpc_params) or []
+        else:
+            response = await asyncio.to_thread(supabase.rpc("search_listings_hybrid", rpc_params).execute)
+            listings = response.data if hasattr(response, 'data') and response.data else []
+        record_stage("listing_search", time.perf_counter() - search_start)
         print(f"✅ Hibrit arama tamamlandı. {len(listings)} ilan bulundu.")
         return listings
     except Exception as e:
@@ -199,7 +302,8 @@ def _format_listings_for_gpt(listings: List[Dict]) -> str:
 async def check_if_property_listing_query(question: str) -> bool:
     """Sorunun ilan araması gerektirip gerektirmediğini tespit eder."""
     try:
-        resp = await openai_client.chat.completions.create(
+        resp = await chat_completion(
+            openai_client, PRIORITY_CLASSIFIER,
             model="gpt-4o-mini",
             messages=[{"role": "system","content": """Kullanıcının sorusunu analiz et ve sadece "Evet" veya "Hayır" yanıtı ver. İLAN ARAMASI GEREKTİREN SORULAR (Evet): "Kadıköy'de satılık daire bul/ara/göster", "20 milyona kadar 3+1 daire arıyorum", "Beşiktaş'ta ev var mı?", "Maltepe'de villa göster/listele". İLAN ARAMASI GEREKTİRMEYEN SORULAR (Hayır): "Ev alırken nelere dikkat etmeliyim?", "Konut kredisi nasıl alınır?". Sadece "Evet" veya "Hayır" yanıtı ver."""},
                       {"role": "user", "content": question}],
@@ -212,13 +316,162 @@ async def check_if_property_listing_query(question: str) -> bool:
         print(f"❌ İlan araması tespiti hatası: {e}")
         return False
 
+ROUTER_SYSTEM_PROMPT = """Sen SibelGPT'nin yönlendirme asistanısın. Kullanıcının sorusunu analiz et ve SADECE istenen JSON'u döndür.
+1. "is_listing": Soru veritabanında ilan araması gerektiriyorsa true, değilse false.
+   İLAN ARAMASI GEREKTİREN SORULAR (true): "Kadıköy'de satılık daire bul/ara/göster", "20 milyona kadar 3+1 daire arıyorum", "Beşiktaş'ta ev var mı?", "Maltepe'de villa göster/listele".
+   İLAN ARAMASI GEREKTİRMEYEN SORULAR (false): "Ev alırken nelere dikkat etmeliyim?", "Konut kredisi nasıl alınır?".
+2. "topic": Sorunun ana konusu; şunlardan biri: real-estate, mind-coach, finance. Hiçbiriyle ilgili değilse veya bir selamlama ise general.
+3. "filters": Sorgudaki ilan filtreleri: "min_fiyat", "max_fiyat", "oda_sayisi", "lokasyon". Bulunamayan alanlar null olmalı.
+   ÖNEMLİ: Türkçe'deki yer bildiren ekleri (-de, -da, -'te, -'ta, -'deki, -'daki) yok sayarak lokasyonun kök/yalın halini çıkar.
+   Örnek: "kadıköy'de 5 milyona kadar 2+1 daire" -> {"min_fiyat": null, "max_fiyat": 5000000, "oda_sayisi": "2+1", "lokasyon": "Kadıköy"}"""
+
+ROUTER_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "query_route",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "is_listing": {"type": "boolean"},
+                "topic": {"type": "string", "enum": ["real-estate", "mind-coach", "finance", "general"]},
+                "filters": {
+                    "type": "object",
+                    "properties": {
+                        "min_fiyat": {"type": ["number", "null"]},
+                        "max_fiyat": {"type": ["number", "null"]},
+                        "oda_sayisi": {"type": ["string", "null"]},
+                        "lokasyon": {"type": ["string", "null"]}
+                    },
+                    "required": ["min_fiyat", "max_fiyat", "oda_sayisi", "lokasyon"],
+                    "additionalProperties": False
+                }
+            },
+            "required": ["is_listing", "topic", "filters"],
+            "additionalProperties": False
+        }
+    }
+}
+
+async def route_query(question: str) -> Dict[str, Any]:
+    """Tek bir gpt-4o-mini çağrısıyla ilan tespiti, konu ve filtreleri döndürür.
+
+    Dönüş: {"is_listing": bool, "topic": str, "filters": dict}. Hata durumunda
+    eski fonksiyonlardaki varsayılanlara (False, "general", {}) düşer.
+    """
+    print(f"🧭 Yönlendirici çağrısı başlatıldı: {question[:50]}...")
+    try:
+        resp = await chat_completion(
+            openai_client, PRIORITY_CLASSIFIER,
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": ROUTER_SYSTEM_PROMPT},
+                {"role": "user", "content": question}
+            ],
+            response_format=ROUTER_RESPONSE_FORMAT, temperature=0.0, max_tokens=200
+        )
+        data = json.loads(resp.choices[0].message.content)
+        topic = data.get("topic")
+        route = {
+            "is_listing": bool(data.get("is_listing")),
+            "topic": topic if topic in ["real-estate", "mind-coach", "finance", "general"] else "general",
+            "filters": {k: v for k, v in (data.get("filters") or {}).items() if v is not None}
+        }
+        print(f"✅ Yönlendirici sonucu: {route}")
+        return route
+    except Exception as e:
+        print(f"❌ Yönlendirici hatası: {e}")
+        return {"is_listing": False, "topic": "general", "filters": {}}
+
+def _record_intent(intent: Optional[Dict[str, Any]]) -> None:
+    """İstek başına tek sayım: LLM'e hiç düşülmediyse yerel karar sayılır."""
+    if intent is not None:
+        intent_stats.record(not intent.get("llm_fallback"))
+
+async def _resolve_topic(question: str, intent: Optional[Dict[str, Any]] = None) -> str:
+    """Konuyu önce yerel sınıflandırıcı sonucuyla, emin değilse detect_topic (LLM) ile belirler."""
+    if intent is not None:
+        if intent["topic_confidence"] >= INTENT_CLASSIFIER_MIN_CONFIDENCE:
+            print(f"⚡ Yerel konu tespiti: {intent['topic']}")
+            return intent["topic"]
+        intent["llm_fallback"] = True
+    return await _timed("topic", detect_topic(question))
+
+async def _run_real_estate_precalls(question: str, intent: Optional[Dict[str, Any]] = None) -> Tuple[bool, Optional[str], Optional[List[Dict]]]:
+    """Gayrimenkul modundaki ön çağrıları yürütür ve (ilan_mı, konu, ilanlar) döndürür.
+
+    `intent` yerel sınıflandırıcı sonucudur (kapalıysa None). Konu veya ilanlar henüz
+    hesaplanmadıysa None döner; çağıran taraf gerekirse tamamlar.
+    """
+    if intent is not None:
+        if intent["listing_confidence"] >= INTENT_CLASSIFIER_MIN_CONFIDENCE:
+            print(f"⚡ Yerel sınıflandırıcı kararı: {intent}")
+            topic = intent["topic"] if intent["topic_confidence"] >= INTENT_CLASSIFIER_MIN_CONFIDENCE else None
+            if intent["is_listing"]:
+                return True, topic, await hybrid_search_listings(question)
+            return False, topic, None
+        intent["llm_fallback"] = True
+
+    if CLASSIFIER_MODE == "router":
+        embedding_task = asyncio.create_task(_timed("embedding", get_embedding(question))) if SPECULATIVE_FANOUT else None
+        try:
+            route = await _timed("router", route_query(question))
+            if not route["is_listing"]:
+                return False, route["topic"], None
+            query_embedding = await embedding_task if embedding_task else None
+            listings = await hybrid_search_listings(question, filters=route["filters"], query_embedding=query_embedding)
+            return True, route["topic"], listings
+        finally:
+            if embedding_task:
+                _cancel_pending(embedding_task)
+
+    if not SPECULATIVE_FANOUT:
+        return await _timed("is_listing", check_if_property_listing_query(question)), None, None
+
+    # Spekülatif modda ilan tespiti, filtre çıkarma, embedding ve konu tespiti aynı anda
+    # başlatılır; ilan tespitinin sonucuna göre gereksiz kalan görevler iptal edilir.
+    listing_task = asyncio.create_task(_timed("is_listing", check_if_property_listing_query(question)))
+    filters_task = asyncio.create_task(_timed("filters", extract_filters_from_query(question)))
+    embedding_task = asyncio.create_task(_timed("embedding", get_embedding(question)))
+    topic_task = asyncio.create_task(_timed("topic", detect_topic(question)))
+    try:
+        if await listing_task:
+            _cancel_pending(topic_task)
+            filters, query_embedding = await asyncio.gather(filters_task, embedding_task)
+            listings = await hybrid_search_listings(question, filters=filters, query_embedding=query_embedding)
+            return True, None, listings
+        _cancel_pending(filters_task, embedding_task)
+        return False, await topic_task, None
+    finally:
+        _cancel_pending(listing_task, filters_task, embedding_task, topic_task)
+
 # ==============================================================================
 # ================= ANA SORGULAMA FONKSİYONU (v13 - AKILLI) ====================
 # ==============================================================================
 
-async def answer_question(question: str, mode: str = "real-estate", conversation_history: List = None) -> Dict[str, Any]:
+LISTING_ERROR_REPLY = "<p>🔍 Üzgünüm, belirttiğiniz kriterlere uygun bir ilan bulamadım. Lütfen arama kriterlerinizi değiştirerek tekrar deneyin.</p>"
+GENERAL_ERROR_REPLY = "Üzgünüm, bu soruya cevap verirken bir sorun oluştu."
+
+def _completion_kwargs(messages: List[Dict]) -> Dict[str, Any]:
+    return {"model": "gpt-4o", "messages": messages, "temperature": 0.5, "max_tokens": 2048}
+
+async def _prepare_answer(question: str, mode: str, conversation_history: Optional[List]) -> Dict[str, Any]:
+    """Adım 1-3'ü yürütür ve son gpt-4o çağrısı için bir plan döndürür.
+
+    Plan anahtarları: "response" (reply/is_listing_response), "messages" (None ise yanıt
+    hazırdır: selamlama, önbellek veya yönlendirme), "cache_embedding", "error_reply",
+    "error_label" ve "metadata". `answer_question` ile `stream_answer_question` aynı planı kullanır.
+    """
     print(f"🚀 AKILLI SORGULAMA SİSTEMİ (v13) BAŞLADI - Soru: {question[:50]}..., Mod: {mode}")
     response_data = {"reply": "", "is_listing_response": False}
+    plan: Dict[str, Any] = {
+        "response": response_data,
+        "messages": None,
+        "cache_embedding": None,
+        "error_reply": GENERAL_ERROR_REPLY,
+        "error_label": "Genel GPT yanıt hatası",
+        "metadata": {"mode": mode, "cached": False},
+    }
     
     # Adım 1: Hızlı Selamlama Kontrolü
     selamlasma_kaliplari = ["merhaba", "selam", "hello", "hi", "günaydın", "iyi günler", "iyi akşamlar", "nasılsın", "naber"]
@@ -229,15 +482,42 @@ async def answer_question(question: str, mode: str = "real-estate", conversation
             "finance": "Merhaba! Size finans ve yatırım konularında nasıl yardımcı olabilirim?"
         }
         response_data["reply"] = greeting_responses.get(mode, "Merhaba, size nasıl yardımcı olabilirim?")
-        return response_data
+        return plan
+
+    # Adım 1.5: Anlamsal Yanıt Önbelleği (isteğe bağlı; sohbet geçmişi varsa yanıt bağlama bağlı olduğu için atlanır)
+    if response_cache.enabled and not conversation_history:
+        plan["cache_embedding"] = await _timed("embedding", get_embedding(question))
+        cached_response = response_cache.lookup(mode, plan["cache_embedding"])
+        if cached_response is not None:
+            plan["response"] = cached_response
+            plan["metadata"]["cached"] = True
+            return plan
 
     # Adım 2: Akıllı İlan Arama Mantığı (Sadece Gayrimenkul Modunda)
-    if mode == 'real-estate' and await check_if_property_listing_query(question):
+    detected_topic: Optional[str] = None
+    is_listing_query = False
+    listings: Optional[List[Dict]] = None
+    # Yerel sınıflandırma istek başına bir kez yapılır; ilan ve konu kararları aynı sonucu kullanır
+    intent = classify_intent(question) if LOCAL_INTENT_CLASSIFIER else None
+    if mode == 'real-estate':
+        is_listing_query, detected_topic, listings = await _run_real_estate_precalls(question, intent)
+
+    if is_listing_query:
+        _record_intent(intent)
         print("🏠 İlan araması tespit edildi. Akıllı yanıtlama süreci başlatılıyor...")
         response_data["is_listing_response"] = True
         
-        listings = await hybrid_search_listings(question)
+        if listings is None:
+            listings = await hybrid_search_listings(question)
         listings_summary = _format_listings_for_gpt(listings)
+        if not listings and not listing_index.ready and resilience.is_open("supabase"):
+            # Degrade mod: veritabanına ulaşılamıyor, "ilan yok" demek yanıltıcı olur
+            listings_summary = "İlan veritabanına şu anda ulaşılamıyor. Kullanıcıya aramanın geçici olarak yapılamadığını, kriterlerini not aldığını ve kısa süre sonra tekrar denemesini söyle."
+            plan["metadata"]["degraded"] = "listing_search"
+        plan["metadata"]["listing_count"] = len(listings)
+        # Kullanıcının en olası PDF tıklamaları için ilk ilanların PDF'leri arka planda hazırlanır;
+        # aynı istemcinin önceki turundan kalan ve artık listede olmayan işler iptal edilir
+        pdf_prefetcher.enqueue_listings(listings, owner=current_client.get())
         
         system_prompt = SYSTEM_PROMPTS["real-estate"]
         
@@ -253,57 +533,106 @@ Veritabanı aramam sonucunda şu ilan özetlerini buldum (eğer 'İlan bulunamad
 - Eğer ilan bulunamadıysa, kullanıcıya kibarca durumu bildir ve arama kriterlerini değiştirmesi için nazikçe önerilerde bulun.
 Cevabın tamamı akıcı bir metin ve/veya HTML formatında olmalı."""
 
-        try:
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": new_user_content}
-            ]
-            resp = await openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                temperature=0.5,
-                max_tokens=2048
-            )
-            response_data["reply"] = resp.choices[0].message.content.strip()
-            return response_data
-        except Exception as e:
-            print(f"❌ İlan yanıtlama GPT hatası: {e}")
-            response_data["reply"] = "<p>🔍 Üzgünüm, belirttiğiniz kriterlere uygun bir ilan bulamadım. Lütfen arama kriterlerinizi değiştirerek tekrar deneyin.</p>"
-            return response_data
+        plan["messages"] = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": new_user_content}
+        ]
+        plan["error_reply"] = LISTING_ERROR_REPLY
+        plan["error_label"] = "İlan yanıtlama GPT hatası"
+        return plan
 
 
     # Adım 3: Konu Tespiti ve Yönlendirme (İlan araması değilse)
-    detected_topic = await detect_topic(question)
+    if detected_topic is None:
+        detected_topic = await _resolve_topic(question, intent)
+    _record_intent(intent)
     if detected_topic != "general" and detected_topic != mode:
         redirection_key = f"{mode}-to-{detected_topic}"
         if redirection_key in REDIRECTION_MESSAGES:
             print(f"↪️ Yönlendirme yapılıyor: {mode} -> {detected_topic}")
             response_data["reply"] = REDIRECTION_MESSAGES[redirection_key]
-            return response_data
+            plan["metadata"]["redirected_to"] = detected_topic
+            return plan
 
-    # Adım 4: Uzman GPT Yanıtı (Genel Bilgi Soruları)
+    # Adım 4 hazırlığı: Uzman GPT Yanıtı (Genel Bilgi Soruları)
     print(f"📚 Uzman GPT yanıtı oluşturuluyor. Mod: {mode}")
-    try:
-        system_prompt = SYSTEM_PROMPTS.get(mode, "Sen genel bir yardımcı asistansın.")
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        if conversation_history:
-            clean_history = [{"role": msg.get("role"), "content": msg.get("text")} for msg in conversation_history[-5:] if msg.get("role") and msg.get("text")]
-            messages.extend(clean_history)
-        
-        messages.append({"role": "user", "content": question})
+    system_prompt = SYSTEM_PROMPTS.get(mode, "Sen genel bir yardımcı asistansın.")
+    messages = [{"role": "system", "content": system_prompt}]
+    
+    if conversation_history:
+        clean_history = [{"role": msg.get("role"), "content": msg.get("text")} for msg in conversation_history[-5:] if msg.get("role") and msg.get("text")]
+        messages.extend(clean_history)
+    
+    messages.append({"role": "user", "content": question})
+    plan["messages"] = messages
+    return plan
 
-        resp = await openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            temperature=0.5,
-            max_tokens=2048
-        )
-        response_data["reply"] = resp.choices[0].message.content.strip()
+async def answer_question(question: str, mode: str = "real-estate", conversation_history: List = None) -> Dict[str, Any]:
+    plan = await _prepare_answer(question, mode, conversation_history)
+    response_data = plan["response"]
+    if plan["messages"] is None:
+        return response_data
 
+    # Adım 4: gpt-4o ile nihai yanıt
+    try:
+        resp = await _timed("completion", chat_completion(openai_client, **_completion_kwargs(plan["messages"])))
+        response_data["reply"] = resp.choices[0].message.content.strip()
+        response_cache.store(mode, plan["cache_embedding"], response_data)
     except Exception as e:
-        print(f"❌ Genel GPT yanıt hatası: {e}")
+        print(f"❌ {plan['error_label']}: {e}")
         traceback.print_exc()
-        response_data["reply"] = "Üzgünüm, bu soruya cevap verirken bir sorun oluştu."
+        response_data["reply"] = plan["error_reply"]
 
     return response_data
+
+async def stream_answer_question(question: str, mode: str = "real-estate",
+                                 conversation_history: List = None) -> AsyncIterator[Dict[str, Any]]:
+    """`answer_question` ile aynı akışı yürütür, gpt-4o yanıtını parça parça üretir.
+
+    Olaylar: {"event": "delta", "data": {"content": ...}} ve en sonda
+    {"event": "done", "data": {"reply", "is_listing_response", "metadata"}}.
+    """
+    request_start = time.perf_counter()
+    plan = await _prepare_answer(question, mode, conversation_history)
+    response_data = plan["response"]
+
+    if plan["messages"] is None:
+        yield {"event": "delta", "data": {"content": response_data["reply"]}}
+    else:
+        parts: List[str] = []
+        try:
+            completion_start = time.perf_counter()
+            request = _completion_kwargs(plan["messages"])
+            # Akış bitene kadar zamanlayıcıdaki yer tutulur
+            async with openai_slot(request):
+                stream = await resilience.call("openai", lambda: openai_client.chat.completions.create(**request, stream=True))
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if not delta:
+                        continue
+                    if not parts:
+                        record_stage("first_token", time.perf_counter() - request_start)
+                    parts.append(delta)
+                    yield {"event": "delta", "data": {"content": delta}}
+            record_stage("completion", time.perf_counter() - completion_start)
+            response_data["reply"] = "".join(parts).strip()
+            response_cache.store(mode, plan["cache_embedding"], response_data)
+        except Exception as e:
+            print(f"❌ {plan['error_label']} (stream): {e}")
+            traceback.print_exc()
+            if parts:
+                # Kısmi yanıt gönderildi; istemciye akışın yarıda kesildiğini bildir.
+                response_data["reply"] = "".join(parts).strip()
+                plan["metadata"]["interrupted"] = True
+            else:
+                response_data["reply"] = plan["error_reply"]
+                yield {"event": "delta", "data": {"content": plan["error_reply"]}}
+
+    yield {
+        "event": "done",
+        "data": {
+            "reply": response_data["reply"],
+            "is_listing_response": response_data["is_listing_response"],
+            "metadata": plan["metadata"],
+        },
+    }
@@ -0,0 +1,150 @@
+# branding_assets.py - PDF marka görsellerinin (Sibel Hanım fotoğrafı, REMAX logosu) bellek içi önbelleği
+import io
+import os
+import time
+import asyncio
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+import resilience
+from http_clients import get_client
+from single_flight import SingleFlight
+
+# ---- Ayarlar ----
+# Yerel kopyalar (dosya adı URL'deki adla aynı) varsa ağa hiç çıkılmaz
+BRANDING_ASSET_DIR = os.getenv("BRANDING_ASSET_DIR", "./assets/branding")
+# İndirilen görseller bu süreden eski olunca arka planda yenilenir (eski kopya kullanılmaya devam eder)
+BRANDING_REFRESH_INTERVAL = int(os.getenv("BRANDING_REFRESH_INTERVAL", str(24 * 3600)))
+# PDF'te çizim boyutunun kaç katı piksele ölçekleneceği (baskı kalitesi / boyut dengesi)
+BRANDING_ASSET_SCALE = int(os.getenv("BRANDING_ASSET_SCALE", "3"))
+# Hiç yüklenemeyen görsel için bu süre boyunca tekrar denenmez (PDF'ler görselsiz, beklemeden üretilir)
+BRANDING_RETRY_AFTER = int(os.getenv("BRANDING_RETRY_AFTER", "60"))
+
+# ad -> (URL, PDF'teki çizim boyutu (genişlik, yükseklik) punto)
+BRANDING_ASSETS: Dict[str, Tuple[str, Tuple[int, int]]] = {
+    "photo": ("https://www.sibelgpt.com/sibel-kazan-midilli.jpg", (52, 70)),
+    "logo": ("https://www.sibelgpt.com/remax-logo.png", (75, 50)),
+}
+
+class BrandingAsset:
+    """Ölçeklenmiş PNG baytları (render havuzuna olduğu gibi, pickle edilebilir şekilde verilir)."""
+
+    def __init__(self, name: str, data: bytes, source: str, loaded_at: float):
+        self.name = name
+        self.data = data
+        self.source = source  # "file" veya "url"
+        self.loaded_at = loaded_at
+
+def prepare_image(raw: bytes, size: Tuple[int, int], scale: int = BRANDING_ASSET_SCALE) -> bytes:
+    """Görseli bir kez çözer, çizim boyutunun `scale` katına küçültür ve PNG olarak döndürür."""
+    with Image.open(io.BytesIO(raw)) as image:
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        image.thumbnail((size[0] * scale, size[1] * scale), Image.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, format="PNG", optimize=True)
+        return out.getvalue()
+
+async def _download(url: str) -> bytes:
+    async def fetch():
+        return resilience.check_status(await get_client("assets").get(url))
+
+    response = await resilience.call("assets", fetch)
+    response.raise_for_status()
+    return response.content
+
+class BrandingAssetCache:
+    """Marka görsellerini bir kez yükler; PDF üretimi ağ beklemeden bellekten çizer.
+
+    Yerel dosya (BRANDING_ASSET_DIR) varsa o kullanılır. Yoksa görsel indirilir ve
+    `refresh_interval` sonunda arka planda yenilenir; yenileme başarısız olursa eski
+    kopya kullanılmaya devam eder. Hiç yüklenemeyen görsel PDF'te atlanır.
+    """
+
+    def __init__(self, assets: Dict[str, Tuple[str, Tuple[int, int]]] = BRANDING_ASSETS,
+                 directory: str = BRANDING_ASSET_DIR, refresh_interval: int = BRANDING_REFRESH_INTERVAL,
+                 retry_after: int = BRANDING_RETRY_AFTER,
+                 downloader: Callable[[str], Awaitable[bytes]] = _download,
+                 clock: Callable[[], float] = time.monotonic):
+        self._assets = assets
+        self._directory = Path(directory) if directory else None
+        self.refresh_interval = refresh_interval
+        self.retry_after = retry_after
+        self._download = downloader
+        self._clock = clock
+        self._cache: Dict[str, BrandingAsset] = {}
+        self._flight = SingleFlight("branding_assets")
+        self._refresh_tasks: Dict[str, asyncio.Task] = {}
+        self._failed_at: Dict[str, float] = {}
+        self._preload_task: Optional[asyncio.Task] = None
+        self.stats = {"loads": 0, "refreshes": 0, "failures": 0}
+
+    def _local_file(self, url: str) -> Optional[Path]:
+        if self._directory is None:
+            return None
+        path = self._directory / url.rsplit("/", 1)[-1]
+        return path if path.is_file() else None
+
+    def _prepare_local(self, url: str, size: Tuple[int, int]) -> Optional[bytes]:
+        """Yerel kopya varsa okuyup hazırlar; dosya G/Ç'si ve çözme iş parçacığında yapılır."""
+        path = self._local_file(url)
+        return prepare_image(path.read_bytes(), size) if path is not None else None
+
+    async def _load(self, name: str) -> Optional[BrandingAsset]:
+        url, size = self._assets[name]
+        try:
+            data, source = await asyncio.to_thread(self._prepare_local, url, size), "file"
+            if data is None:
+                raw, source = await self._download(url), "url"
+                data = await asyncio.to_thread(prepare_image, raw, size)
+        except Exception as e:
+            self.stats["failures"] += 1
+            self._failed_at[name] = self._clock()
+            print(f"⚠️ Marka görseli yüklenemedi ({name}): {e}")
+            return self._cache.get(name)
+        asset = self._cache[name] = BrandingAsset(name, data, source, self._clock())
+        self.stats["loads"] += 1
+        return asset
+
+    def _is_stale(self, asset: BrandingAsset) -> bool:
+        return asset.source == "url" and self._clock() - asset.loaded_at >= self.refresh_interval
+
+    def _refresh_in_background(self, name: str) -> None:
+        task = self._refresh_tasks.get(name)
+        failed_at = self._failed_at.get(name)
+        if failed_at is not None and self._clock() - failed_at < self.retry_after:
+            return
+        if task is None or task.done():
+            self.stats["refreshes"] += 1
+            self._refresh_tasks[name] = asyncio.ensure_future(self._flight.do(name, lambda: self._load(name)))
+
+    async def get(self, name: str) -> Optional[BrandingAsset]:
+        asset = self._cache.get(name)
+        if asset is None:
+            failed_at = self._failed_at.get(name)
+            if failed_at is not None and self._clock() - failed_at < self.retry_after:
+                return None
+            # İlk kullanım: eş zamanlı PDF'ler tek bir indirmeyi bekler
+            return await self._flight.do(name, lambda: self._load(name))
+        if self._is_stale(asset):
+            self._refresh_in_background(name)
+        return asset
+
+    async def snapshot(self) -> Dict[str, BrandingAsset]:
+        """Yüklenebilen tüm görseller (PDF render'ına verilir)."""
+        loaded = await asyncio.gather(*(self.get(name) for name in self._assets))
+        return {asset.name: asset for asset in loaded if asset is not None}
+
+    async def preload(self) -> None:
+        await self.snapshot()
+        print(f"🖼️ Marka görselleri hazır: {', '.join(f'{n} ({a.source})' for n, a in self._cache.items()) or 'yok'}")
+
+    def preload_in_background(self) -> None:
+        """Startup olayında çağrılır; ilk PDF'ten önce görseller hazır olur."""
+        self._preload_task = asyncio.ensure_future(self.preload())
+
+    def summary(self) -> Dict[str, object]:
+        return {**self.stats, "loaded": {name: asset.source for name, asset in self._cache.items()}}
+
+branding_assets = BrandingAssetCache()
@@ -0,0 +1,12 @@
+# config.py - Ortam değişkenlerinden ortak ayar okuma yardımcıları
+import os
+
+_TRUE_VALUES = ("1", "true", "yes", "on")
+
+def env_flag(name: str, default: bool) -> bool:
+    """Açık/kapalı ayarı okur: 1/true/yes/on (büyük-küçük harf fark etmez) açık, diğer değerler kapalı.
+    Değişken tanımlı değilse `default` döner."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in _TRUE_VALUES
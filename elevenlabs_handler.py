@@ -1,10 +1,18 @@
 # elevenlabs_handler.py
 import os
+import asyncio
+from collections import deque
+from typing import Deque, List, Optional
+
 import httpx
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import io
+
+from http_clients import get_client
+from text_utils import strip_html
+from tts_cache import audio_key, split_sentences, tts_cache
+import resilience
 
 router = APIRouter()
 
@@ -12,6 +20,18 @@ router = APIRouter()
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 ELEVENLABS_VOICE_ID = "EJGs6dWlD5VrB3llhBqB"  # Sibel Hanım'ın klonlanmış ses ID'si
 ELEVENLABS_API_URL = "https://api.elevenlabs.io/v1/text-to-speech"
+ELEVENLABS_MODEL_ID = "eleven_multilingual_v2"
+# İstemciye iletilen ses parçalarının en büyük boyutu (istek başına bellek kullanımını sınırlar)
+ELEVENLABS_STREAM_CHUNK_SIZE = int(os.getenv("ELEVENLABS_STREAM_CHUNK_SIZE", "16384"))
+# Cümle hattı (pipeline): bu uzunluktaki metinler cümlelere bölünüp eş zamanlı seslendirilir
+TTS_PIPELINE_MIN_CHARS = int(os.getenv("TTS_PIPELINE_MIN_CHARS", "300"))
+# Çalınan cümlenin yanında önceden üretilen en fazla cümle sayısı (istek başına)
+TTS_PIPELINE_CONCURRENCY = int(os.getenv("TTS_PIPELINE_CONCURRENCY", "3"))
+# Tüm istekler genelinde ElevenLabs'e aynı anda açık en fazla bağlantı (plan eşzamanlılık sınırı);
+# istek başına cümle hattı pencereleri bu ortak sınırı paylaşır
+ELEVENLABS_MAX_CONCURRENCY = int(os.getenv("ELEVENLABS_MAX_CONCURRENCY", "4"))
+
+_upstream_slots: Optional[asyncio.Semaphore] = None  # olay döngüsü içinde oluşturulur
 
 class SpeechRequest(BaseModel):
     text: str
@@ -19,16 +39,66 @@ class SpeechRequest(BaseModel):
         "stability": 0.75,
         "similarity_boost": 0.85
     }
+    # None: metin TTS_PIPELINE_MIN_CHARS'tan uzunsa cümle hattı kullanılır
+    pipeline: Optional[bool] = None
 
-@router.post("/generate-speech")
-async def generate_speech(request: SpeechRequest):
-    """Metni sese dönüştürür"""
-    
-    if not ELEVENLABS_API_KEY:
-        raise HTTPException(status_code=500, detail="ElevenLabs API key bulunamadı")
-    
-    # API endpoint
-    url = f"{ELEVENLABS_API_URL}/{ELEVENLABS_VOICE_ID}"
+async def _open_stream(url: str, payload: dict, headers: dict) -> httpx.Response:
+    """Streaming isteğini açar; gövde okunmadan önce durum kodu kontrol edilir (hata varsa bağlantı kapatılır)."""
+    client = get_client("elevenlabs")
+    response = await client.send(client.build_request("POST", url, json=payload, headers=headers), stream=True)
+    if response.status_code >= 400:
+        await response.aread()  # hata mesajı (örn. kota) için gövde okunur
+        await response.aclose()
+        resilience.check_status(response)
+        response.raise_for_status()
+    return response
+
+class _UpstreamAudio:
+    """Açık bir ElevenLabs yanıtının gövdesini istemcinin okuma hızından bağımsız okur.
+
+    Gövde arka planda bir kuyruğa okunur ve (önbellek açıksa) önbelleğe yazılır. Okuma bitince,
+    hata ya da iptal olsa da, yanıt kapatılır ve eşzamanlılık slotu bırakılır; böylece yavaş
+    dinleyiciler ya da hiç aktarılmayan yanıtlar (istemci yanıt başlamadan ayrıldıysa) slot tutmaz.
+    """
+
+    def __init__(self, response: httpx.Response, release=None, key: Optional[str] = None):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.ensure_future(self._read(response, release, key))
+
+    async def _read(self, response: httpx.Response, release, key: Optional[str]) -> None:
+        # Önbellek kapalıyken ses biriktirilmez; açıkken sadece bu parçanın sesi tutulur
+        audio = bytearray() if key is not None and tts_cache.enabled else None
+        try:
+            async for chunk in response.aiter_bytes(ELEVENLABS_STREAM_CHUNK_SIZE):
+                if audio is not None:
+                    audio.extend(chunk)
+                self._queue.put_nowait(chunk)
+            self._queue.put_nowait(None)
+            if audio is not None:
+                await tts_cache.set(key, bytes(audio))  # bellek katmanı hemen, disk iş parçacığında yazılır
+        except asyncio.CancelledError:
+            self._queue.put_nowait(httpx.ReadError("Ses aktarımı iptal edildi"))
+            raise
+        except Exception as e:
+            self._queue.put_nowait(e)  # hata okuyan tarafta yükseltilir
+        finally:
+            await response.aclose()
+            if release is not None:
+                release()
+
+    async def chunks(self):
+        """Okunan ses parçalarını sırayla verir."""
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+async def _open_segment(text: str, voice_settings: dict) -> _UpstreamAudio:
+    """Tek bir metin parçası için ElevenLabs streaming isteğini açar; gövde arka planda okunur."""
+    url = f"{ELEVENLABS_API_URL}/{ELEVENLABS_VOICE_ID}/stream"
     
     headers = {
         "Accept": "audio/mpeg",
@@ -37,35 +107,147 @@ async def generate_speech(request: SpeechRequest):
     }
     
     payload = {
-        "text": request.text,
-        "model_id": "eleven_multilingual_v2",
-        "voice_settings": request.voice_settings
+        "text": text,
+        "model_id": ELEVENLABS_MODEL_ID,
+        "voice_settings": voice_settings
     }
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.post(url, json=payload, headers=headers)
-            response.raise_for_status()
-            
-            # Ses verisini stream olarak döndür
-            audio_content = response.content
-            
-            return StreamingResponse(
-                io.BytesIO(audio_content),
-                media_type="audio/mpeg",
-                headers={
-                    "Content-Disposition": "inline; filename=speech.mp3",
-                    "Cache-Control": "public, max-age=3600"  # 1 saat önbellek
-                }
-            )
-            
-        except httpx.HTTPError as e:
-            if "quota" in str(e).lower():
-                raise HTTPException(status_code=429, detail="Aylık ses kotası doldu")
+    global _upstream_slots
+    if _upstream_slots is None:
+        _upstream_slots = asyncio.Semaphore(ELEVENLABS_MAX_CONCURRENCY)
+    slots = _upstream_slots
+    # Slot upstream gövdesi okunana kadar tutulur (_UpstreamAudio bırakır)
+    await slots.acquire()
+    try:
+        # Yeniden deneme sadece bağlantı açılırken yapılır; ses akmaya başladıktan sonra tekrar denenmez
+        response = await resilience.call("elevenlabs", lambda: _open_stream(url, payload, headers))
+    except BaseException:
+        slots.release()
+        raise
+    key = audio_key(text, ELEVENLABS_VOICE_ID, ELEVENLABS_MODEL_ID, voice_settings)
+    return _UpstreamAudio(response, slots.release, key)
+
+async def _segment_audio(segment: str, voice_settings: dict, source=None):
+    """Tek parçanın sesi: önbellekteki parça doğrudan, diğeri ElevenLabs'ten okundukça iletilir."""
+    if source is None:
+        key = audio_key(segment, ELEVENLABS_VOICE_ID, ELEVENLABS_MODEL_ID, voice_settings)
+        source = await tts_cache.get(key) or await _open_segment(segment, voice_settings)
+    if isinstance(source, bytes):
+        yield source
+        return
+    async for chunk in source.chunks():
+        yield chunk
+
+async def _fetch_segment(segment: str, voice_settings: dict) -> bytes:
+    return b"".join([chunk async for chunk in _segment_audio(segment, voice_settings)])
+
+async def _speech_body(segments: List[str], voice_settings: dict, first, window: int = 0):
+    """Parçaları metindeki sırayla iletir.
+
+    İlk parça canlı aktarılır. `window` > 0 ise sonraki en fazla `window` parça arka planda
+    eş zamanlı üretilir (kayan pencere); sırası gelen parça hazır olunca iletilir ve
+    pencere bir sonraki parçaya kayar. `window` = 0 iken parçalar sırayla aktarılır.
+    """
+    pending: Deque[asyncio.Task] = deque()
+    next_index = 1
+
+    def fill() -> None:
+        nonlocal next_index
+        while next_index < len(segments) and len(pending) < window:
+            pending.append(asyncio.ensure_future(_fetch_segment(segments[next_index], voice_settings)))
+            next_index += 1
+
+    index = 0
+    try:
+        fill()
+        async for chunk in _segment_audio(segments[0], voice_settings, first):
+            yield chunk
+        for index in range(1, len(segments)):
+            if pending:
+                audio = await pending[0]
+                pending.popleft()
+                fill()  # pencere, iletilen parçanın yerine bir sonrakini başlatır
+                yield audio
             else:
-                raise HTTPException(status_code=500, detail=f"Ses oluşturma hatası: {str(e)}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Beklenmeyen hata: {str(e)}")
+                async for chunk in _segment_audio(segments[index], voice_settings):
+                    yield chunk
+    except Exception as e:
+        # Yanıt başladıktan sonra durum kodu değiştirilemez; ses o parçada kesilir
+        print(f"⚠️ Ses parçası oluşturulamadı ({index + 1}/{len(segments)}): {e}")
+    finally:
+        for task in pending:
+            if task.done() and not task.cancelled():
+                task.exception()  # "exception was never retrieved" uyarısını önler
+            task.cancel()
+
+async def _cached_sentences(sentences: List[str], voice_settings: dict) -> Optional[List[bytes]]:
+    """Kısa metnin tüm cümleleri (örn. önceki uzun yanıtlardan) önbellekteyse seslerini döndürür."""
+    if not tts_cache.enabled or len(sentences) < 2:
+        return None
+    audios = []
+    for sentence in sentences:
+        audio = await tts_cache.get(audio_key(sentence, ELEVENLABS_VOICE_ID, ELEVENLABS_MODEL_ID, voice_settings))
+        if audio is None:
+            return None
+        audios.append(audio)
+    return audios
+
+async def _cached_body(audios: List[bytes]):
+    for audio in audios:
+        yield audio
+
+def _audio_response(body) -> StreamingResponse:
+    return StreamingResponse(
+        body,
+        media_type="audio/mpeg",
+        headers={
+            "Content-Disposition": "inline; filename=speech.mp3",
+            "Cache-Control": "public, max-age=3600"  # 1 saat önbellek
+        }
+    )
+
+@router.post("/generate-speech")
+async def generate_speech(request: SpeechRequest):
+    """Metni sese dönüştürür (ElevenLabs streaming endpoint'i; ilk parça gelir gelmez çalmaya başlanabilir)"""
+    
+    if not ELEVENLABS_API_KEY:
+        raise HTTPException(status_code=500, detail="ElevenLabs API key bulunamadı")
+    
+    # Metin her iki yolda da aynı şekilde (HTML temizlenip cümlelere bölünerek) normalize edilir;
+    # önbellek anahtarları seslendirilen düz metinden üretilir
+    sentences = split_sentences(strip_html(request.text)) or [request.text]
+    pipeline = request.pipeline if request.pipeline is not None else len(request.text) >= TTS_PIPELINE_MIN_CHARS
+    if pipeline:
+        # Uzun metnin her cümlesi ayrı önbelleklenir ve ayrı bir ElevenLabs isteğiyle eş zamanlı seslendirilir
+        segments = sentences
+    else:
+        # Kısa metin tek istekle seslendirilir; cümle başına sıralı istek her cümlede ilk bayt
+        # gecikmesini tekrar öder. Cümlelerin hepsi önbellekteyse istek hiç yapılmaz.
+        cached = await _cached_sentences(sentences, request.voice_settings)
+        if cached is not None:
+            return _audio_response(_cached_body(cached))
+        segments = [" ".join(sentences)]
+    first_key = audio_key(segments[0], ELEVENLABS_VOICE_ID, ELEVENLABS_MODEL_ID, request.voice_settings)
+    
+    try:
+        # İlk parça yanıt başlamadan hazırlanır; böylece upstream hataları HTTP hata kodu olarak döner
+        first = await tts_cache.get(first_key) or await _open_segment(segments[0], request.voice_settings)
+        
+        return _audio_response(
+            _speech_body(segments, request.voice_settings, first,
+                         window=TTS_PIPELINE_CONCURRENCY if pipeline else 0)
+        )
+        
+    except resilience.CircuitOpenError:
+        raise HTTPException(status_code=503, detail="Ses servisi geçici olarak kullanılamıyor")
+    except httpx.HTTPError as e:
+        body = e.response.text if isinstance(e, httpx.HTTPStatusError) else ""
+        if "quota" in f"{e} {body}".lower():
+            raise HTTPException(status_code=429, detail="Aylık ses kotası doldu")
+        else:
+            raise HTTPException(status_code=500, detail=f"Ses oluşturma hatası: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Beklenmeyen hata: {str(e)}")
 
 @router.get("/voice-info")
 async def get_voice_info():
@@ -73,6 +255,6 @@ async def get_voice_info():
     return {
         "voice_id": ELEVENLABS_VOICE_ID,
         "voice_name": "Sibel",
-        "model": "eleven_multilingual_v2",
+        "model": ELEVENLABS_MODEL_ID,
         "language": "tr-TR"
     }
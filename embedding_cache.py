@@ -0,0 +1,114 @@
+# embedding_cache.py - get_embedding için iki katmanlı (bellek + kalıcı) önbellek
+import os
+import asyncio
+import hashlib
+from typing import Dict, List, Optional
+
+import numpy as np
+from cachetools import LRUCache
+
+from text_utils import normalize_query
+
+# ---- Ayarlar ----
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+# "" (sadece bellek), "disk" (diskcache) veya "redis"
+EMBEDDING_CACHE_BACKEND = os.getenv("EMBEDDING_CACHE_BACKEND", "").strip().lower()
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./cache/embeddings")
+EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", str(7 * 24 * 3600)))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+def _cache_key(text: str, model: str) -> str:
+    digest = hashlib.sha1(f"{model}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+    return f"emb:{digest}"
+
+def _to_bytes(vector: List[float]) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+def _from_bytes(blob: bytes) -> List[float]:
+    return np.frombuffer(blob, dtype=np.float32).tolist()
+
+class EmbeddingCache:
+    """Embedding vektörlerini float32 byte dizisi olarak saklayan iki katmanlı önbellek.
+
+    1. katman: süreç içi LRU. 2. katman (isteğe bağlı): diskcache veya Redis.
+    diskcache engelleyen SQLite G/Ç yaptığından disk çağrıları iş parçacığında yürütülür.
+    Kalıcı katmandaki hatalar loglanır ve önbellek ıskası gibi davranılır.
+    """
+
+    def __init__(self, max_items: int = EMBEDDING_CACHE_SIZE, backend: str = "",
+                 directory: str = EMBEDDING_CACHE_DIR, ttl: int = EMBEDDING_CACHE_TTL,
+                 redis_url: str = REDIS_URL):
+        self._memory: LRUCache = LRUCache(maxsize=max_items)
+        self._ttl = ttl
+        self._disk = None
+        self._redis = None
+        self.backend = backend
+        self.stats: Dict[str, int] = {"memory_hits": 0, "persistent_hits": 0, "misses": 0}
+
+        if backend == "disk":
+            try:
+                import diskcache
+                self._disk = diskcache.Cache(directory)
+                print(f"✅ Embedding disk önbelleği hazır: {directory}")
+            except Exception as e:
+                print(f"⚠️ Embedding disk önbelleği açılamadı, sadece bellek kullanılacak: {e}")
+        elif backend == "redis":
+            try:
+                import redis.asyncio as redis_asyncio
+                self._redis = redis_asyncio.from_url(redis_url)
+                print("✅ Embedding Redis önbelleği hazır")
+            except Exception as e:
+                print(f"⚠️ Embedding Redis önbelleği açılamadı, sadece bellek kullanılacak: {e}")
+
+    async def _persistent_get(self, key: str) -> Optional[bytes]:
+        try:
+            if self._disk is not None:
+                return await asyncio.to_thread(self._disk.get, key)
+            if self._redis is not None:
+                return await self._redis.get(key)
+        except Exception as e:
+            print(f"⚠️ Embedding kalıcı önbellek okuma hatası: {e}")
+        return None
+
+    async def _persistent_set(self, key: str, blob: bytes) -> None:
+        try:
+            if self._disk is not None:
+                await asyncio.to_thread(self._disk.set, key, blob, expire=self._ttl)
+            elif self._redis is not None:
+                await self._redis.set(key, blob, ex=self._ttl)
+        except Exception as e:
+            print(f"⚠️ Embedding kalıcı önbellek yazma hatası: {e}")
+
+    async def get(self, text: str, model: str) -> Optional[List[float]]:
+        key = _cache_key(text, model)
+        blob = self._memory.get(key)
+        if blob is not None:
+            self.stats["memory_hits"] += 1
+            return _from_bytes(blob)
+
+        blob = await self._persistent_get(key)
+        if blob is not None:
+            self.stats["persistent_hits"] += 1
+            self._memory[key] = blob
+            return _from_bytes(blob)
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, text: str, model: str, vector: List[float]) -> None:
+        key = _cache_key(text, model)
+        blob = _to_bytes(vector)
+        self._memory[key] = blob
+        await self._persistent_set(key, blob)
+
+    def summary(self) -> Dict[str, object]:
+        lookups = sum(self.stats.values())
+        hits = self.stats["memory_hits"] + self.stats["persistent_hits"]
+        return {
+            **self.stats,
+            "backend": self.backend or "memory",
+            "memory_items": len(self._memory),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+embedding_cache = EmbeddingCache(backend=EMBEDDING_CACHE_BACKEND)
@@ -0,0 +1,230 @@
+# filter_extractor.py - İlan sorgularından kural tabanlı (LLM'siz) filtre çıkarma
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from text_utils import turkish_lower
+
+# Bu güvenin altındaki sonuçlar için LLM'e (extract_filters_from_query) düşülür
+FILTER_EXTRACTOR_MIN_CONFIDENCE = float(os.getenv("FILTER_EXTRACTOR_MIN_CONFIDENCE", "0.75"))
+
+# ---- Gazetteer: İstanbul ilçeleri ve sık aranan mahalle/semtler ----
+ISTANBUL_ILCELER = [
+    "Adalar", "Arnavutköy", "Ataşehir", "Avcılar", "Bağcılar", "Bahçelievler", "Bakırköy", "Başakşehir",
+    "Bayrampaşa", "Beşiktaş", "Beykoz", "Beylikdüzü", "Beyoğlu", "Büyükçekmece", "Çatalca", "Çekmeköy",
+    "Esenler", "Esenyurt", "Eyüpsultan", "Fatih", "Gaziosmanpaşa", "Güngören", "Kadıköy", "Kağıthane",
+    "Kartal", "Küçükçekmece", "Maltepe", "Pendik", "Sancaktepe", "Sarıyer", "Silivri", "Sultanbeyli",
+    "Sultangazi", "Şile", "Şişli", "Tuzla", "Ümraniye", "Üsküdar", "Zeytinburnu",
+]
+ISTANBUL_MAHALLELER = [
+    "Acıbadem", "Altunizade", "Ataköy", "Bahçeşehir", "Bebek", "Beylerbeyi", "Bostancı", "Caddebostan",
+    "Cevizli", "Cihangir", "Çengelköy", "Çiftehavuzlar", "Dragos", "Emirgan", "Erenköy", "Etiler",
+    "Fenerbahçe", "Feneryolu", "Fikirtepe", "Florya", "Göktürk", "Göztepe", "Halkalı", "İçerenköy",
+    "İdealtepe", "İstinye", "Kandilli", "Kavacık", "Kemerburgaz", "Koşuyolu", "Kozyatağı", "Kurtköy",
+    "Kuzguncuk", "Küçükyalı", "Levent", "Maslak", "Mecidiyeköy", "Moda", "Nişantaşı", "Ortaköy",
+    "Sefaköy", "Selamiçeşme", "Suadiye", "Tarabya", "Yeniköy", "Yeşilköy", "Zekeriyaköy",
+]
+_GAZETTEER: Dict[str, str] = {turkish_lower(name): name for name in ISTANBUL_ILCELER + ISTANBUL_MAHALLELER}
+# Spor kulübü, kişi adı veya günlük kelime olarak da geçen yer adları: eksiz yazıldıklarında
+# ancak emlak bağlamı (daire, satılık, 3+1 ...) varsa lokasyon sayılır ("Fenerbahçe maçı")
+_AMBIGUOUS_PLACES = {"adalar", "bebek", "fatih", "fenerbahçe", "kartal", "levent", "moda"}
+
+# Büyük harfle yazılsa veya bulunma eki taşısa da yer adı olmayan sık kelimeler
+_KNOWN_WORDS = {
+    "merhaba", "selam", "lütfen", "bana", "bir", "en", "ve", "ile", "veya", "için", "acil",
+    "satılık", "kiralık", "daire", "daireler", "ev", "evler", "villa", "villalar", "arsa", "konut",
+    "rezidans", "stüdyo", "dubleks", "müstakil", "ofis", "dükkan", "işyeri", "ilan", "ilanlar",
+    "site", "sitede", "kat", "katta", "katında", "bahçe", "bahçeli", "deniz", "manzaralı", "yeni",
+    "arıyorum", "istiyorum", "bul", "göster", "listele", "var", "mı", "mi", "tl", "remax", "sibel",
+    "istanbul", "ay", "ayda", "yıl", "yılda", "yüzde", "hafta", "nerede", "burada", "orada", "şurada",
+    "içinde", "içerisinde", "altında", "üstünde", "üzerinde", "arasında", "aralığında", "civarda",
+    "civarında", "yakında", "yakınında", "merkezde", "merkezinde", "bölgede", "bölgesinde",
+    "şehirde", "semtinde", "mahallede", "ilçede", "sahilde", "dahilinde", "tarafında",
+}
+
+# Yer bildiren ve diğer yaygın ekler (kesme işaretli veya bitişik yazılmış)
+_LOCATION_SUFFIXES = sorted([
+    "", "da", "de", "ta", "te", "daki", "deki", "taki", "teki", "dan", "den", "tan", "ten",
+    "a", "e", "ya", "ye", "nda", "nde", "ndaki", "ndeki", "ndan", "nden", "yı", "yi", "yu", "yü",
+    "lı", "li", "lu", "lü",
+], key=len, reverse=True)
+
+# ---- Regex'ler ----
+_APOSTROPHES_RE = re.compile(r"[’‘`´]")
+_WORD_RE = re.compile(r"[a-zçğıöşüâî]+(?:'[a-zçğıöşüâî]+)?")
+_ROOM_RE = re.compile(r"(?<![\d.,])(\d{1,2})\s*\+\s*(\d)(?!\d)")
+_STUDIO_RE = re.compile(r"\bstüdyo\b")
+_AREA_RE = re.compile(r"\d+(?:[.,]\d+)?\s*(?:m2|m²|metrekare|metre kare)")
+_NUMBER = r"\d+(?:[.,]\d+)*"
+_UNIT = r"(milyon|mn|m(?![²2a-zçğıöşü])|bin|k(?![a-zçğıöşü]))"
+_CURRENCY = r"(?:\s*(?:tl|₺|lira))?"
+_RANGE_RE = re.compile(
+    rf"({_NUMBER})\s*{_UNIT}?{_CURRENCY}\s*(?:-|–|ile|ila)\s*({_NUMBER})\s*{_UNIT}?{_CURRENCY}\s*(?:'?(?:[yn]?[ae]|dan|den|tan|ten))?\s*(?:arası|arasında|aralığında)?"
+)
+_PRICE_RE = re.compile(rf"({_NUMBER})\s*{_UNIT}?\s*((?:tl|₺|lira))?")
+_MAX_AFTER_RE = re.compile(r"^\S*\s*(?:kadar|altı|altında|altındaki|aşmayan|geçmeyen|max|maksimum)\b")
+_MIN_AFTER_RE = re.compile(r"^\S*\s*(?:üstü|üzeri|üzerinde|üzerindeki|fazla|başlayan|ve üzeri|min|minimum)\b")
+_MAX_BEFORE_RE = re.compile(r"(?:en fazla|en çok|maksimum|max|en yüksek|bütçem|bütçe)\s*:?\s*$")
+_MIN_BEFORE_RE = re.compile(r"(?:en az|minimum|min|en düşük)\s*:?\s*$")
+_DIGIT_RE = re.compile(r"\d")
+_LOCATIVE_WORD_RE = re.compile(r"\b([a-zçğıöşüâî]{3,})'(?:da|de|ta|te|daki|deki|taki|teki|dan|den|tan|ten)\b")
+_JOINED_LOCATIVE_RE = re.compile(r"^[a-zçğıöşüâî]{3,}(?:da|de|ta|te|daki|deki|taki|teki)$")
+_CAPITALISED_RE = re.compile(r"(?<![\w'])[A-ZÇĞİÖŞÜ][^\W\d_]*(?:'[^\W\d_]+)?")
+_LISTING_CONTEXT_RE = re.compile(
+    r"\d\s*\+\s*\d|\b(?:daire|ev|evi|villa|konut|rezidans|arsa|stüdyo|dubleks|müstakil|satılık|kiralık|ilan)"
+)
+
+_UNIT_MULTIPLIERS = {"milyon": 1_000_000, "mn": 1_000_000, "m": 1_000_000, "bin": 1_000, "k": 1_000}
+
+def _parse_amount(number: str, unit: Optional[str]) -> float:
+    if unit:
+        # "2,5 milyon" / "2.5 milyon" -> 2.5 ; "1.250 bin" -> 1250
+        if number.count(",") + number.count(".") == 1 and len(re.split(r"[.,]", number)[1]) < 3:
+            value = float(number.replace(",", "."))
+        else:
+            value = float(re.sub(r"[.,]", "", number))
+        return value * _UNIT_MULTIPLIERS[unit]
+    # Birimsiz: "5.000.000" noktalar binlik ayırıcıdır, virgül ondalıktır
+    return float(number.replace(".", "").replace(",", "."))
+
+def _is_price(value: float, unit: Optional[str], currency: Optional[str]) -> bool:
+    return bool(unit or currency) or value >= 100_000
+
+def _match_place(word: str) -> Optional[Tuple[str, str]]:
+    """Kelime sözlükteki bir yer adı (+ ek) ise (ad, ek) döndürür."""
+    token = word.replace("'", "")
+    for suffix in _LOCATION_SUFFIXES:
+        if suffix and not token.endswith(suffix):
+            continue
+        stem = token[: len(token) - len(suffix)] if suffix else token
+        name = _GAZETTEER.get(stem)
+        if name:
+            return name, suffix
+    return None
+
+def _find_location(text: str) -> List[str]:
+    found: List[str] = []
+    listing_context = bool(_LISTING_CONTEXT_RE.search(text))
+    for word in _WORD_RE.findall(text):
+        match = _match_place(word)
+        if not match:
+            continue
+        name, suffix = match
+        if not suffix and turkish_lower(name) in _AMBIGUOUS_PLACES and not listing_context:
+            continue
+        if name not in found:
+            found.append(name)
+    return found
+
+def _is_known_word(token: str) -> bool:
+    if token in _KNOWN_WORDS:
+        return True
+    return any(suffix and token.endswith(suffix) and token[: -len(suffix)] in _KNOWN_WORDS
+               for suffix in _LOCATION_SUFFIXES)
+
+def _has_unresolved_place(question: str, text: str) -> bool:
+    """Sözlükte olmayan bir yer adı izi var mı: büyük harfli kelime ("Antalya", "İzmir")
+    veya bulunma eki almış kelime ("bodrumda", "bodrum'da")."""
+    candidates = [turkish_lower(word) for word in _CAPITALISED_RE.findall(_APOSTROPHES_RE.sub("'", question))]
+    candidates += [word for word in _WORD_RE.findall(text)
+                   if "'" not in word and _JOINED_LOCATIVE_RE.match(word)]
+    candidates += [match.group(0) for match in _LOCATIVE_WORD_RE.finditer(text)]
+    for word in candidates:
+        if not _is_known_word(word.replace("'", "")) and not _match_place(word):
+            return True
+    return False
+
+def extract_filters_locally(question: str) -> Tuple[Dict[str, Any], float]:
+    """Soru için (filtreler, güven) döndürür. Filtre anahtarları LLM çıktısıyla aynıdır:
+    min_fiyat, max_fiyat, oda_sayisi, lokasyon. Güven 0-1 arasıdır."""
+    text = _APOSTROPHES_RE.sub("'", turkish_lower(question))
+    filters: Dict[str, Any] = {}
+    confidence = 1.0
+
+    # Oda sayısı
+    rooms = [f"{a}+{b}" for a, b in _ROOM_RE.findall(text)]
+    if _STUDIO_RE.search(text):
+        rooms.append("1+0")
+    if rooms:
+        filters["oda_sayisi"] = rooms[0]
+        if len(set(rooms)) > 1:
+            confidence = min(confidence, 0.6)
+    remaining = _AREA_RE.sub(" ", _ROOM_RE.sub(" ", text))
+
+    # Fiyat aralığı ("3-5 milyon arası", "3 milyon ile 5 milyon arasında")
+    range_match = _RANGE_RE.search(remaining)
+    if range_match and ("arası" in range_match.group(0) or "aralığında" in range_match.group(0) or range_match.group(2) or range_match.group(4)):
+        low_unit = range_match.group(2) or range_match.group(4)
+        high_unit = range_match.group(4) or range_match.group(2)
+        low = _parse_amount(range_match.group(1), low_unit)
+        high = _parse_amount(range_match.group(3), high_unit)
+        if _is_price(high, high_unit, None):
+            filters["min_fiyat"], filters["max_fiyat"] = int(min(low, high)), int(max(low, high))
+            remaining = remaining[:range_match.start()] + " " + remaining[range_match.end():]
+
+    # Tekil fiyatlar ve yön ifadeleri
+    for match in _PRICE_RE.finditer(remaining):
+        number, unit, currency = match.group(1), match.group(2), match.group(3)
+        value = _parse_amount(number, unit)
+        if not _is_price(value, unit, currency):
+            continue
+        before = remaining[:match.start()]
+        after = remaining[match.end():match.end() + 30].lstrip("'")
+        if _MIN_AFTER_RE.search(after) or _MIN_BEFORE_RE.search(before):
+            key = "min_fiyat"
+        elif _MAX_AFTER_RE.search(after) or _MAX_BEFORE_RE.search(before):
+            key = "max_fiyat"
+        else:
+            # Yönsüz tutar ("5 milyon TL'ye ev") bütçe olarak kabul edilir
+            key = "max_fiyat"
+            confidence = min(confidence, 0.8)
+        if key in filters:
+            confidence = min(confidence, 0.5)
+            continue
+        filters[key] = int(value)
+        remaining = remaining[:match.start()] + " " * (match.end() - match.start()) + remaining[match.end():]
+
+    # Lokasyon
+    locations = _find_location(text)
+    if locations:
+        filters["lokasyon"] = locations[0]
+        if len(locations) > 1:
+            confidence = min(confidence, 0.5)
+
+    # Açıklanamayan sayı veya sözlükte olmayan yer adı varsa LLM daha iyi karar verir
+    if _DIGIT_RE.search(remaining):
+        confidence = min(confidence, 0.5)
+    if _has_unresolved_place(question, text):
+        confidence = min(confidence, 0.4)
+    if not filters:
+        confidence = min(confidence, 0.5)
+
+    return filters, confidence
+
+class FilterExtractionStats:
+    """Yerel çıkarıcının kapsama (LLM'e gitmeden çözülen sorgu) metrikleri."""
+
+    def __init__(self):
+        self.local = 0
+        self.llm_fallback = 0
+        self.fields: Dict[str, int] = {"min_fiyat": 0, "max_fiyat": 0, "oda_sayisi": 0, "lokasyon": 0}
+
+    def record(self, used_local: bool, filters: Dict[str, Any]) -> None:
+        if used_local:
+            self.local += 1
+            for key in filters:
+                if key in self.fields:
+                    self.fields[key] += 1
+        else:
+            self.llm_fallback += 1
+
+    def summary(self) -> Dict[str, Any]:
+        total = self.local + self.llm_fallback
+        return {
+            "local": self.local,
+            "llm_fallback": self.llm_fallback,
+            "coverage": round(self.local / total, 3) if total else 0.0,
+            "local_fields": dict(self.fields),
+        }
+
+filter_stats = FilterExtractionStats()
@@ -0,0 +1,83 @@
+# http_clients.py - Uygulama genelinde paylaşılan, bağlantı havuzlu HTTP istemcileri
+import os
+import importlib.util
+from typing import Dict
+
+import httpx
+
+from config import env_flag
+
+# ---- Genel Havuz Ayarları ----
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+# HTTP/2 sadece `h2` paketi yüklüyse açılabilir (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+HTTP2_ENABLED = env_flag("HTTP2_ENABLED", True) and HTTP2_AVAILABLE
+
+# ---- Upstream Profilleri ----
+# Her upstream kendi havuzunu ve zaman aşımını kullanır. Ortam değişkeniyle ezilebilir:
+# HTTP_TIMEOUT_<AD> ve HTTP_MAX_CONNECTIONS_<AD> (örn. HTTP_TIMEOUT_FIRECRAWL=45)
+UPSTREAMS: Dict[str, Dict[str, float]] = {
+    "google": {"timeout": 60.0},       # Google Custom Search
+    "firecrawl": {"timeout": 30.0},    # FireCrawl scrape API
+    "elevenlabs": {"timeout": 30.0},   # ElevenLabs TTS
+    "assets": {"timeout": 10.0},       # sibelgpt.com marka görselleri (PDF)
+    "images": {"timeout": 30.0},       # üretilen DALL·E görsellerinin indirilmesi (IMAGE_CACHE_DIR)
+    "supabase": {"timeout": 10.0},     # Supabase PostgREST (RPC)
+}
+
+def _upstream_setting(name: str, key: str, default: float) -> float:
+    value = os.getenv(f"HTTP_{key.upper()}_{name.upper()}")
+    return float(value) if value else default
+
+class HttpClientRegistry:
+    """Upstream adına göre paylaşılan `httpx.AsyncClient` örneklerini yönetir.
+
+    İstemciler `main.py` startup olayında oluşturulur ve shutdown'da kapatılır.
+    Startup çalışmadan (testler, betikler) istenirse ilk kullanımda oluşturulur.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        profile = UPSTREAMS.get(name, {})
+        timeout = _upstream_setting(name, "timeout", profile.get("timeout", 30.0))
+        max_connections = int(_upstream_setting(name, "max_connections", profile.get("max_connections", HTTP_MAX_CONNECTIONS)))
+        return httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            timeout=httpx.Timeout(timeout, connect=min(HTTP_CONNECT_TIMEOUT, timeout)),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=min(HTTP_MAX_KEEPALIVE_CONNECTIONS, max_connections),
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._create(name)
+        return client
+
+    async def startup(self) -> None:
+        for name in UPSTREAMS:
+            self.get(name)
+        print(f"✅ HTTP istemci havuzları hazır: {', '.join(UPSTREAMS)} (HTTP/2: {HTTP2_ENABLED})")
+
+    async def shutdown(self) -> None:
+        clients, self._clients = self._clients, {}
+        for name, client in clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                print(f"⚠️ HTTP istemcisi kapatılamadı ({name}): {e}")
+        print("✅ HTTP istemci havuzları kapatıldı")
+
+registry = HttpClientRegistry()
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """Verilen upstream için paylaşılan istemciyi döndürür."""
+    return registry.get(name)
@@ -0,0 +1,144 @@
+# image_cache.py - DALL·E görsel sonuçları için prompt anahtarlı önbellek (isteğe bağlı yerel kopya ile)
+import os
+import re
+import time
+import hashlib
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from cachetools import TLRUCache
+
+import resilience
+import single_flight
+from config import env_flag
+from http_clients import get_client
+from single_flight import SingleFlight
+from text_utils import normalize_query
+
+# ---- Ayarlar ----
+IMAGE_CACHE_ENABLED = env_flag("IMAGE_CACHE_ENABLED", True)
+IMAGE_CACHE_MAX_ITEMS = int(os.getenv("IMAGE_CACHE_MAX_ITEMS", "500"))
+# OpenAI görsel URL'leri ~60 dk geçerlidir; süresi dolmak üzere olan URL dönmemesi için biraz daha kısa tutulur
+IMAGE_CACHE_TTL = int(os.getenv("IMAGE_CACHE_TTL", "3000"))
+# Tanımlıysa (örn. ./cache/images) görseller indirilir ve IMAGE_FILES_ROUTE altından süresiz URL ile sunulur
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "")
+IMAGE_CACHE_PERSIST_TTL = int(os.getenv("IMAGE_CACHE_PERSIST_TTL", str(7 * 24 * 3600)))
+IMAGE_FILES_ROUTE = "/image/files"
+# Yerel görsel URL'lerinin önüne eklenen genel adres (örn. https://api.sibelgpt.com); boşsa
+# isteğin geldiği adres (request.base_url) kullanılır. Frontend farklı bir alan adında çalışır.
+IMAGE_PUBLIC_BASE_URL = os.getenv("IMAGE_PUBLIC_BASE_URL", "")
+
+_FILE_NAME = re.compile(r"^[0-9a-f]{64}\.png$")
+
+def image_key(prompt: str, model: str, size: str, quality: str) -> str:
+    """Normalize prompt + üretim parametrelerinden sabit uzunlukta anahtar (dosya adı olarak da kullanılır)."""
+    raw = "\x1f".join((normalize_query(prompt), model, size, quality))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _ttu(key: Any, value: Tuple[float, str], now: float) -> float:
+    return now + value[0]
+
+async def _download(url: str) -> bytes:
+    async def fetch():
+        return resilience.check_status(await get_client("images").get(url))
+
+    response = await resilience.call("images", fetch)
+    response.raise_for_status()
+    return response.content
+
+class ImageResultCache:
+    """Aynı prompt + parametreler için üretilen görsel URL'ini saklar.
+
+    Eş zamanlı özdeş istekler tek bir üretimde birleştirilir. `persist_dir` verilirse görsel
+    indirilip diske yazılır ve OpenAI URL'i yerine süresi dolmayan yerel URL döndürülür;
+    indirme başarısız olursa OpenAI URL'i normal TTL ile saklanır. Yerel URL'ler önbellekte
+    göreli tutulur, döndürülürken `public_base_url` (yoksa çağıranın `base_url`'i) ile mutlak yapılır.
+    """
+
+    def __init__(self, enabled: bool = IMAGE_CACHE_ENABLED, max_items: int = IMAGE_CACHE_MAX_ITEMS,
+                 ttl: int = IMAGE_CACHE_TTL, persist_dir: str = IMAGE_CACHE_DIR,
+                 persist_ttl: int = IMAGE_CACHE_PERSIST_TTL, timer: Callable[[], float] = time.monotonic,
+                 flight: Optional[SingleFlight] = None,
+                 downloader: Callable[[str], Awaitable[bytes]] = _download,
+                 public_base_url: str = IMAGE_PUBLIC_BASE_URL):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.persist_dir = Path(persist_dir) if persist_dir else None
+        self.persist_ttl = persist_ttl
+        self._cache: TLRUCache = TLRUCache(maxsize=max_items, ttu=_ttu, timer=timer)
+        self._flight = flight or SingleFlight("image")
+        self._download = downloader
+        self.public_base_url = public_base_url.rstrip("/")
+        self.stats = {"hits": 0, "misses": 0, "persisted": 0}
+        if self.persist_dir:
+            os.makedirs(self.persist_dir, exist_ok=True)
+
+    async def get_or_generate(self, prompt: str, generate: Callable[[], Awaitable[str]],
+                              model: str, size: str, quality: str, base_url: Optional[str] = None) -> str:
+        if not self.enabled:
+            return await generate()
+        key = image_key(prompt, model, size, quality)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.stats["hits"] += 1
+            return self.public_url(cached[1], base_url)
+        local_url = self._local_url(key)
+        if local_url:
+            self.stats["hits"] += 1
+            self._cache[key] = (self.persist_ttl, local_url)
+            return self.public_url(local_url, base_url)
+
+        self.stats["misses"] += 1
+        url = await self._flight.do(key, lambda: self._generate_and_store(key, generate))
+        return self.public_url(url, base_url)
+
+    def public_url(self, url: str, base_url: Optional[str] = None) -> str:
+        """Göreli yerel URL'i mutlak yapar; OpenAI URL'leri olduğu gibi döner."""
+        if not url.startswith("/"):
+            return url
+        return (self.public_base_url or (base_url or "").rstrip("/")) + url
+
+    async def _generate_and_store(self, key: str, generate: Callable[[], Awaitable[str]]) -> str:
+        url = await generate()
+        if self.persist_dir:
+            try:
+                self._write(key, await self._download(url))
+                self.stats["persisted"] += 1
+                url = f"{IMAGE_FILES_ROUTE}/{key}.png"
+                self._cache[key] = (self.persist_ttl, url)
+                return url
+            except Exception as e:
+                print(f"⚠️ Görsel yerel önbelleğe yazılamadı, OpenAI URL'i kullanılacak: {e}")
+        self._cache[key] = (self.ttl, url)
+        return url
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self.persist_dir / f"{key}.png"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)  # yarım yazılmış dosya sunulmasın
+
+    def _local_url(self, key: str) -> Optional[str]:
+        if not self.persist_dir:
+            return None
+        path = self.persist_dir / f"{key}.png"
+        try:
+            if time.time() - path.stat().st_mtime < self.persist_ttl:
+                return f"{IMAGE_FILES_ROUTE}/{key}.png"
+        except FileNotFoundError:
+            pass
+        return None
+
+    def file_path(self, name: str) -> Optional[Path]:
+        """Yerel görsel dosyasının yolu; geçersiz ad veya olmayan dosya için None."""
+        if not self.persist_dir or not _FILE_NAME.match(name):
+            return None
+        path = self.persist_dir / name
+        return path if path.is_file() else None
+
+    def summary(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "entries": len(self._cache), **self.stats,
+                "persist": bool(self.persist_dir), "coalesced": self._flight.stats["coalesced"]}
+
+image_cache = ImageResultCache(flight=single_flight.group("image"))
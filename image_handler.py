@@ -1,27 +1,163 @@
 # image_handler.py
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from openai import AsyncOpenAI
 from pydantic import BaseModel
-import openai
+from typing import Any, Dict, Optional
+import asyncio
+import json
 import os
+import time
+import uuid
+
+import resilience
+from image_cache import IMAGE_FILES_ROUTE, image_cache
+from openai_scheduler import scheduler
 
 router = APIRouter()
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# Yeniden denemeler resilience katmanında yapılır; SDK'nın kendi denemeleri kapatılır
+openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+
+# DALL·E çağrıları 10-20 sn sürer; aynı anda en fazla bu kadar üretim yapılır
+IMAGE_MAX_CONCURRENCY = int(os.getenv("IMAGE_MAX_CONCURRENCY", "2"))
+# İş kayıtları bu süre sonunda silinir (OpenAI görsel URL'leri de ~1 saat geçerlidir)
+IMAGE_JOB_TTL = int(os.getenv("IMAGE_JOB_TTL", "3600"))
+IMAGE_JOB_MAX = int(os.getenv("IMAGE_JOB_MAX", "500"))
+IMAGE_EVENTS_KEEPALIVE = 15.0
+IMAGE_MODEL = "dall-e-3"
+IMAGE_SIZE = "1024x1024"
+IMAGE_QUALITY = "standard"  # hızlı ve düşük maliyetli üretim
+
+_semaphore: Optional[asyncio.Semaphore] = None  # olay döngüsü içinde oluşturulur
 
 class ImageRequest(BaseModel):
     prompt: str
+    # True ise istek hemen bir job_id ile döner; sonuç /image/jobs/{job_id} (veya /events) ile alınır
+    job: bool = False
+
+class ImageJob:
+    """Süreç içi görsel üretim işi. Not: işler worker belleğinde tutulur; sorgu aynı worker'a gelmelidir."""
+
+    def __init__(self, prompt: str, base_url: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.prompt = prompt
+        self.base_url = base_url
+        self.status = "pending"  # pending -> running -> done | error
+        self.image_url: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"job_id": self.id, "status": self.status}
+        if self.image_url:
+            data["image_url"] = self.image_url
+        if self.error:
+            data["error"] = self.error
+        return data
+
+_jobs: Dict[str, ImageJob] = {}
+
+async def generate_image_url(prompt: str, on_start=None, base_url: Optional[str] = None) -> str:
+    """Görsel URL'ini önbellekten döndürür; yoksa üretir (aynı prompt için eş zamanlı istekler birleştirilir).
+    `base_url` yerel kopyanın mutlak URL'i için kullanılır (IMAGE_PUBLIC_BASE_URL yoksa)."""
+    return await image_cache.get_or_generate(
+        prompt, lambda: _generate_uncached(prompt, on_start),
+        model=IMAGE_MODEL, size=IMAGE_SIZE, quality=IMAGE_QUALITY, base_url=base_url,
+    )
+
+async def _generate_uncached(prompt: str, on_start=None) -> str:
+    """Görseli async istemciyle üretir ve URL'ini döndürür (eşzamanlılık sınırı uygulanır)."""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(IMAGE_MAX_CONCURRENCY)
+    async with _semaphore:
+        if on_start:
+            on_start()
+        # Görsel başına ücretlendirildiği için tekrar denenmez (idempotent=False); devre kesici yine geçerli
+        async with scheduler.slot(IMAGE_MODEL, 1):
+            response = await resilience.call("openai", lambda: openai_client.images.generate(
+                model=IMAGE_MODEL,
+                prompt=prompt,
+                n=1,
+                quality=IMAGE_QUALITY,
+                size=IMAGE_SIZE
+            ), idempotent=False)
+    return response.data[0].url
+
+async def _run_job(job: ImageJob) -> None:
+    def mark_running():
+        job.status = "running"
+
+    try:
+        job.image_url = await generate_image_url(job.prompt, on_start=mark_running, base_url=job.base_url)
+        job.status = "done"
+    except Exception as e:
+        job.error = str(e)
+        job.status = "error"
+    finally:
+        job.finished.set()
+
+def _prune_jobs() -> None:
+    cutoff = time.time() - IMAGE_JOB_TTL
+    for job_id in [j.id for j in _jobs.values() if j.created_at < cutoff and j.finished.is_set()]:
+        del _jobs[job_id]
+
+def _get_job(job_id: str) -> ImageJob:
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Görsel işi bulunamadı veya süresi doldu")
+    return job
 
 @router.post("/image")
-async def generate_image(req: ImageRequest):
+async def generate_image(req: ImageRequest, request: Request):
+    base_url = str(request.base_url)
+    if req.job:
+        _prune_jobs()
+        if len(_jobs) >= IMAGE_JOB_MAX:
+            return JSONResponse(status_code=503, content={"error": "Görsel kuyruğu dolu, lütfen biraz sonra tekrar deneyin."})
+        job = ImageJob(req.prompt, base_url)
+        _jobs[job.id] = job
+        job.task = asyncio.create_task(_run_job(job))
+        return JSONResponse(status_code=202, content={
+            **job.to_dict(),
+            "status_url": f"/image/jobs/{job.id}",
+            "events_url": f"/image/jobs/{job.id}/events",
+        })
+
     try:
-        response = openai.images.generate(
-            model="dall-e-3",
-            prompt=req.prompt,
-            n=1,
-            quality="standard",  # hızlı ve düşük maliyetli üretim
-            size="1024x1024"
-        )
-        image_url = response.data[0].url
+        image_url = await generate_image_url(req.prompt, base_url=base_url)
         return {"image_url": image_url}
     except Exception as e:
         return {"error": str(e)}
+
+@router.get("/image/jobs/{job_id}")
+async def get_image_job(job_id: str):
+    return _get_job(job_id).to_dict()
+
+@router.get("/image/jobs/{job_id}/events")
+async def stream_image_job(job_id: str):
+    """İş bitene kadar bağlantıyı açık tutar (keepalive yorumlarıyla), sonunda `done` veya `error` olayı gönderir."""
+    job = _get_job(job_id)
+
+    async def event_source():
+        while not job.finished.is_set():
+            try:
+                await asyncio.wait_for(job.finished.wait(), timeout=IMAGE_EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+        event = "done" if job.status == "done" else "error"
+        yield f"event: {event}\ndata: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(event_source(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get(IMAGE_FILES_ROUTE + "/{name}")
+async def serve_image_file(name: str):
+    """IMAGE_CACHE_DIR'e kaydedilmiş görseli sunar (içerik adresli olduğu için uzun süre önbelleklenebilir)."""
+    path = image_cache.file_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Görsel bulunamadı")
+    return FileResponse(path, media_type="image/png", headers={"Cache-Control": "public, max-age=604800, immutable"})
@@ -0,0 +1,139 @@
+# intent_classifier.py - İlan tespiti ve konu sınıflandırması için yerel (LLM'siz) anahtar kelime sınıflandırıcısı
+import os
+import re
+from typing import Any, Dict, List
+
+from filter_extractor import extract_filters_locally
+from text_utils import turkish_lower
+
+# Bu güvenin altındaki kararlar için LLM'e (router / check_if_property_listing_query / detect_topic) düşülür
+INTENT_CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("INTENT_CLASSIFIER_MIN_CONFIDENCE", "0.75"))
+
+TOPICS = ["real-estate", "mind-coach", "finance"]
+
+# Kelime kökleri (ekli halleri de eşleşir) ve ağırlıkları. Belirsiz kökler (yatırım, kredi, değer)
+# bilerek düşük ağırlıklıdır; tek başına karar verdirmezler.
+TOPIC_KEYWORDS: Dict[str, Dict[str, float]] = {
+    "real-estate": {
+        "emlak": 2, "gayrimenkul": 2, "konut": 2, "daire": 2, "villa": 2, "rezidans": 2, "arsa": 2,
+        "satılık": 2, "kiralık": 2, "tapu": 2, "ilan": 2, "müstakil": 2, "dubleks": 2, "yalı": 2,
+        "kira": 1.5, "kiracı": 2, "ev sahibi": 2, "aidat": 2, "imar": 2, "iskan": 2, "ekspertiz": 2,
+        "metrekare": 1.5, "m2": 1.5, "site": 1, "dükkan": 1.5, "ofis": 1, "ev": 1, "evler": 1,
+        "oda": 1, "kat": 0.5, "emlakçı": 2, "kentsel dönüşüm": 2, "deprem yönetmeliği": 2,
+    },
+    "finance": {
+        "borsa": 2, "hisse": 2, "dolar": 2, "euro": 2, "altın": 1.5, "faiz": 1.5, "enflasyon": 2,
+        "kripto": 2, "bitcoin": 2, "tahvil": 2, "bono": 2, "fon": 1.5, "döviz": 2, "portföy": 2,
+        "temettü": 2, "bist": 2, "merkez bankası": 2, "yatırım": 1, "kredi": 0.5, "mevduat": 2,
+        "eurobond": 2, "parite": 2, "resesyon": 2, "ekonomi": 1.5, "finans": 2, "piyasa": 1,
+    },
+    "mind-coach": {
+        "stres": 2, "kaygı": 2, "anksiyete": 2, "mutsuz": 2, "motivasyon": 2, "özgüven": 2, "depresyon": 2,
+        "meditasyon": 2, "numeroloji": 2, "astroloji": 2, "burç": 2, "hissediyorum": 2, "yalnız": 1.5,
+        "korku": 1.5, "kişisel gelişim": 2, "farkındalık": 2, "öfke": 2, "ilişki": 1.5, "terapi": 2,
+        "psikoloji": 2, "ruh": 1.5, "mutlu": 1.5, "duygu": 2, "travma": 2, "bilinçaltı": 2,
+        "felsefe": 1.5, "varoluş": 2, "yaşamın anlamı": 2, "nefes": 1, "tükenmiş": 2, "sınav kaygısı": 2,
+    },
+}
+
+# İlan araması lehine/aleyhine işaretler (yalnızca gayrimenkul modunda kullanılır)
+LISTING_ACTION_KEYWORDS: Dict[str, float] = {
+    "satılık": 2, "kiralık": 2, "ilan": 2, "arıyorum": 2, "bul": 2, "göster": 2, "listele": 2,
+    "var mı": 2, "öner": 1, "bakıyorum": 2, "istiyorum": 1, "lazım": 1,
+}
+LISTING_PROPERTY_KEYWORDS: Dict[str, float] = {
+    "daire": 1, "ev": 1, "evler": 1, "villa": 1, "konut": 1, "rezidans": 1, "arsa": 1, "dükkan": 1,
+    "ofis": 1, "yalı": 1, "müstakil": 1, "dubleks": 1, "stüdyo": 1,
+}
+INFO_KEYWORDS: Dict[str, float] = {
+    "nasıl": 2, "nedir": 2, "nelere": 2, "neden": 2, "niçin": 2, "ne demek": 2, "hesapla": 2,
+    "dikkat": 2, "avantaj": 1.5, "dezavantaj": 1.5, "fark": 1, "mantıklı mı": 2, "gerekir": 1.5,
+    "tapu masraf": 2, "vergi": 1.5, "sözleşme": 1.5, "kredi": 1.5, "masraf": 1.5, "prosedür": 2,
+    "getiri": 1.5, "satılık mı": 2, "kiralık mı": 2, "mı olsun": 2,
+}
+
+_WORD_RE = re.compile(r"[a-zçğıöşüâî0-9]+")
+# Kısa ya da başka kelimelerin başı olan kökler tam eşleşme ister ("altında" = fiyat sınırı, altın değil)
+_EXACT_ONLY = {"ev", "bul", "kat", "fon", "oda", "ruh", "m2", "altın"}
+
+def _tokens(text: str) -> List[str]:
+    return _WORD_RE.findall(turkish_lower(text).replace("'", " ").replace("’", " "))
+
+def _score(tokens: List[str], joined: str, keywords: Dict[str, float]) -> float:
+    """Kökü kelime başında eşleşen anahtar kelimelerin ağırlık toplamı. Kısa kökler tam eşleşme ister."""
+    score = 0.0
+    for keyword, weight in keywords.items():
+        if " " in keyword:
+            matched = f" {keyword}" in joined
+        elif keyword in _EXACT_ONLY:
+            matched = keyword in tokens
+        else:
+            matched = any(token.startswith(keyword) for token in tokens)
+        if matched:
+            score += weight
+    return score
+
+def _margin_confidence(best: float, second: float) -> float:
+    return max(0.0, min(1.0, (best - second) / 2.0))
+
+def classify_intent(question: str) -> Dict[str, Any]:
+    """Soru için {"is_listing", "listing_confidence", "topic", "topic_confidence"} döndürür.
+
+    Güven, kazanan sınıfın skorunun ikinciye göre farkından hesaplanır (fark >= 2 -> 1.0).
+    Soruda bilgi sorusu işareti varsa ("nasıl", "hesaplama", "satılık mı") ilan kararı
+    LLM'e bırakılacak kadar düşük güvenle döner.
+    """
+    tokens = _tokens(question)
+    joined = " " + " ".join(tokens)
+
+    topic_scores = {topic: _score(tokens, joined, keywords) for topic, keywords in TOPIC_KEYWORDS.items()}
+    ranked = sorted(topic_scores.items(), key=lambda item: item[1], reverse=True)
+    (topic, best), (_, second) = ranked[0], ranked[1]
+    if best == 0:
+        topic, topic_confidence = "general", 0.0
+    else:
+        topic_confidence = _margin_confidence(best, second)
+
+    filters, filter_confidence = extract_filters_locally(question)
+    listing_score = _score(tokens, joined, LISTING_ACTION_KEYWORDS) + _score(tokens, joined, LISTING_PROPERTY_KEYWORDS)
+    if filter_confidence >= 0.5:
+        listing_score += len(filters)
+    info_score = _score(tokens, joined, INFO_KEYWORDS)
+    if topic != "real-estate" and topic_confidence > 0:
+        info_score += best  # başka konudaki soru ilan araması değildir
+    is_listing = listing_score > info_score
+    listing_confidence = _margin_confidence(max(listing_score, info_score), min(listing_score, info_score))
+    if is_listing and info_score > 0:
+        listing_confidence = min(listing_confidence, 0.5)
+    if is_listing and topic_confidence < 1.0 and topic in ("real-estate", "general"):
+        topic, topic_confidence = "real-estate", max(topic_confidence, listing_confidence)
+
+    return {
+        "is_listing": is_listing,
+        "listing_confidence": listing_confidence,
+        "topic": topic,
+        "topic_confidence": topic_confidence,
+    }
+
+class IntentStats:
+    """Yerel sınıflandırıcının LLM'e gitmeden verdiği karar sayaçları."""
+
+    def __init__(self):
+        self.local = 0
+        self.llm_fallback = 0
+
+    def record(self, used_local: bool) -> None:
+        if used_local:
+            self.local += 1
+        else:
+            self.llm_fallback += 1
+
+    def summary(self) -> Dict[str, Any]:
+        total = self.local + self.llm_fallback
+        return {
+            "local": self.local,
+            "llm_fallback": self.llm_fallback,
+            "coverage": round(self.local / total, 3) if total else 0.0,
+        }
+
+intent_stats = IntentStats()
@@ -0,0 +1,108 @@
+# intent_eval.py - Yerel sınıflandırıcının LLM etiketleriyle uyumunu ölçen çevrimdışı değerlendirme betiği
+#
+# Kullanım:
+#   python intent_eval.py sorular.txt                 # her satırda bir soru; etiketler LLM'den alınır
+#   python intent_eval.py sorular.txt --labels etiketler.jsonl
+#
+# --labels dosyası varsa LLM etiketleri oradan okunur (API çağrısı yapılmaz), yoksa LLM
+# (route_query) ile üretilip bu dosyaya yazılır. Girdi verilmezse SAMPLE_QUESTIONS kullanılır.
+import sys
+import json
+import asyncio
+import argparse
+from typing import Any, Dict, List
+
+from intent_classifier import INTENT_CLASSIFIER_MIN_CONFIDENCE, classify_intent
+
+SAMPLE_QUESTIONS = [
+    "Kadıköy'de satılık daire bul",
+    "20 milyona kadar 3+1 daire arıyorum",
+    "Beşiktaş'ta ev var mı?",
+    "Maltepe'de villa göster",
+    "Ev alırken nelere dikkat etmeliyim?",
+    "Konut kredisi nasıl alınır?",
+    "Tapu masrafları nasıl hesaplanır?",
+    "Borsada hangi hisseler yükselir?",
+    "Enflasyon nedir?",
+    "Dolar mı altın mı daha mantıklı?",
+    "Son zamanlarda çok stresliyim, ne yapmalıyım?",
+    "Özgüvenimi nasıl artırabilirim?",
+    "Bugün hava nasıl?",
+]
+
+def _load_questions(path: str) -> List[str]:
+    if not path:
+        return list(SAMPLE_QUESTIONS)
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def _load_labels(path: str) -> Dict[str, Dict[str, Any]]:
+    labels: Dict[str, Dict[str, Any]] = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    labels[item["question"]] = item
+    except FileNotFoundError:
+        pass
+    return labels
+
+async def _label_with_llm(questions: List[str]) -> Dict[str, Dict[str, Any]]:
+    # ask_handler ortam değişkenlerini (OPENAI_API_KEY vb.) import sırasında kontrol eder
+    from ask_handler import route_query
+    labels = {}
+    for question in questions:
+        route = await route_query(question)
+        labels[question] = {"question": question, "is_listing": route["is_listing"], "topic": route["topic"]}
+    return labels
+
+def evaluate(questions: List[str], labels: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Her alan için kapsama (yerel karar oranı) ve kapsanan örneklerde LLM ile uyumu hesaplar."""
+    report: Dict[str, Any] = {"total": 0, "disagreements": []}
+    counters = {"is_listing": [0, 0], "topic": [0, 0]}  # [yerel karar, uyumlu karar]
+    for question in questions:
+        label = labels.get(question)
+        if label is None:
+            continue
+        report["total"] += 1
+        intent = classify_intent(question)
+        for field, confidence_key in (("is_listing", "listing_confidence"), ("topic", "topic_confidence")):
+            if intent[confidence_key] < INTENT_CLASSIFIER_MIN_CONFIDENCE:
+                continue
+            counters[field][0] += 1
+            if intent[field] == label[field]:
+                counters[field][1] += 1
+            else:
+                report["disagreements"].append({"question": question, "field": field,
+                                                "local": intent[field], "llm": label[field]})
+    for field, (decided, agreed) in counters.items():
+        report[field] = {
+            "coverage": round(decided / report["total"], 3) if report["total"] else 0.0,
+            "agreement": round(agreed / decided, 3) if decided else 0.0,
+        }
+    return report
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Yerel niyet sınıflandırıcısını LLM etiketleriyle karşılaştırır")
+    parser.add_argument("questions", nargs="?", default="", help="Her satırda bir soru içeren dosya")
+    parser.add_argument("--labels", default="", help="LLM etiketlerinin okunacağı/yazılacağı JSONL dosyası")
+    args = parser.parse_args(argv)
+
+    questions = _load_questions(args.questions)
+    labels = _load_labels(args.labels) if args.labels else {}
+    missing = [q for q in questions if q not in labels]
+    if missing:
+        print(f"🤖 {len(missing)} soru LLM ile etiketleniyor...")
+        labels.update(asyncio.run(_label_with_llm(missing)))
+        if args.labels:
+            with open(args.labels, "w", encoding="utf-8") as f:
+                for item in labels.values():
+                    f.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+    report = evaluate(questions, labels)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,351 @@
+# listing_index.py - İlanlar için süreç içi vektör indeksi (Supabase'den artımlı senkronizasyon)
+import os
+import re
+import json
+import time
+import asyncio
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import supabase_rpc
+from config import env_flag
+from listing_store import acquire_writer_lock, current_version, open_store, write_store
+from text_utils import turkish_lower
+
+# ---- Ayarlar ----
+LISTING_INDEX_ENABLED = env_flag("LISTING_INDEX_ENABLED", False)
+LISTING_TABLE = os.getenv("LISTING_TABLE", "remax_ilanlar")
+LISTING_ID_COLUMN = os.getenv("LISTING_ID_COLUMN", "id")
+LISTING_UPDATED_COLUMN = os.getenv("LISTING_UPDATED_COLUMN", "updated_at")
+LISTING_EMBEDDING_COLUMN = os.getenv("LISTING_EMBEDDING_COLUMN", "embedding")
+LISTING_SYNC_INTERVAL = int(os.getenv("LISTING_SYNC_INTERVAL", "300"))
+# Silinen ilanlar updated_at deltasında görünmediği için periyodik tam senkronizasyon yapılır
+LISTING_FULL_SYNC_INTERVAL = int(os.getenv("LISTING_FULL_SYNC_INTERVAL", str(6 * 3600)))
+LISTING_SYNC_PAGE_SIZE = int(os.getenv("LISTING_SYNC_PAGE_SIZE", "1000"))
+# Boş değilse indeks her senkronizasyonda bu dizine yazılır ve açılışta memmap ile okunur
+LISTING_INDEX_DIR = os.getenv("LISTING_INDEX_DIR", "./cache/listing_index")
+# Yazıcı olmayan worker'lar CURRENT işaretçisini bu aralıkla kontrol edip yeni sürümü açar
+LISTING_FOLLOW_INTERVAL = int(os.getenv("LISTING_FOLLOW_INTERVAL", "30"))
+
+_NON_DIGIT_RE = re.compile(r"[^\d]")
+
+def _parse_price(row: Dict[str, Any]) -> float:
+    """fiyat_numeric varsa onu, yoksa '5.250.000 ₺' gibi metinden sayıyı alır."""
+    value = row.get("fiyat_numeric")
+    if value is None:
+        value = row.get("fiyat")
+    if isinstance(value, (int, float)):
+        return float(value)
+    digits = _NON_DIGIT_RE.sub("", str(value or "").split(",")[0])
+    return float(digits) if digits else np.nan
+
+def _normalize_room(value: Any) -> str:
+    return str(value or "").replace(" ", "")
+
+def _parse_embedding(value: Any) -> Optional[np.ndarray]:
+    """pgvector PostgREST üzerinden '[0.1,0.2,...]' metni olarak gelir."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    vector = np.asarray(value, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else None
+
+class _Vocabulary:
+    """Metin sütunlarını tamsayı kodlarına çevirir (filtreler kod dizileri üzerinde çalışır)."""
+
+    def __init__(self, values: List[str]):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self.codes = np.fromiter((self._code(v) for v in values), dtype=np.int32, count=len(values))
+
+    def _code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def exact(self, value: str) -> np.ndarray:
+        code = self._codes.get(value)
+        return self.codes == code if code is not None else np.zeros(len(self.codes), dtype=bool)
+
+    def containing(self, needle: str) -> np.ndarray:
+        matched = [code for code, value in enumerate(self.values) if needle in value]
+        return np.isin(self.codes, matched)
+
+class _Snapshot:
+    """Aramada kullanılan değişmez indeks görüntüsü; senkronizasyon yeni bir görüntü oluşturup değiştirir."""
+
+    def __init__(self, rows: List[Dict[str, Any]], matrix: np.ndarray):
+        self.rows = rows
+        self.matrix = matrix
+        self.prices = np.fromiter((_parse_price(r) for r in rows), dtype=np.float64, count=len(rows))
+        self.rooms = _Vocabulary([_normalize_room(r.get("oda_sayisi")) for r in rows])
+        self.ilce = _Vocabulary([turkish_lower(str(r.get("ilce") or "")) for r in rows])
+        self.mahalle = _Vocabulary([turkish_lower(str(r.get("mahalle") or "")) for r in rows])
+
+class ListingIndex:
+    """Tüm ilan embedding'lerini bitişik bir float32 matriste tutar.
+
+    fiyat/oda_sayisi/ilce filtreleri önceden hesaplanmış sütun dizileri üzerinde maske
+    olarak uygulanır, top-k ise tek bir matris-vektör çarpımıyla bulunur.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[_Snapshot] = None
+        self._rows_by_id: Dict[Any, Dict[str, Any]] = {}
+        self._vectors_by_id: Dict[Any, np.ndarray] = {}
+        self.last_updated_at: Optional[str] = None
+        self.last_full_sync = 0.0
+        self.disk_version: Optional[str] = None
+        self._sync_lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None and len(self._snapshot.rows) > 0
+
+    def __len__(self) -> int:
+        return len(self._snapshot.rows) if self._snapshot else 0
+
+    def _build(self, rows: List[Dict[str, Any]], replace: bool) -> Tuple[Dict[str, Any], int]:
+        """Yeni görüntüyü mevcut indekse dokunmadan hazırlar (thread içinde çalışabilir)."""
+        rows_by_id = {} if replace else dict(self._rows_by_id)
+        vectors_by_id = {} if replace else dict(self._vectors_by_id)
+        last_updated_at = self.last_updated_at
+        applied = 0
+        for row in rows:
+            vector = _parse_embedding(row.get(LISTING_EMBEDDING_COLUMN))
+            if vector is None:
+                continue
+            listing_id = row.get(LISTING_ID_COLUMN)
+            rows_by_id[listing_id] = {k: v for k, v in row.items() if k != LISTING_EMBEDDING_COLUMN}
+            vectors_by_id[listing_id] = vector
+            updated_at = row.get(LISTING_UPDATED_COLUMN)
+            if updated_at and (last_updated_at is None or str(updated_at) > last_updated_at):
+                last_updated_at = str(updated_at)
+            applied += 1
+
+        ids = list(rows_by_id)
+        matrix = np.vstack([vectors_by_id[i] for i in ids]) if ids else np.zeros((0, 0), dtype=np.float32)
+        state = {
+            "snapshot": _Snapshot([rows_by_id[i] for i in ids], matrix),
+            "rows_by_id": rows_by_id,
+            "vectors_by_id": vectors_by_id,
+            "last_updated_at": last_updated_at,
+        }
+        return state, applied
+
+    def _publish(self, state: Dict[str, Any]) -> None:
+        """Hazır görüntüyü olay döngüsünde, arada await olmadan tek adımda yayınlar."""
+        self._snapshot = state["snapshot"]
+        self._rows_by_id, self._vectors_by_id = state["rows_by_id"], state["vectors_by_id"]
+        self.last_updated_at = state["last_updated_at"]
+        if "last_full_sync" in state:
+            self.last_full_sync = state["last_full_sync"]
+        if "version" in state:
+            self.disk_version = state["version"]
+
+    def upsert(self, rows: List[Dict[str, Any]], replace: bool = False) -> int:
+        """Satırları ekler/günceller ve yeni bir arama görüntüsü yayınlar. Eklenen satır sayısını döndürür."""
+        state, applied = self._build(rows, replace)
+        self._publish(state)
+        return applied
+
+    def _read_disk(self, directory: str) -> Optional[Dict[str, Any]]:
+        stored = open_store(directory)
+        if stored is None:
+            return None
+        matrix, rows, state, version = stored
+        return {
+            "snapshot": _Snapshot(rows, matrix),
+            "rows_by_id": {row.get(LISTING_ID_COLUMN): row for row in rows},
+            "vectors_by_id": {row.get(LISTING_ID_COLUMN): matrix[i] for i, row in enumerate(rows)},
+            "last_updated_at": state.get("last_updated_at"),
+            "last_full_sync": float(state.get("last_full_sync") or 0.0),
+            "version": version,
+        }
+
+    def load_from_disk(self, directory: Optional[str] = None) -> bool:
+        """Diskteki indeksi memmap ile açar; matris kopyalanmaz, worker'lar sayfa önbelleğini paylaşır."""
+        directory = LISTING_INDEX_DIR if directory is None else directory
+        if not directory:
+            return False
+        state = self._read_disk(directory)
+        if state is None:
+            return False
+        self._publish(state)
+        print(f"✅ Yerel ilan indeksi diskten açıldı: {len(self)} satır ({directory})")
+        return True
+
+    def save_to_disk(self, directory: Optional[str] = None) -> Optional[str]:
+        """Görüntüyü yeni bir sürüm olarak yazar ve sürüm adını döndürür."""
+        directory = LISTING_INDEX_DIR if directory is None else directory
+        snapshot = self._snapshot
+        if not directory or snapshot is None or not snapshot.rows:
+            return None
+        version_dir = write_store(directory, snapshot.matrix, snapshot.rows, {
+            "last_updated_at": self.last_updated_at,
+            "last_full_sync": self.last_full_sync,
+        })
+        return os.path.basename(version_dir)
+
+    def _persist(self) -> Optional[Dict[str, Any]]:
+        """Yazar ve yazılan sürümü memmap ile geri açar; böylece yazıcı worker da yığındaki
+        matris kopyası yerine diğer worker'larla aynı sayfa önbelleğini kullanır."""
+        if not self.save_to_disk():
+            return None
+        return self._read_disk(LISTING_INDEX_DIR)
+
+    async def follow(self) -> bool:
+        """Yazıcı olmayan worker için: CURRENT yeni bir sürümü gösteriyorsa onu açar."""
+        if not LISTING_INDEX_DIR:
+            return False
+        async with self._sync_lock:
+            version = current_version(LISTING_INDEX_DIR)
+            if version is None or version == self.disk_version:
+                return False
+            state = await asyncio.to_thread(self._read_disk, LISTING_INDEX_DIR)
+            if state is None:
+                return False
+            self._publish(state)
+        print(f"🔄 Yerel ilan indeksi yeni sürüme geçti: {version} ({len(self)} satır)")
+        return True
+
+    def search(self, query_embedding: List[float], filters: Dict[str, Any],
+               match_threshold: float, match_count: int) -> List[Dict[str, Any]]:
+        """search_listings_hybrid RPC'sinin yerel karşılığı."""
+        snapshot = self._snapshot
+        if snapshot is None or not snapshot.rows:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if not norm or query.shape[0] != snapshot.matrix.shape[1]:
+            return []
+        query /= norm
+
+        mask = np.ones(len(snapshot.rows), dtype=bool)
+        if filters.get("max_fiyat") is not None:
+            mask &= snapshot.prices <= float(filters["max_fiyat"])
+        if filters.get("min_fiyat") is not None:
+            mask &= snapshot.prices >= float(filters["min_fiyat"])
+        if filters.get("oda_sayisi"):
+            mask &= snapshot.rooms.exact(_normalize_room(filters["oda_sayisi"]))
+        if filters.get("lokasyon"):
+            needle = turkish_lower(str(filters["lokasyon"]).strip())
+            mask &= snapshot.ilce.containing(needle) | snapshot.mahalle.containing(needle)
+
+        if not mask.any():
+            return []
+        # Tek matris-vektör çarpımı; aday satırların kopyası (matrix[candidates]) oluşturulmaz
+        all_scores = snapshot.matrix @ query
+        candidates = np.nonzero(mask & (all_scores > match_threshold))[0]
+        scores = all_scores[candidates]
+        if candidates.size > match_count:
+            top = np.argpartition(-scores, match_count - 1)[:match_count]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores)
+        return [{**snapshot.rows[i], "similarity": float(s)} for i, s in zip(candidates[order], scores[order])]
+
+    async def sync(self, full: bool = False) -> int:
+        """Supabase'den updated_at deltası (veya tam tablo) çeker. Uygulanan satır sayısını döndürür.
+
+        JSON embedding ayrıştırma ve matris kurulumu thread'de yapılır; aramalar bu sırada
+        eski görüntüyü kullanır ve yeni görüntü tek adımda devreye girer.
+        """
+        async with self._sync_lock:
+            return await self._sync(full)
+
+    async def _sync(self, full: bool) -> int:
+        client = supabase_rpc.rpc_client
+        if client is None:
+            return 0
+        full = full or self.last_updated_at is None
+        rows: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            params = {
+                "select": "*",
+                "order": f"{LISTING_UPDATED_COLUMN}.asc,{LISTING_ID_COLUMN}.asc",
+                "limit": str(LISTING_SYNC_PAGE_SIZE),
+                "offset": str(offset),
+            }
+            if not full:
+                params[LISTING_UPDATED_COLUMN] = f"gt.{self.last_updated_at}"
+            page = await client.select(LISTING_TABLE, params)
+            rows.extend(page or [])
+            if not page or len(page) < LISTING_SYNC_PAGE_SIZE:
+                break
+            offset += LISTING_SYNC_PAGE_SIZE
+
+        if not rows and not full:
+            return 0
+        state, applied = await asyncio.to_thread(self._build, rows, full)
+        self._publish(state)
+        if full:
+            self.last_full_sync = time.time()
+        try:
+            stored = await asyncio.to_thread(self._persist)
+            if stored is not None:
+                self._publish(stored)
+        except Exception as e:
+            print(f"⚠️ Yerel ilan indeksi diske yazılamadı: {e}")
+        print(f"✅ Yerel ilan indeksi senkronize edildi ({'tam' if full else 'artımlı'}): {applied} satır, toplam {len(self)}")
+        return applied
+
+listing_index = ListingIndex()
+_sync_task: Optional[asyncio.Task] = None
+_writer_lock = None  # bu süreç yazıcıysa açık tutulan kilit dosyası
+
+def _is_writer() -> bool:
+    """Disk dizini yoksa her worker kendi indeksini senkronize eder. Varsa kilidi alan tek
+    süreç Supabase'den çeker ve yazar; diğerleri CURRENT işaretçisini izler. Yazıcı ölürse
+    kilit serbest kalır ve bir sonraki turda başka bir worker devralır."""
+    global _writer_lock
+    if not LISTING_INDEX_DIR:
+        return True
+    if _writer_lock is None:
+        _writer_lock = acquire_writer_lock(LISTING_INDEX_DIR)
+        if _writer_lock is not None:
+            print(f"✍️ Yerel ilan indeksi yazıcısı bu süreç (pid {os.getpid()})")
+    return _writer_lock is not None
+
+async def _sync_loop() -> None:
+    while True:
+        writer = True
+        try:
+            writer = _is_writer()
+            if writer:
+                full = time.time() - listing_index.last_full_sync >= LISTING_FULL_SYNC_INTERVAL
+                await listing_index.sync(full=full)
+            else:
+                await listing_index.follow()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Yerel ilan indeksi senkronizasyon hatası: {e}\n{traceback.format_exc()}")
+        await asyncio.sleep(LISTING_SYNC_INTERVAL if writer else LISTING_FOLLOW_INTERVAL)
+
+def start_background_sync() -> None:
+    """Yerel indeks açıksa periyodik senkronizasyon görevini başlatır (startup olayında)."""
+    global _sync_task
+    if LISTING_INDEX_ENABLED and _sync_task is None:
+        listing_index.load_from_disk()
+        _sync_task = asyncio.create_task(_sync_loop())
+        print("🗂️ Yerel ilan indeksi senkronizasyonu başlatıldı")
+
+async def stop_background_sync() -> None:
+    global _sync_task, _writer_lock
+    if _sync_task is not None:
+        _sync_task.cancel()
+        try:
+            await _sync_task
+        except asyncio.CancelledError:
+            pass
+        _sync_task = None
+    if _writer_lock is not None:
+        _writer_lock.close()
+        _writer_lock = None
@@ -0,0 +1,123 @@
+# listing_store.py - Yerel ilan indeksi için disk formatı (memmap float32 matris + sütunlu metadata)
+import os
+import json
+import time
+import shutil
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: tek süreç varsayılır, kilit her zaman alınır
+    fcntl = None
+
+# Dizin yapısı:
+#   <dizin>/CURRENT                -> aktif sürüm klasörünün adı (atomik olarak değiştirilir)
+#   <dizin>/WRITER.lock            -> Supabase'den senkronize edip yazan tek süreç bu kilidi tutar
+#   <dizin>/v<zaman>_<pid>/embeddings.f32  -> (satır x boyut) ham float32 matris
+#   <dizin>/v<zaman>_<pid>/meta.json       -> sütunlu satır verisi ve senkronizasyon durumu
+EMBEDDINGS_FILE = "embeddings.f32"
+META_FILE = "meta.json"
+CURRENT_FILE = "CURRENT"
+WRITER_LOCK_FILE = "WRITER.lock"
+# Başka bir worker'ın henüz yazmakta olduğu sürümü silmemek için eski sürümler bu süre sonra temizlenir
+STALE_VERSION_SECONDS = 3600
+
+def _to_columns(rows: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    keys: List[str] = []
+    for row in rows:
+        for key in row:
+            if key not in keys:
+                keys.append(key)
+    return {key: [row.get(key) for row in rows] for key in keys}
+
+def _from_columns(columns: Dict[str, List[Any]], count: int) -> List[Dict[str, Any]]:
+    return [{key: values[i] for key, values in columns.items()} for i in range(count)]
+
+def write_store(directory: str, matrix: np.ndarray, rows: List[Dict[str, Any]], state: Dict[str, Any]) -> str:
+    """İndeksi yeni bir sürüm klasörüne yazar ve CURRENT işaretçisini atomik olarak günceller."""
+    os.makedirs(directory, exist_ok=True)
+    version = f"v{time.time_ns()}_{os.getpid()}"
+    version_dir = os.path.join(directory, version)
+    os.makedirs(version_dir)
+
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    with open(os.path.join(version_dir, EMBEDDINGS_FILE), "wb") as f:
+        matrix.tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    meta = {
+        "count": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        "state": state,
+        "columns": _to_columns(rows),
+    }
+    with open(os.path.join(version_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+
+    pointer_tmp = os.path.join(directory, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(pointer_tmp, "w") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, os.path.join(directory, CURRENT_FILE))
+
+    _remove_stale_versions(directory, keep=version)
+    return version_dir
+
+def _remove_stale_versions(directory: str, keep: str) -> None:
+    now = time.time()
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name == keep or not name.startswith("v") or not os.path.isdir(path):
+            continue
+        try:
+            if now - os.path.getmtime(path) > STALE_VERSION_SECONDS:
+                # Açık memmap'ler (diğer worker'lar) silinen dosyayı okumaya devam edebilir
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+def acquire_writer_lock(directory: str) -> Optional[IO[str]]:
+    """Yazıcı kilidini beklemeden almaya çalışır. Alınırsa süreç boyunca açık tutulacak dosyayı,
+    başka bir süreç tutuyorsa None döndürür. Kilit, süreç ölünce işletim sistemince bırakılır."""
+    os.makedirs(directory, exist_ok=True)
+    handle = open(os.path.join(directory, WRITER_LOCK_FILE), "a")
+    if fcntl is None:
+        return handle
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+def current_version(directory: str) -> Optional[str]:
+    """CURRENT işaretçisinin gösterdiği sürüm klasörünün adı. Yoksa None."""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def open_store(directory: str) -> Optional[Tuple[np.ndarray, List[Dict[str, Any]], Dict[str, Any], str]]:
+    """Aktif sürümü açar: (salt okunur memmap matris, satırlar, durum, sürüm). Yoksa None."""
+    version = current_version(directory)
+    if version is None:
+        return None
+    version_dir = os.path.join(directory, version)
+    try:
+        with open(os.path.join(version_dir, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    count, dim = meta["count"], meta["dim"]
+    if count == 0 or dim == 0:
+        return None
+    matrix = np.memmap(os.path.join(version_dir, EMBEDDINGS_FILE), dtype=np.float32, mode="r", shape=(count, dim))
+    return matrix, _from_columns(meta["columns"], count), meta.get("state", {}), version
@@ -1,12 +1,11 @@
 import os
 import json
-import time
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 
 from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from dotenv import load_dotenv
@@ -28,6 +27,23 @@ from pdf_handler import router as pdf_router
 from elevenlabs_handler import router as elevenlabs_router
 import ask_handler
 import search_handler
+import http_clients
+import listing_index
+import openai_scheduler
+import resilience
+import single_flight
+from stage_timings import timing_summary
+from embedding_cache import embedding_cache
+from image_cache import image_cache
+from response_cache import response_cache
+from search_cache import search_cache
+from tts_cache import tts_cache
+from pdf_prefetch import pdf_prefetcher
+from branding_assets import branding_assets
+from render_pool import pdf_render_pool
+from filter_extractor import filter_stats
+from intent_classifier import intent_stats
+from rate_limiter import rate_limiter, retry_after_header
 
 # ---- Pydantic Modelleri ----
 class ChatRequest(BaseModel):
@@ -56,34 +72,20 @@ app.add_middleware(
 )
 
 # ---- Rate Limiting ----
-# Not: Bu yapı tek bir worker'da çalışır. Ölçeklenmiş ortamlar için Redis gibi
-# merkezi bir çözüm daha uygun olacaktır.
-request_counts = {}
-
+# Route bazlı limitler ve backend (memory / redis) rate_limiter.py içinde ayarlanır.
 @app.middleware("http")
 async def rate_limit_middleware(request: Request, call_next):
-    if "/chat" in request.url.path:
-        client_ip = request.client.host if request.client else "unknown"
-        current_minute = int(time.time()) // 60
-        key = f"{client_ip}:{current_minute}"
-        
-        request_counts[key] = request_counts.get(key, 0) + 1
-        
-        if request_counts[key] > 45: # Limiti biraz artıralım
-            return JSONResponse(
-                status_code=429,
-                content={"error": "Çok fazla istek. Lütfen bir dakika bekleyin."}
-            )
-            
-        # Eski kayıtları temizle (2 dakika öncesini sil)
-        old_minute = current_minute - 2
-        for k in list(request_counts.keys()):
-            try:
-                if int(k.split(':')[1]) < old_minute:
-                    del request_counts[k]
-            except (ValueError, IndexError):
-                del request_counts[k] # Hatalı formatlı anahtarı sil
-    
+    client_ip = request.client.host if request.client else "unknown"
+    # OpenAI zamanlayıcısındaki adil kuyruk istemciyi bu değerle tanır
+    openai_scheduler.current_client.set(client_ip)
+    result = await rate_limiter.check(request.url.path, client_ip)
+    if result is not None and not result.allowed:
+        return JSONResponse(
+            status_code=429,
+            content={"error": "Çok fazla istek. Lütfen bir dakika bekleyin."},
+            headers={"Retry-After": retry_after_header(result)}
+        )
+
     response = await call_next(request)
     return response
 
@@ -110,8 +112,23 @@ async def startup_event():
         print("⚠️ Supabase bilgileri eksik veya kütüphane yüklü değil.")
         app.state.supabase_client = None
     
+    await http_clients.registry.startup()
+    listing_index.start_background_sync()
+    pdf_prefetcher.start()
+    # Marka görselleri arka planda yüklenir; startup ağ beklemez
+    branding_assets.preload_in_background()
+    
     print("=== Başlatma Tamamlandı ===\n")
 
+# ---- Uygulama Kapanış Olayı ----
+@app.on_event("shutdown")
+async def shutdown_event():
+    await listing_index.stop_background_sync()
+    await pdf_prefetcher.stop()
+    pdf_render_pool.shutdown()
+    await http_clients.registry.shutdown()
+    await rate_limiter.close()
+
 # ---- Router Kaydı ----
 app.include_router(image_router, prefix="", tags=["Image Generation"])
 app.include_router(pdf_router, prefix="", tags=["PDF Generation"])
@@ -163,6 +180,40 @@ async def chat(payload: ChatRequest):
             }
         )
 
+# ---- Akışlı (SSE) Chat Endpoint'i ----
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"  # Proxy'lerin (nginx vb.) akışı tamponlamasını engeller
+}
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Bir olayı text/event-stream formatına çevirir."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/chat/stream", tags=["Core AI"])
+async def chat_stream(payload: ChatRequest):
+    """/chat ile aynı akış; yanıt parçaları oluştukça Server-Sent Events olarak gönderilir.
+
+    `delta` olayları metin parçalarını, son `done` olayı tam yanıtı,
+    `is_listing_response` bilgisini ve metadata'yı taşır.
+    """
+    async def event_source():
+        try:
+            async for event in ask_handler.stream_answer_question(
+                question=payload.question,
+                mode=payload.mode,
+                conversation_history=payload.conversation_history
+            ):
+                yield _sse_event(event["event"], event["data"])
+        except Exception as e:
+            print(f"❌ Chat Stream Hatası: {e}")
+            yield _sse_event("error", {
+                "reply": "Üzgünüm, sunucuda beklenmedik bir hata oluştu. Lütfen daha sonra tekrar deneyin.",
+                "is_listing_response": False
+            })
+
+    return StreamingResponse(event_source(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 # ---- Web Araması Endpoint'i ----
 @app.post("/web-search", tags=["Core AI"])
 async def web_search(payload: WebSearchRequest):
@@ -181,6 +232,22 @@ async def web_search(payload: WebSearchRequest):
             }
         )
 
+@app.post("/web-search/stream", tags=["Core AI"])
+async def web_search_stream(payload: WebSearchRequest):
+    """Web aramasının akışlı sürümü: önce kaynaklar (`sources`), sonra özet parçaları (`delta`), en sonda `done`."""
+    async def event_source():
+        try:
+            async for event in search_handler.stream_web_search_answer(payload.question, payload.mode):
+                yield _sse_event(event["event"], event["data"])
+        except Exception as e:
+            print(f"❌ Web Search Stream Hatası: {e}")
+            yield _sse_event("error", {
+                "reply": "Web araması sırasında bir hata oluştu.",
+                "is_listing_response": False
+            })
+
+    return StreamingResponse(event_source(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 # ---- Dashboard ve İstatistikler ----
 @app.get("/statistics/simple", tags=["Dashboard"])
 async def get_simple_statistics():
@@ -207,6 +274,38 @@ async def get_simple_statistics():
         }
     }
 
+@app.get("/statistics/latency", tags=["Dashboard"])
+async def get_latency_statistics():
+    """Sohbet akışındaki aşamaların (sınıflandırma, embedding, arama, yanıt) p50/p95 sürelerini döndürür."""
+    return {
+        "status": "success",
+        "speculative_fanout": ask_handler.SPECULATIVE_FANOUT,
+        "classifier_mode": ask_handler.CLASSIFIER_MODE,
+        "filter_extraction": filter_stats.summary(),
+        "intent_classification": intent_stats.summary(),
+        "openai_scheduler": openai_scheduler.scheduler.summary(),
+        "pdf_render_pool": pdf_render_pool.summary(),
+        "upstreams": resilience.summary(),
+        "stages": timing_summary()
+    }
+
+@app.get("/statistics/cache", tags=["Dashboard"])
+async def get_cache_statistics():
+    """Önbelleklerin isabet/ıskalama sayaçlarını döndürür."""
+    return {
+        "status": "success",
+        "caches": {
+            "embedding": embedding_cache.summary(),
+            "response": response_cache.summary(),
+            "web_search": search_cache.summary(),
+            "image": image_cache.summary(),
+            "tts": tts_cache.summary()
+        },
+        "coalescing": single_flight.summary(),
+        "branding_assets": branding_assets.summary(),
+        "pdf_prefetch": pdf_prefetcher.summary()
+    }
+
 @app.get("/dashboard", include_in_schema=False)
 async def serve_dashboard():
     """Dashboard HTML sayfasını sunar."""
@@ -0,0 +1,272 @@
+# openai_scheduler.py - OpenAI çağrıları için kabul (admission) zamanlayıcısı
+import os
+import time
+import asyncio
+import contextvars
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+import resilience
+from stage_timings import record_stage
+
+# ---- Ayarlar ----
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+# Model başına dakikalık istek ve token bütçeleri (hesap kademesine göre ayarlayın; 0 = sınırsız)
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "200000"))
+# Kuyrukta bu süreden uzun bekleyen çağrı OpenAIQueueTimeout ile düşürülür
+OPENAI_QUEUE_TIMEOUT = float(os.getenv("OPENAI_QUEUE_TIMEOUT", "60"))
+# Zaman aşımı bundan uzun olan yanıt (completion) çağrıları tekrar denenmez: denemeler ve aradaki
+# beklemeler boyunca slot tutulur (120 sn x 3 deneme ≈ 6 dk)
+OPENAI_LONG_CALL_TIMEOUT = float(os.getenv("OPENAI_LONG_CALL_TIMEOUT", "30"))
+
+# Küçük sayı = yüksek öncelik. Kısa sınıflandırma/embedding çağrıları uzun yanıtların önüne geçer.
+PRIORITY_CLASSIFIER = 0
+PRIORITY_COMPLETION = 1
+_PRIORITY_LEVELS = 2
+
+# İstemci IP'si middleware tarafından ayarlanır; adil kuyruk bu anahtara göre sıralar
+current_client: contextvars.ContextVar[str] = contextvars.ContextVar("openai_client_key", default="anonymous")
+
+class OpenAIQueueTimeout(Exception):
+    """Çağrı OPENAI_QUEUE_TIMEOUT süresi içinde kabul edilemediğinde."""
+
+def estimate_tokens(request: Dict[str, Any]) -> int:
+    """İstek için kabaca token tahmini: girdi karakterleri / 4 + azami çıktı."""
+    chars = 0
+    for message in request.get("messages") or []:
+        chars += len(str(message.get("content") or ""))
+    for item in request.get("input") or []:
+        chars += len(str(item))
+    return chars // 4 + int(request.get("max_tokens") or 0) + 1
+
+class _Budget:
+    """Son 60 saniyedeki istek/token kullanımını tutar (model başına)."""
+
+    WINDOW = 60.0
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._events: Deque[List[float]] = deque()  # [zaman, token]
+        self._tokens = 0.0
+
+    def _trim(self, now: float) -> None:
+        while self._events and self._events[0][0] <= now - self.WINDOW:
+            self._tokens -= self._events.popleft()[1]
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        """Bütçe uygunsa 0, değilse en eski kaydın pencereden çıkmasına kalan süre."""
+        self._trim(now)
+        if not self._events:
+            return 0.0  # tek başına bütçeyi aşan istek de boş pencerede kabul edilir
+        over_rpm = self.rpm and len(self._events) + 1 > self.rpm
+        over_tpm = self.tpm and self._tokens + tokens > self.tpm
+        if not (over_rpm or over_tpm):
+            return 0.0
+        return max(0.01, self._events[0][0] + self.WINDOW - now)
+
+    def consume(self, tokens: int, now: float) -> List[float]:
+        entry = [now, float(tokens)]
+        self._events.append(entry)
+        self._tokens += tokens
+        return entry
+
+    def adjust(self, entry: List[float], tokens: int) -> None:
+        """Tahmini token sayısını gerçek kullanımla düzeltir."""
+        self._trim(time.monotonic())
+        if entry[0] > time.monotonic() - self.WINDOW:  # kayıt hâlâ penceredeyse toplamı da düzelt
+            self._tokens += tokens - entry[1]
+        entry[1] = float(tokens)
+
+class _Waiter:
+    __slots__ = ("future", "model", "tokens", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, model: str, tokens: int):
+        self.future = future
+        self.model = model
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+
+class Lease:
+    """Kabul edilen çağrının kaydı; gerçek token kullanımı `record_usage` ile bildirilir."""
+
+    def __init__(self, budget: _Budget, entry: List[float]):
+        self._budget = budget
+        self._entry = entry
+
+    def record_usage(self, response: Any) -> None:
+        total = getattr(getattr(response, "usage", None), "total_tokens", None)
+        if isinstance(total, int):
+            self._budget.adjust(self._entry, total)
+
+class _Slot:
+    def __init__(self, scheduler: "OpenAIScheduler", model: str, tokens: int, priority: int):
+        self._scheduler = scheduler
+        self._model = model
+        self._tokens = tokens
+        self._priority = priority
+
+    async def __aenter__(self) -> Lease:
+        return await self._scheduler.acquire(self._model, self._tokens, self._priority)
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._scheduler.release()
+
+class OpenAIScheduler:
+    """Tüm OpenAI çağrılarının önünde duran kabul kuyruğu.
+
+    - Aynı anda en fazla `max_concurrency` çağrı yürütülür.
+    - Model başına RPM/TPM bütçesi aşılacaksa çağrı pencere boşalana kadar bekletilir.
+    - Her öncelik seviyesinde istemciler (IP) arasında round-robin yapılır; tek bir
+      kullanıcının patlaması diğerlerini kuyrukta aç bırakmaz.
+    """
+
+    def __init__(self, max_concurrency: int = OPENAI_MAX_CONCURRENCY, rpm: int = OPENAI_RPM_LIMIT,
+                 tpm: int = OPENAI_TPM_LIMIT, queue_timeout: float = OPENAI_QUEUE_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.rpm = rpm
+        self.tpm = tpm
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._queues: List["OrderedDict[str, Deque[_Waiter]]"] = [OrderedDict() for _ in range(_PRIORITY_LEVELS)]
+        self._budgets: Dict[str, _Budget] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.stats = {"admitted": 0, "queued": 0, "timeouts": 0, "max_queue_depth": 0}
+
+    def _budget(self, model: str) -> _Budget:
+        budget = self._budgets.get(model)
+        if budget is None:
+            budget = self._budgets[model] = _Budget(self.rpm, self.tpm)
+        return budget
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for level in self._queues for waiters in level.values() for w in waiters if not w.future.done())
+
+    def slot(self, model: str, estimated_tokens: int, priority: int = PRIORITY_COMPLETION) -> _Slot:
+        return _Slot(self, model, estimated_tokens, priority)
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        for level in self._queues:
+            while level:
+                client, waiters = next(iter(level.items()))
+                while waiters and waiters[0].future.done():
+                    waiters.popleft()  # zaman aşımı/iptal edilen bekleyenler
+                if not waiters:
+                    del level[client]
+                    continue
+                return waiters[0]
+        return None
+
+    def _pop_waiter(self, waiter: _Waiter) -> None:
+        for level in self._queues:
+            for client, waiters in level.items():
+                if waiters and waiters[0] is waiter:
+                    waiters.popleft()
+                    if waiters:
+                        level.move_to_end(client)  # round-robin: sıradaki istemciye geç
+                    else:
+                        del level[client]
+                    return
+
+    def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self.active < self.max_concurrency:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            now = time.monotonic()
+            budget = self._budget(waiter.model)
+            delay = budget.wait_time(waiter.tokens, now)
+            if delay > 0:
+                self._timer = loop.call_later(delay, self._dispatch)
+                return
+            self._pop_waiter(waiter)
+            self._grant(waiter.future, budget, waiter.tokens, now)
+            record_stage("openai_queue_wait", now - waiter.enqueued_at)
+
+    def _grant(self, future: asyncio.Future, budget: _Budget, tokens: int, now: float) -> None:
+        lease = Lease(budget, budget.consume(tokens, now))
+        self.active += 1
+        self.stats["admitted"] += 1
+        future.set_result(lease)
+
+    async def acquire(self, model: str, estimated_tokens: int, priority: int = PRIORITY_COMPLETION) -> Lease:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        now = time.monotonic()
+        budget = self._budget(model)
+        if self.active < self.max_concurrency and self._next_waiter() is None and budget.wait_time(estimated_tokens, now) == 0:
+            self._grant(future, budget, estimated_tokens, now)
+            record_stage("openai_queue_wait", 0.0)
+            return future.result()
+
+        priority = min(max(priority, 0), _PRIORITY_LEVELS - 1)
+        self._queues[priority].setdefault(current_client.get(), deque()).append(_Waiter(future, model, estimated_tokens))
+        self.stats["queued"] += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue_depth)
+        self._dispatch()
+        try:
+            done, _ = await asyncio.wait({future}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+        if not done:
+            self._abandon(future)
+            self.stats["timeouts"] += 1
+            raise OpenAIQueueTimeout(f"OpenAI kuyruğunda {self.queue_timeout:.0f} saniyeden uzun beklendi")
+        return future.result()
+
+    def _abandon(self, future: asyncio.Future) -> None:
+        if future.done() and not future.cancelled():
+            self.release()  # slot tam iptal anında verilmişti; geri bırak
+        else:
+            future.cancel()
+
+    def release(self) -> None:
+        self.active = max(0, self.active - 1)
+        try:
+            self._dispatch()
+        except RuntimeError:
+            pass  # olay döngüsü kapanmış
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth,
+            "rpm_limit": self.rpm,
+            "tpm_limit": self.tpm,
+            **self.stats,
+        }
+
+scheduler = OpenAIScheduler()
+
+def openai_slot(request: Dict[str, Any], priority: int = PRIORITY_COMPLETION) -> _Slot:
+    """`async with openai_slot(kwargs) as lease:` ile OpenAI isteği için sıra alır."""
+    return scheduler.slot(str(request.get("model", "")), estimate_tokens(request), priority)
+
+async def chat_completion(client: Any, priority: int = PRIORITY_COMPLETION, **request) -> Any:
+    """`client.chat.completions.create` çağrısını zamanlayıcıdan sıra alarak yapar (stream olmayan).
+
+    Geçici hatalar resilience katmanında tekrar denenir; kısa sınıflandırıcı çağrıları için
+    HEDGE_AFTER_OPENAI tanımlıysa hedging uygulanır. Zaman aşımı OPENAI_LONG_CALL_TIMEOUT'tan
+    uzun yanıt çağrıları tek denemeyle yapılır.
+    """
+    hedge_after = resilience.hedge_delay("openai") if priority == PRIORITY_CLASSIFIER else 0.0
+    long_call = priority == PRIORITY_COMPLETION and float(request.get("timeout") or 0) > OPENAI_LONG_CALL_TIMEOUT
+    async with openai_slot(request, priority) as lease:
+        response = await resilience.call("openai", lambda: client.chat.completions.create(**request),
+                                         attempts=1 if long_call else None, hedge_after=hedge_after)
+        lease.record_usage(response)
+        return response
+
+async def create_embedding(client: Any, **request) -> Any:
+    async with openai_slot(request, PRIORITY_CLASSIFIER) as lease:
+        response = await resilience.call("openai", lambda: client.embeddings.create(**request))
+        lease.record_usage(response)
+        return response
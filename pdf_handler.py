@@ -14,6 +14,12 @@ from reportlab.lib.utils import ImageReader
 from reportlab.lib.colors import HexColor
 from PIL import Image
 
+from branding_assets import branding_assets
+from http_clients import get_client
+from render_pool import RenderPoolSaturated, pdf_render_pool
+import resilience
+import single_flight
+
 # ---- PDF Saklama Dizini ----
 APP_ROOT = Path(__file__).parent
 PDF_STORAGE_DIR = Path('./pdf_storage')
@@ -39,8 +45,10 @@ def clean_turkish_chars(text: str) -> str:
     return text
 
 async def scrape_property_with_firecrawl(property_id: str) -> Dict:
-    """FireCrawl kullanarak REMAX ilan verilerini çeker"""
-    
+    """FireCrawl kullanarak REMAX ilan verilerini çeker (aynı ilan için eş zamanlı istekler birleştirilir)"""
+    return await single_flight.group("firecrawl").do(property_id, lambda: _scrape_property(property_id))
+
+async def _scrape_property(property_id: str) -> Dict:
     if not FIRECRAWL_API_KEY:
         raise HTTPException(status_code=500, detail="FireCrawl API anahtarı eksik")
     
@@ -60,13 +68,17 @@ async def scrape_property_with_firecrawl(property_id: str) -> Dict:
         "onlyMainContent": False
     }
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.post(FIRECRAWL_URL, json=payload, headers=headers)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPError as e:
-            raise HTTPException(status_code=500, detail=f"FireCrawl hatası: {str(e)}")
+    async def scrape() -> httpx.Response:
+        return resilience.check_status(await get_client("firecrawl").post(FIRECRAWL_URL, json=payload, headers=headers))
+
+    try:
+        response = await resilience.call("firecrawl", scrape)
+        response.raise_for_status()
+        return response.json()
+    except resilience.CircuitOpenError:
+        raise HTTPException(status_code=503, detail="FireCrawl servisi geçici olarak kullanılamıyor, lütfen biraz sonra tekrar deneyin")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail=f"FireCrawl hatası: {str(e)}")
 
 def parse_property_data(firecrawl_data: Dict) -> Dict:
     """FireCrawl verisinden gerekli bilgileri parse eder"""
@@ -128,7 +140,18 @@ def parse_property_data(firecrawl_data: Dict) -> Dict:
     }
 
 async def create_compact_pdf(property_data: Dict) -> bytes:
-    """Parse edilmiş veriden kompakt tek sayfalık PDF oluşturur"""
+    """Parse edilmiş veriden kompakt tek sayfalık PDF oluşturur (render, olay döngüsü dışında havuzda yapılır).
+
+    Havuz doluysa RenderPoolSaturated fırlatılır.
+    """
+    # Marka görselleri bellekteki önbellekten gelir (ilk kullanım dışında ağa çıkılmaz)
+    assets = await branding_assets.snapshot()
+    return await pdf_render_pool.run(render_compact_pdf, property_data,
+                                     {name: asset.data for name, asset in assets.items()}, datetime.now())
+
+def render_compact_pdf(property_data: Dict, assets: Dict[str, bytes], generated_at: Optional[datetime] = None) -> bytes:
+    """Saf (senkron, ağ/disk kullanmayan) render: parse edilmiş veri + önceden yüklenmiş
+    görsel baytlarından PDF üretir. Thread veya process havuzunda çalıştırılabilir."""
     
     buffer = io.BytesIO()
     c = canvas.Canvas(buffer, pagesize=A4)
@@ -150,13 +173,8 @@ async def create_compact_pdf(property_data: Dict) -> bytes:
     
     # Sibel Hanım'ın fotoğrafı - SOL TARAFA
     try:
-        photo_url = "https://www.sibelgpt.com/sibel-kazan-midilli.jpg"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(photo_url, timeout=10)
-        
-        if response.status_code == 200:
-            photo_data = io.BytesIO(response.content)
-            img = ImageReader(photo_data)
+        if "photo" in assets:
+            img = ImageReader(io.BytesIO(assets["photo"]))
             
             # Fotoğrafı header içinde sol tarafa yerleştir
             photo_height = 70
@@ -179,13 +197,8 @@ async def create_compact_pdf(property_data: Dict) -> bytes:
     
     # REMAX logosu - SAĞ TARAFA
     try:
-        logo_url = "https://www.sibelgpt.com/remax-logo.png"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(logo_url, timeout=10)
-        
-        if response.status_code == 200:
-            logo_data = io.BytesIO(response.content)
-            logo_img = ImageReader(logo_data)
+        if "logo" in assets:
+            logo_img = ImageReader(io.BytesIO(assets["logo"]))
             
             # Logoyu header içinde sağ tarafa yerleştir
             logo_height = 50
@@ -307,7 +320,7 @@ async def create_compact_pdf(property_data: Dict) -> bytes:
     
     c.setFillColor('black')
     c.setFont("Helvetica", 10)
-    c.drawCentredString(width/2, 15, f"Bu PDF {datetime.now().strftime('%d.%m.%Y %H:%M')} tarihinde olusturulmustur.")
+    c.drawCentredString(width/2, 15, f"Bu PDF {(generated_at or datetime.now()).strftime('%d.%m.%Y %H:%M')} tarihinde olusturulmustur.")
     
     c.save()
     buffer.seek(0)
@@ -334,7 +347,21 @@ async def generate_property_pdf(property_id: str):
             }
         )
     
-    # PDF yoksa oluştur ve kaydet
+    # PDF yoksa oluştur ve kaydet (aynı ilan için eş zamanlı tıklamalar tek üretimi bekler)
+    pdf_bytes = await single_flight.group("property_pdf").do(property_id, lambda: build_property_pdf(property_id))
+
+    # 5. PDF'i döndür
+    return Response(
+        content=pdf_bytes,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f"attachment; filename={property_id}_ilan.pdf"
+        }
+    )
+
+async def build_property_pdf(property_id: str) -> bytes:
+    """İlan verisini çeker, PDF'i üretir ve PDF_STORAGE_DIR'e kaydeder. Hatalar HTTPException olarak döner."""
+    pdf_path = PDF_STORAGE_DIR / f"{property_id}.pdf"
     try:
         print(f"🔍 PDF bulunamadı, yeni PDF oluşturuluyor: {property_id}")
         # 1. FireCrawl ile veriyi çek
@@ -353,25 +380,23 @@ async def generate_property_pdf(property_id: str):
     # 3. Kompakt PDF oluştur
     try:
         pdf_bytes = await create_compact_pdf(property_data)
+    except RenderPoolSaturated:
+        raise HTTPException(status_code=503, detail="PDF servisi şu anda yoğun, lütfen birkaç saniye sonra tekrar deneyin",
+                            headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PDF oluşturma hatası: {str(e)}")
     
-    # 4. PDF'i dosyaya kaydet
+    # 4. PDF'i dosyaya kaydet (yarım yazılmış dosya okunmasın diye geçici dosya + os.replace)
     try:
-        with open(pdf_path, "wb") as f:
+        tmp_path = pdf_path.with_name(f"{pdf_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
             f.write(pdf_bytes)
+        os.replace(tmp_path, pdf_path)
         print(f"💾 PDF başarıyla kaydedildi: {property_id}.pdf")
     except Exception as e:
         print(f"❌ PDF kaydetme hatası: {str(e)}")
     
-    # 5. PDF'i döndür
-    return Response(
-        content=pdf_bytes,
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename={property_id}_ilan.pdf"
-        }
-    )
+    return pdf_bytes
 
 @router.get("/test-firecrawl/{property_id}")
 async def test_firecrawl(property_id: str):
@@ -0,0 +1,183 @@
+# pdf_prefetch.py - Sohbette listelenen ilanların PDF'lerini arka planda önceden üretme
+import os
+import re
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from cachetools import LRUCache
+
+import single_flight
+from config import env_flag
+
+# ---- Ayarlar ----
+# Varsayılan kapalı: her iş ücretli bir FireCrawl taraması başlatır. Açılsa bile
+# PDF_PREFETCH_ID_FIELD tanımlı değilse çalışmaz.
+PDF_PREFETCH_ENABLED = env_flag("PDF_PREFETCH_ENABLED", False)
+# Sohbet yanıtındaki ilk N ilan için PDF hazırlanır
+PDF_PREFETCH_TOP_N = int(os.getenv("PDF_PREFETCH_TOP_N", "3"))
+# Aynı anda çalışan üretim sayısı (FireCrawl + render); kullanıcı tıklamalarına kapasite bırakılır
+PDF_PREFETCH_WORKERS = int(os.getenv("PDF_PREFETCH_WORKERS", "2"))
+PDF_PREFETCH_QUEUE_SIZE = int(os.getenv("PDF_PREFETCH_QUEUE_SIZE", "100"))
+# Kuyrukta bundan uzun bekleyen iş atlanır (kullanıcı büyük ihtimalle başka aramaya geçmiştir)
+PDF_PREFETCH_MAX_WAIT = float(os.getenv("PDF_PREFETCH_MAX_WAIT", "300"))
+# İlan satırında REMAX portföy numarasını taşıyan sütun (remax.com.tr/portfoy/{no} ve
+# /generate-property-pdf/{property_id} bu numarayı kullanır). Satırın birincil anahtarı (id)
+# portföy numarası değildir; yanlış URL'ler taranmasın diye varsayılan yoktur.
+PDF_PREFETCH_ID_FIELD = os.getenv("PDF_PREFETCH_ID_FIELD", "").strip()
+# Son listesi hatırlanan en fazla istemci sayısı (yeni sohbet turu eski listenin işlerini iptal eder)
+PDF_PREFETCH_MAX_OWNERS = int(os.getenv("PDF_PREFETCH_MAX_OWNERS", "1024"))
+
+_PROPERTY_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+class PdfPrefetcher:
+    """Sınırlı kuyruk + sabit sayıda worker ile PDF ön üretimi.
+
+    - Tekilleştirme: kuyrukta/çalışmakta olan veya diskte zaten bulunan ilan tekrar eklenmez;
+      kullanıcı tıklaması ile ön üretim aynı "property_pdf" single-flight grubunu paylaşır.
+    - Kuyruk doluysa yeni iş atılır (sohbet yanıtı hiçbir zaman beklemez).
+    - İptal: aynı istemcinin yeni sohbet turu ilan listesini değiştirince önceki listeden
+      henüz başlamamış işler `cancel` ile düşürülür; `stop` worker'ları iptal eder; süresi
+      geçmiş (PDF_PREFETCH_MAX_WAIT) işler çalıştırılmaz.
+    """
+
+    def __init__(self, build: Callable[[str], Awaitable[Any]], exists: Callable[[str], bool],
+                 enabled: bool = PDF_PREFETCH_ENABLED, workers: int = PDF_PREFETCH_WORKERS,
+                 queue_size: int = PDF_PREFETCH_QUEUE_SIZE, max_wait: float = PDF_PREFETCH_MAX_WAIT,
+                 id_field: str = PDF_PREFETCH_ID_FIELD, clock: Callable[[], float] = time.monotonic):
+        self._build = build
+        self._exists = exists
+        self.enabled = enabled and bool(id_field)
+        if enabled and not id_field:
+            print("⚠️ PDF ön üretimi kapalı: PDF_PREFETCH_ID_FIELD (portföy numarası sütunu) tanımlı değil")
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.id_field = id_field
+        self._clock = clock
+        self._queue: Optional[asyncio.Queue] = None  # olay döngüsü içinde oluşturulur
+        self._tasks: List[asyncio.Task] = []
+        self._pending: Set[str] = set()    # kuyrukta veya çalışmakta
+        self._cancelled: Set[str] = set()
+        self._by_owner: LRUCache = LRUCache(maxsize=PDF_PREFETCH_MAX_OWNERS)  # istemci -> son ilan listesi
+        self._missing_field_logged = False
+        self.stats = {"enqueued": 0, "deduplicated": 0, "already_stored": 0, "dropped": 0,
+                      "expired": 0, "cancelled": 0, "built": 0, "failed": 0, "missing_id": 0}
+
+    def start(self) -> None:
+        if not self.enabled or self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        print(f"📄 PDF ön üretim kuyruğu başlatıldı ({self.workers} worker)")
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._queue = None
+        self._pending.clear()
+        self._cancelled.clear()
+        self._by_owner.clear()
+
+    def enqueue(self, property_id: str) -> bool:
+        """İşi beklemeden kuyruğa ekler; eklenmediyse (tekrar, diskte var, kuyruk dolu) False döner."""
+        if not self.enabled or not _PROPERTY_ID_RE.match(property_id or ""):
+            return False
+        if property_id in self._pending:
+            self._cancelled.discard(property_id)  # iptal edilmiş iş yeniden istendi
+            self.stats["deduplicated"] += 1
+            return False
+        if self._exists(property_id):
+            self.stats["already_stored"] += 1
+            return False
+        if not self._tasks:
+            self.start()
+        try:
+            self._queue.put_nowait((property_id, self._clock()))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            return False
+        self._pending.add(property_id)
+        self._cancelled.discard(property_id)
+        self.stats["enqueued"] += 1
+        return True
+
+    def enqueue_listings(self, listings: Iterable[Dict[str, Any]], limit: int = PDF_PREFETCH_TOP_N,
+                         owner: Optional[str] = None) -> List[str]:
+        """İlan listesinin ilk `limit` kaydını kuyruğa ekler; eklenen ilan numaralarını döndürür.
+
+        `owner` (istemci anahtarı) verilirse aynı istemcinin önceki listesinden yeni listede
+        olmayan ve henüz başlamamış işler iptal edilir.
+        """
+        if not self.enabled:
+            return []
+        top = list(listings or [])[:limit]
+        property_ids = []
+        for listing in top:
+            property_id = str(listing.get(self.id_field) or "").strip()
+            if not property_id:
+                # Portföy numarası olmayan ilan atlanır (yanlış URL taranmaz)
+                self.stats["missing_id"] += 1
+                if self.id_field not in listing and not self._missing_field_logged:
+                    self._missing_field_logged = True
+                    print(f"⚠️ PDF ön üretimi: ilan satırında '{self.id_field}' alanı yok "
+                          f"(mevcut alanlar: {', '.join(sorted(listing))}); PDF_PREFETCH_ID_FIELD kontrol edilmeli")
+                continue
+            property_ids.append(property_id)
+        if owner is not None:
+            wanted = set(property_ids)
+            self.cancel([pid for pid in self._by_owner.get(owner, ()) if pid not in wanted])
+            self._by_owner[owner] = property_ids
+        return [property_id for property_id in property_ids if self.enqueue(property_id)]
+
+    def cancel(self, property_ids: Iterable[str]) -> None:
+        """Henüz başlamamış işleri iptal eder (çalışmakta olan üretim tamamlanır)."""
+        for property_id in property_ids:
+            if property_id in self._pending:
+                self._cancelled.add(property_id)
+
+    async def _worker(self) -> None:
+        queue = self._queue
+        while True:
+            property_id, enqueued_at = await queue.get()
+            try:
+                await self._run(property_id, enqueued_at)
+            finally:
+                self._pending.discard(property_id)
+                queue.task_done()
+
+    async def _run(self, property_id: str, enqueued_at: float) -> None:
+        if property_id in self._cancelled:
+            self._cancelled.discard(property_id)
+            self.stats["cancelled"] += 1
+            return
+        if self._clock() - enqueued_at > self.max_wait:
+            self.stats["expired"] += 1
+            return
+        if self._exists(property_id):  # bu arada kullanıcı tıklamış olabilir
+            self.stats["already_stored"] += 1
+            return
+        try:
+            await single_flight.group("property_pdf").do(property_id, lambda: self._build(property_id))
+            self.stats["built"] += 1
+            print(f"📄 PDF önceden hazırlandı: {property_id}")
+        except Exception as e:
+            self.stats["failed"] += 1
+            print(f"⚠️ PDF ön üretimi başarısız ({property_id}): {getattr(e, 'detail', e)}")
+
+    def summary(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "workers": len(self._tasks),
+                "queued": self._queue.qsize() if self._queue else 0, **self.stats}
+
+# pdf_handler (ReportLab, FireCrawl istemcisi) ilk ön üretimde yüklenir; sohbet modülü onu içe aktarmaz
+def _build_pdf(property_id: str) -> Awaitable[Any]:
+    from pdf_handler import build_property_pdf
+    return build_property_pdf(property_id)
+
+def _pdf_exists(property_id: str) -> bool:
+    from pdf_handler import PDF_STORAGE_DIR
+    return (PDF_STORAGE_DIR / f"{property_id}.pdf").exists()
+
+pdf_prefetcher = PdfPrefetcher(_build_pdf, _pdf_exists)
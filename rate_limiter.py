@@ -0,0 +1,197 @@
+# rate_limiter.py - Route bazlı istek sınırlama (bellek içi token bucket veya Redis kayan pencere)
+import os
+import math
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from config import env_flag
+
+# ---- Ayarlar ----
+RATE_LIMIT_ENABLED = env_flag("RATE_LIMIT_ENABLED", True)
+# "memory" (worker başına) veya "redis" (tüm worker/sunucular arasında ortak)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").strip().lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_REDIS_PREFIX = os.getenv("RATE_LIMIT_REDIS_PREFIX", "ratelimit")
+# Route önekine göre "istek/saniye" limitleri. RATE_LIMITS ile ezilebilir:
+# RATE_LIMITS="/chat=45/60,/web-search=20/60,/image=10/60,/generate-speech=20/60"
+# /image/jobs (iş durumu sorgulama) ve /image/files (kayıtlı görseller) üretimden ayrı ve daha geniş limitlidir.
+DEFAULT_RATE_LIMITS = "/chat=45/60,/web-search=20/60,/image=10/60,/image/jobs=120/60,/image/files=300/60,/generate-speech=20/60"
+
+@dataclass(frozen=True)
+class RouteLimit:
+    prefix: str
+    limit: int
+    window: int  # saniye
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    remaining: int
+    retry_after: float = 0.0
+
+def parse_route_limits(spec: str) -> List[RouteLimit]:
+    """"/chat=45/60,/image=10/60" biçimindeki tanımı okur; hatalı girdiler atlanır."""
+    limits = []
+    for item in spec.split(","):
+        try:
+            prefix, rule = item.strip().split("=")
+            limit, window = rule.split("/")
+            limits.append(RouteLimit(prefix.strip().rstrip("/") or "/", int(limit), int(window)))
+        except ValueError:
+            if item.strip():
+                print(f"⚠️ Geçersiz rate limit tanımı atlandı: {item}")
+    # En uzun önek önce eşleşsin
+    return sorted(limits, key=lambda r: len(r.prefix), reverse=True)
+
+class InMemoryTokenBucket:
+    """Worker içi token bucket. Her istek O(1)'dir.
+
+    Kova dolduğunda (yani durumu yeni bir istemciyle aynı olduğunda) anahtar silinebilir;
+    bu silme zamanları saniye dilimli bir zaman çarkında (time wheel) tutulur ve her
+    istekte sadece süresi gelen dilimler boşaltılır.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic, wheel_size: int = 3600):
+        self._clock = clock
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}  # anahtar -> (jeton, son_zaman, silme_zamanı)
+        self._wheel: List[Set[str]] = [set() for _ in range(wheel_size)]
+        self._cursor = int(clock())
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _advance(self, now: float) -> None:
+        current = int(now)
+        if current - self._cursor >= len(self._wheel):
+            slots = range(len(self._wheel))  # çark tam tur döndüyse her dilim bir kez kontrol edilir
+        else:
+            slots = (second % len(self._wheel) for second in range(self._cursor + 1, current + 1))
+        for slot in slots:
+            keys, self._wheel[slot] = self._wheel[slot], set()
+            for key in keys:
+                state = self._buckets.get(key)
+                if state is None:
+                    continue
+                if state[2] <= now:
+                    del self._buckets[key]
+                else:
+                    # Çark turundan uzun (veya sonradan ertelenmiş) kayıtlar yeniden planlanır
+                    self._wheel[int(state[2]) % len(self._wheel)].add(key)
+        self._cursor = max(self._cursor, current)
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
+        now = self._clock()
+        self._advance(now)
+        rate = limit / window
+        tokens, last, _ = self._buckets.get(key, (float(limit), now, now))
+        tokens = min(float(limit), tokens + (now - last) * rate)
+        allowed = tokens >= 1.0
+        if allowed:
+            tokens -= 1.0
+        expires_at = now + (limit - tokens) / rate
+        previous = self._buckets.get(key)
+        self._buckets[key] = (tokens, now, expires_at)
+        if previous is None or int(previous[2]) != int(expires_at):
+            self._wheel[int(expires_at) % len(self._wheel)].add(key)
+        retry_after = 0.0 if allowed else (1.0 - tokens) / rate
+        return RateLimitResult(allowed, int(tokens), retry_after)
+
+    async def close(self) -> None:
+        pass
+
+# Kayan pencere: eski kayıtlar silinir, pencere doluysa en eski kaydın çıkış zamanı döner.
+# Zaman Redis sunucusundan alınır; böylece farklı sunucuların saat farkı sonucu etkilemez.
+_SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2])
+local member = ARGV[3]
+local t = redis.call('TIME')
+local now_ms = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', key, 0, now_ms - window_ms)
+local count = redis.call('ZCARD', key)
+if count < limit then
+    redis.call('ZADD', key, now_ms, member)
+    redis.call('PEXPIRE', key, window_ms)
+    return {1, limit - count - 1, 0}
+end
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+return {0, 0, tonumber(oldest[2]) + window_ms - now_ms}
+"""
+
+class RedisSlidingWindowLimiter:
+    """Redis sorted set ile kayan pencere limiti; tüm worker ve sunucular aynı sayacı paylaşır.
+
+    Redis'e ulaşılamazsa istekler worker içi token bucket ile sınırlanmaya devam eder.
+    """
+
+    def __init__(self, redis_url: str = REDIS_URL, prefix: str = RATE_LIMIT_REDIS_PREFIX, client=None):
+        if client is None:
+            import redis.asyncio as redis_asyncio
+            client = redis_asyncio.from_url(redis_url)
+        self._redis = client
+        self._script = client.register_script(_SLIDING_WINDOW_LUA)
+        self._prefix = prefix
+        self._fallback = InMemoryTokenBucket()
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
+        try:
+            allowed, remaining, retry_ms = await self._script(
+                keys=[f"{self._prefix}:{key}"],
+                args=[limit, window * 1000, uuid.uuid4().hex],
+            )
+            return RateLimitResult(bool(allowed), int(remaining), int(retry_ms) / 1000.0)
+        except Exception as e:
+            print(f"⚠️ Redis rate limit hatası, bellek içi limite düşülüyor: {e}")
+            return await self._fallback.hit(key, limit, window)
+
+    async def close(self) -> None:
+        try:
+            await self._redis.close()
+        except Exception as e:
+            print(f"⚠️ Redis rate limit bağlantısı kapatılamadı: {e}")
+
+class RateLimiter:
+    """İstek yolunu route limitiyle eşleştirir ve seçili backend'e (IP, route) anahtarıyla sorar."""
+
+    def __init__(self, backend, limits: List[RouteLimit], enabled: bool = True):
+        self.backend = backend
+        self.limits = limits
+        self.enabled = enabled
+
+    def match_route(self, path: str) -> Optional[RouteLimit]:
+        if not self.enabled:
+            return None
+        for route in self.limits:
+            if path == route.prefix or path.startswith(route.prefix + "/"):
+                return route
+        return None
+
+    async def check(self, path: str, client_ip: str) -> Optional[RateLimitResult]:
+        """Limitli olmayan yollar için None döndürür."""
+        route = self.match_route(path)
+        if route is None:
+            return None
+        return await self.backend.hit(f"{route.prefix}:{client_ip}", route.limit, route.window)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+def create_rate_limiter() -> RateLimiter:
+    backend = None
+    if RATE_LIMIT_BACKEND == "redis":
+        try:
+            backend = RedisSlidingWindowLimiter()
+            print("✅ Redis rate limit backend'i hazır")
+        except Exception as e:
+            print(f"⚠️ Redis rate limit backend'i açılamadı, bellek içi limit kullanılacak: {e}")
+    if backend is None:
+        backend = InMemoryTokenBucket()
+    return RateLimiter(backend, parse_route_limits(os.getenv("RATE_LIMITS", DEFAULT_RATE_LIMITS)), RATE_LIMIT_ENABLED)
+
+def retry_after_header(result: RateLimitResult) -> str:
+    return str(max(1, math.ceil(result.retry_after)))
+
+rate_limiter = create_rate_limiter()
@@ -0,0 +1,84 @@
+# render_pool.py - CPU ağırlıklı işleri (PDF render) olay döngüsü dışında, sınırlı kuyrukla çalıştırma
+import os
+import asyncio
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+# ---- Ayarlar ----
+# "thread" (varsayılan; ReportLab'ın C hızlandırıcıları GIL'i kısmen bırakır) veya
+# "process" (tam paralellik; fonksiyon ve argümanlar pickle edilebilir olmalıdır)
+PDF_RENDER_EXECUTOR = os.getenv("PDF_RENDER_EXECUTOR", "thread").strip().lower()
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+# Çalışanlar doluyken en fazla bu kadar iş bekler; fazlası RenderPoolSaturated ile reddedilir
+PDF_RENDER_QUEUE_SIZE = int(os.getenv("PDF_RENDER_QUEUE_SIZE", "8"))
+
+class RenderPoolSaturated(Exception):
+    """Havuz ve bekleme kuyruğu dolu; istek 503 ile reddedilmelidir."""
+
+class RenderPool:
+    """Thread veya process havuzu + sınırlı kuyruk (back-pressure).
+
+    Kapasite `workers + queue_size` kadar iştir. İş sayısı, çağıran iptal edilse bile
+    havuzdaki iş bitene kadar düşülmez; böylece kuyruk sınırı gerçek yükü yansıtır.
+    """
+
+    def __init__(self, kind: str = PDF_RENDER_EXECUTOR, workers: int = PDF_RENDER_WORKERS,
+                 queue_size: int = PDF_RENDER_QUEUE_SIZE, name: str = "pdf_render"):
+        self.kind = kind if kind in ("thread", "process") else "thread"
+        self.workers = workers
+        self.queue_size = queue_size
+        self.name = name
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()  # tamamlanma geri çağrıları havuz thread'lerinden gelir
+        self._inflight = 0
+        self.stats = {"submitted": 0, "completed": 0, "rejected": 0, "failed": 0}
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+        return self._executor
+
+    def _release(self, future) -> None:
+        with self._lock:
+            self._inflight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.stats["failed"] += 1
+            else:
+                self.stats["completed"] += 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self._inflight >= self.workers + self.queue_size:
+                self.stats["rejected"] += 1
+                raise RenderPoolSaturated(f"{self.name} kuyruğu dolu ({self._inflight} iş)")
+            self._inflight += 1
+            self.stats["submitted"] += 1
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self._inflight -= 1
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            # Çöken process havuzu bir sonraki işte yeniden oluşturulur
+            self._executor = None
+            raise
+
+    def shutdown(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def summary(self) -> Dict[str, Any]:
+        return {"executor": self.kind, "workers": self.workers, "queue_size": self.queue_size,
+                "inflight": self._inflight, **self.stats}
+
+pdf_render_pool = RenderPool()
@@ -0,0 +1,185 @@
+# resilience.py - Upstream çağrıları için yeniden deneme, hedging ve devre kesici (circuit breaker)
+import os
+import time
+import random
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+import openai
+
+# ---- Ayarlar ----
+# Toplam deneme sayısı (ilk çağrı dahil); sadece idempotent çağrılar tekrar denenir
+UPSTREAM_RETRY_ATTEMPTS = int(os.getenv("UPSTREAM_RETRY_ATTEMPTS", "3"))
+UPSTREAM_RETRY_BASE_DELAY = float(os.getenv("UPSTREAM_RETRY_BASE_DELAY", "0.25"))
+UPSTREAM_RETRY_MAX_DELAY = float(os.getenv("UPSTREAM_RETRY_MAX_DELAY", "4"))
+# Art arda bu kadar başarısız çağrıdan sonra devre açılır ve reset süresi boyunca hızlıca hata verilir
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+# Tekrar denenebilir HTTP durum kodları (geçici upstream hataları)
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    """Devre açıkken upstream çağrılmadan hemen verilen hata."""
+
+    def __init__(self, upstream: str):
+        super().__init__(f"{upstream} geçici olarak devre dışı (circuit open)")
+        self.upstream = upstream
+
+def hedge_delay(upstream: str) -> float:
+    """HEDGE_AFTER_<AD> (saniye) tanımlıysa bu süre sonunda ikinci bir istek başlatılır; 0 = kapalı."""
+    value = os.getenv(f"HEDGE_AFTER_{upstream.upper()}")
+    return float(value) if value else 0.0
+
+def is_retryable(exc: BaseException) -> bool:
+    """Zaman aşımı, bağlantı hatası ve geçici (429/5xx) durum kodları tekrar denenebilir."""
+    if isinstance(exc, (httpx.TimeoutException, httpx.TransportError, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS
+    return getattr(exc, "status_code", None) in RETRYABLE_STATUS
+
+def check_status(response: httpx.Response) -> httpx.Response:
+    """Geçici hata kodlarında HTTPStatusError fırlatır; diğer yanıtları olduğu gibi döndürür."""
+    if response.status_code in RETRYABLE_STATUS:
+        raise httpx.HTTPStatusError(f"Geçici upstream hatası: {response.status_code}",
+                                    request=response.request, response=response)
+    return response
+
+def backoff_delay(attempt: int) -> float:
+    """Full jitter üstel bekleme: [0, min(max, base * 2^deneme)]."""
+    return random.uniform(0, min(UPSTREAM_RETRY_MAX_DELAY, UPSTREAM_RETRY_BASE_DELAY * (2 ** attempt)))
+
+class CircuitBreaker:
+    """closed -> (art arda hata) -> open -> (reset süresi) -> half-open -> (deneme başarılı) -> closed."""
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self.short_circuits = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self._clock() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probe_in_flight:
+            self._probe_in_flight = True  # tek bir deneme isteği geçer
+            return True
+        self.short_circuits += 1
+        return False
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            print(f"✅ Devre kapandı: {self.name}")
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                print(f"🔌 Devre açıldı: {self.name} ({self.failures} ardışık hata)")
+            self.opened_at = self._clock()
+
+    def release_probe(self) -> None:
+        self._probe_in_flight = False
+
+    def summary(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, "short_circuits": self.short_circuits}
+
+_breakers: Dict[str, CircuitBreaker] = {}
+stats = {"retries": 0, "hedges": 0, "hedge_wins": 0}
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    breaker = _breakers.get(upstream)
+    if breaker is None:
+        breaker = _breakers[upstream] = CircuitBreaker(upstream)
+    return breaker
+
+def is_open(upstream: str) -> bool:
+    """Devre açıksa (half-open değil) True; degrade yanıt kararları için."""
+    breaker = _breakers.get(upstream)
+    return breaker is not None and breaker.state == "open"
+
+async def _hedged(factory: Callable[[], Awaitable[Any]], hedge_after: float) -> Any:
+    """İlk istek `hedge_after` içinde bitmezse ikincisini başlatır; ilk başarılı sonucu döndürür."""
+    first = asyncio.ensure_future(factory())
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if done:
+            return first.result()
+        stats["hedges"] += 1
+        tasks.add(asyncio.ensure_future(factory()))
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        stats["hedge_wins"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+async def call(upstream: str, factory: Callable[[], Awaitable[Any]], *, idempotent: bool = True,
+               attempts: Optional[int] = None, hedge_after: Optional[float] = None) -> Any:
+    """`factory()` ile üretilen çağrıyı upstream'in devre kesicisi, yeniden deneme ve
+    (isteğe bağlı) hedging politikasıyla yürütür.
+
+    Devre açıksa CircuitOpenError fırlatılır. Tekrar denenemeyen hatalar (4xx vb.)
+    upstream'in sağlığını etkilemez ve hemen yukarı iletilir.
+    """
+    breaker = get_breaker(upstream)
+    if not breaker.allow():
+        raise CircuitOpenError(upstream)
+    attempts = (attempts or UPSTREAM_RETRY_ATTEMPTS) if idempotent else 1
+    hedge_after = hedge_delay(upstream) if hedge_after is None else hedge_after
+
+    for attempt in range(attempts):
+        try:
+            if hedge_after and idempotent:
+                result = await _hedged(factory, hedge_after)
+            else:
+                result = await factory()
+            breaker.record_success()
+            return result
+        except asyncio.CancelledError:
+            breaker.release_probe()
+            raise
+        except Exception as exc:
+            if not is_retryable(exc):
+                breaker.record_success()  # upstream yanıt verdi; hata isteğin kendisinde
+                raise
+            if attempt + 1 >= attempts:
+                breaker.record_failure()
+                raise
+            stats["retries"] += 1
+            delay = backoff_delay(attempt)
+            print(f"🔁 {upstream} geçici hata ({type(exc).__name__}), {delay:.2f} sn sonra tekrar denenecek ({attempt + 2}/{attempts})")
+            await asyncio.sleep(delay)
+
+def summary() -> Dict[str, Any]:
+    return {"breakers": {name: b.summary() for name, b in _breakers.items()}, **stats}
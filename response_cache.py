@@ -0,0 +1,124 @@
+# response_cache.py - /chat için anlamsal (embedding benzerliği tabanlı) yanıt önbelleği
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config import env_flag
+
+# ---- Ayarlar ----
+RESPONSE_CACHE_ENABLED = env_flag("RESPONSE_CACHE_ENABLED", False)
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(6 * 3600)))
+# İlan yanıtları envanter değiştiği için varsayılan olarak önbelleğe alınmaz (0 = hariç)
+RESPONSE_CACHE_LISTING_TTL = int(os.getenv("RESPONSE_CACHE_LISTING_TTL", "0"))
+RESPONSE_CACHE_MAX_ITEMS = int(os.getenv("RESPONSE_CACHE_MAX_ITEMS", "500"))
+
+class _ModeStore:
+    """Tek bir mod için sabit kapasiteli vektör matrisi + LRU sırası."""
+
+    def __init__(self, capacity: int, dim: int):
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.expires = np.zeros(capacity, dtype=np.float64)  # 0 = boş slot
+        self.payloads: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self.lru: "OrderedDict[int, None]" = OrderedDict()
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def _release(self, slot: int) -> None:
+        self.expires[slot] = 0.0
+        self.payloads[slot] = None
+        self.lru.pop(slot, None)
+        self.free.append(slot)
+
+    def purge_expired(self, now: float) -> None:
+        for slot in np.nonzero((self.expires > 0) & (self.expires <= now))[0]:
+            self._release(int(slot))
+
+    def allocate(self) -> int:
+        if not self.free:
+            self._release(next(iter(self.lru)))
+        return self.free.pop()
+
+class ResponseCache:
+    """Son yanıtlanan sorular üzerinde mod bazlı en yakın komşu araması yapar.
+
+    Sorular embedding'leriyle birlikte saklanır; yeni bir sorunun kosinüs benzerliği
+    eşik değerin üzerindeyse önceki yanıt döndürülür. Kayıtlar TTL ile sona erer,
+    kapasite dolduğunda en az kullanılan kayıt atılır.
+    """
+
+    def __init__(self, enabled: bool = RESPONSE_CACHE_ENABLED, threshold: float = RESPONSE_CACHE_THRESHOLD,
+                 ttl: int = RESPONSE_CACHE_TTL, listing_ttl: int = RESPONSE_CACHE_LISTING_TTL,
+                 max_items: int = RESPONSE_CACHE_MAX_ITEMS):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.ttl = ttl
+        self.listing_ttl = listing_ttl
+        self.max_items = max_items
+        self._stores: Dict[str, _ModeStore] = {}
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0}
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def lookup(self, mode: str, embedding: Optional[List[float]]) -> Optional[Dict[str, Any]]:
+        """Eşik üzerinde benzer bir soru varsa yanıtının kopyasını döndürür."""
+        store = self._stores.get(mode)
+        query = self._unit(embedding) if embedding else None
+        if store is None or query is None or query.shape[0] != store.matrix.shape[1]:
+            self.stats["misses"] += 1
+            return None
+
+        store.purge_expired(time.time())
+        if not store.lru:
+            self.stats["misses"] += 1
+            return None
+
+        scores = store.matrix @ query
+        scores[store.expires == 0] = -1.0
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self.stats["misses"] += 1
+            return None
+
+        store.lru.move_to_end(best)
+        self.stats["hits"] += 1
+        print(f"♻️ Anlamsal önbellek isabeti (mod: {mode}, benzerlik: {scores[best]:.3f})")
+        return dict(store.payloads[best])
+
+    def store(self, mode: str, embedding: Optional[List[float]], response: Dict[str, Any]) -> None:
+        """Yanıtı saklar; ilan yanıtları kendi (kısa) TTL'ini kullanır."""
+        ttl = self.listing_ttl if response.get("is_listing_response") else self.ttl
+        vector = self._unit(embedding) if embedding else None
+        if ttl <= 0 or vector is None:
+            return
+
+        store = self._stores.get(mode)
+        if store is None:
+            store = self._stores[mode] = _ModeStore(self.max_items, vector.shape[0])
+        elif vector.shape[0] != store.matrix.shape[1]:
+            return
+
+        now = time.time()
+        store.purge_expired(now)
+        slot = store.allocate()
+        store.matrix[slot] = vector
+        store.expires[slot] = now + ttl
+        store.payloads[slot] = dict(response)
+        store.lru[slot] = None
+        self.stats["stores"] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "entries": {mode: len(store.lru) for mode, store in self._stores.items()},
+        }
+
+response_cache = ResponseCache()
@@ -0,0 +1,83 @@
+# search_cache.py - Google Custom Search sonuçları için sorgu sınıfına göre TTL'li önbellek
+import os
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from cachetools import TLRUCache
+
+import single_flight
+from config import env_flag
+from single_flight import SingleFlight
+from text_utils import normalize_query
+
+# ---- Ayarlar ----
+SEARCH_CACHE_ENABLED = env_flag("SEARCH_CACHE_ENABLED", True)
+SEARCH_CACHE_MAX_ITEMS = int(os.getenv("SEARCH_CACHE_MAX_ITEMS", "2000"))
+# Sorgu sınıfı başına saniye cinsinden TTL
+SEARCH_CACHE_TTLS: Dict[str, int] = {
+    "volatile": int(os.getenv("SEARCH_CACHE_TTL_VOLATILE", "120")),      # kur, borsa, hava durumu, skor
+    "news": int(os.getenv("SEARCH_CACHE_TTL_NEWS", "900")),              # gündem / son haberler
+    "default": int(os.getenv("SEARCH_CACHE_TTL_DEFAULT", "3600")),
+    "evergreen": int(os.getenv("SEARCH_CACHE_TTL_EVERGREEN", "86400")),  # tanım, tarih, nasıl yapılır
+}
+
+_QUERY_CLASSES: List[Tuple[str, re.Pattern]] = [
+    ("volatile", re.compile(
+        r"\b(dolar|euro|avro|sterlin|kur(u|ları)?\b|döviz|altın fiyat|gram altın|çeyrek altın|borsa|bist|hisse|"
+        r"bitcoin|kripto|faiz oranı|hava durumu|hava nasıl|sıcaklık|maç(ı|ın|lar[ıi]?)?\b|skor|canlı|puan durumu|trafik)")),
+    ("news", re.compile(r"\b(son dakika|haber|gündem|bugün|dün\b|bu hafta|güncel|açıklandı|son durum|seçim)")),
+    ("evergreen", re.compile(r"\b(nedir|ne demek|nasıl yapılır|tarihi|kimdir|tanımı|anlamı|nerede|formülü)")),
+]
+
+def classify_query(query: str) -> str:
+    """Sorguyu volatile / news / evergreen / default sınıflarından birine atar (ilk eşleşen kazanır)."""
+    normalized = normalize_query(query)
+    for name, pattern in _QUERY_CLASSES:
+        if pattern.search(normalized):
+            return name
+    return "default"
+
+def _ttu(key: Any, value: Tuple[float, List[Dict]], now: float) -> float:
+    return now + value[0]
+
+class SearchResultCache:
+    """(normalize sorgu, num) anahtarlı arama sonucu önbelleği.
+
+    Aynı anahtar için eş zamanlı istekler tek bir upstream çağrısında birleştirilir.
+    Boş sonuçlar (hata veya sonuç yok) saklanmaz.
+    """
+
+    def __init__(self, enabled: bool = SEARCH_CACHE_ENABLED, max_items: int = SEARCH_CACHE_MAX_ITEMS,
+                 ttls: Dict[str, int] = SEARCH_CACHE_TTLS, timer: Callable[[], float] = time.monotonic,
+                 flight: Optional[SingleFlight] = None):
+        self.enabled = enabled
+        self._ttls = dict(ttls)
+        self._cache: TLRUCache = TLRUCache(maxsize=max_items, ttu=_ttu, timer=timer)
+        self._flight = flight or SingleFlight("google_search")
+        self.stats = {"hits": 0, "misses": 0}
+
+    async def get_or_fetch(self, query: str, num: int, fetch: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        if not self.enabled:
+            return await fetch()
+        key = (normalize_query(query), num)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.stats["hits"] += 1
+            return list(cached[1])
+
+        self.stats["misses"] += 1
+        return list(await self._flight.do(key, lambda: self._fetch_and_store(key, query, fetch)))
+
+    async def _fetch_and_store(self, key: Tuple[str, int], query: str,
+                               fetch: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        results = await fetch()
+        if results:
+            self._cache[key] = (self._ttls[classify_query(query)], list(results))
+        return results
+
+    def summary(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "entries": len(self._cache), **self.stats,
+                "coalesced": self._flight.stats["coalesced"]}
+
+search_cache = SearchResultCache(flight=single_flight.group("google_search"))
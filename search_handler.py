@@ -1,15 +1,21 @@
 import os
 import asyncio
 import traceback
-from typing import List, Dict, Optional
-import aiohttp
+from typing import List, Dict, Optional, Any, AsyncIterator
 import time
+import httpx
 from openai import AsyncOpenAI
 
+from http_clients import get_client
+from openai_scheduler import chat_completion, openai_slot
+import resilience
+from search_cache import search_cache
+
 # ── Ortam Değişkenleri ─────────────────────────────────────
 OAI_KEY = os.getenv("OPENAI_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GOOGLE_CSE_ID = os.getenv("GOOGLE_CSE_ID") or "d352129b3656e4b4f"  # "cx=" kısmını kaldırın
+GOOGLE_SEARCH_NUM = 5  # Maksimum 5 veya 7 sonuç getir
 
 # API anahtarlarının varlığını kontrol et ve log tut
 print(f"❓ OpenAI API anahtarı mevcut: {OAI_KEY is not None}")
@@ -18,7 +24,7 @@ print(f"❓ Google CSE ID kullanılacak: {GOOGLE_CSE_ID}")
 
 # Yine de çalışmaya devam et
 try:
-    openai_client = AsyncOpenAI(api_key=OAI_KEY)
+    openai_client = AsyncOpenAI(api_key=OAI_KEY, max_retries=0)
     print("✅ OpenAI istemcisi başarıyla oluşturuldu")
 except Exception as e:
     print(f"❌ OpenAI istemcisi oluşturulurken hata: {e}")
@@ -156,11 +162,15 @@ SEARCH_SYSTEM_PROMPTS = {
     """
 }
 # ── Google Arama Fonksiyonu ─────────────────────────────
-async def search_google(query: str) -> List[Dict]:
-    """Google Custom Search API kullanarak web araması yapar."""
-    print(f"🔎 Google araması başlatılıyor: '{query}'")
-    start_time = time.time()
-    
+async def _get_checked(url: str, params: Dict) -> httpx.Response:
+    return resilience.check_status(await get_client("google").get(url, params=params))
+
+async def search_google(query: str, num: int = GOOGLE_SEARCH_NUM) -> List[Dict]:
+    """Google Custom Search API kullanarak web araması yapar.
+
+    Sonuçlar normalize sorgu + num anahtarıyla, sorgu sınıfına göre (kur/hava gibi
+    değişken konular kısa, tanım soruları uzun) TTL ile önbelleğe alınır.
+    """
     if not query:
         print("⚠️ Arama sorgusu boş!")
         return []
@@ -168,45 +178,54 @@ async def search_google(query: str) -> List[Dict]:
     if not GOOGLE_API_KEY:
         print("❌ Google API anahtarı eksik! Lütfen Render dashboard'dan ekleyin.")
         return []
-    
+
+    return await search_cache.get_or_fetch(query, num, lambda: _search_google_uncached(query, num))
+
+async def _search_google_uncached(query: str, num: int) -> List[Dict]:
+    print(f"🔎 Google araması başlatılıyor: '{query}'")
+    start_time = time.time()
     url = "https://www.googleapis.com/customsearch/v1"
     params = {
         "q": query,
         "key": GOOGLE_API_KEY,
         "cx": GOOGLE_CSE_ID,
-        "num": 5  # Maksimum 5 veya 7 sonuç getir
+        "num": num
     }
     
     try:
         print(f"🌐 Google API'ye istek gönderiliyor: {url}")
-        print(f"🌐 Google API'ye gönderilen tam URL: {url}?q={query}&key=[gizli]&cx={GOOGLE_CSE_ID}&num=3")
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params, timeout=60) as response:
-                print(f"📊 Google API yanıt durumu: {response.status}")
-                
-                if response.status != 200:
-                    print(f"❌ Google API hata kodu döndürdü: {response.status}")
-                    return []
-                
-                data = await response.json()
-                print(f"📦 Google API yanıtı alındı, işleniyor...")
-                
-                if "error" in data:
-                    print(f"❌ Google arama hatası: {data['error'].get('message', 'Bilinmeyen hata')}")
-                    return []
-                    
-                if "items" not in data:
-                    print("⚠️ Arama sonuçlarında 'items' bulunamadı")
-                    return []
-                
-                elapsed_time = time.time() - start_time
-                print(f"✅ Google araması tamamlandı: {len(data['items'])} sonuç, {elapsed_time:.2f} saniyede")
-                return data["items"]
-    except aiohttp.ClientError as e:
-        print(f"❌ Google API bağlantı hatası: {e}")
+        print(f"🌐 Google API'ye gönderilen tam URL: {url}?q={query}&key=[gizli]&cx={GOOGLE_CSE_ID}&num={num}")
+        response = await resilience.call(
+            "google", lambda: _get_checked(url, params), hedge_after=resilience.hedge_delay("google")
+        )
+        print(f"📊 Google API yanıt durumu: {response.status_code}")
+        
+        if response.status_code != 200:
+            print(f"❌ Google API hata kodu döndürdü: {response.status_code}")
+            return []
+        
+        data = response.json()
+        print(f"📦 Google API yanıtı alındı, işleniyor...")
+        
+        if "error" in data:
+            print(f"❌ Google arama hatası: {data['error'].get('message', 'Bilinmeyen hata')}")
+            return []
+            
+        if "items" not in data:
+            print("⚠️ Arama sonuçlarında 'items' bulunamadı")
+            return []
+        
+        elapsed_time = time.time() - start_time
+        print(f"✅ Google araması tamamlandı: {len(data['items'])} sonuç, {elapsed_time:.2f} saniyede")
+        return data["items"]
+    except resilience.CircuitOpenError:
+        print("⚠️ Google API devresi açık, arama atlanıyor")
+        return []
+    except httpx.TimeoutException:
+        print("❌ Google API zaman aşımı hatası")
         return []
-    except asyncio.TimeoutError:
-        print("❌ Google API zaman aşımı hatası (30 saniye)")
+    except httpx.HTTPError as e:
+        print(f"❌ Google API bağlantı hatası: {e}")
         return []
     except Exception as exc:
         print(f"❌ Google arama isteği beklenmeyen hata: {exc}")
@@ -245,6 +264,40 @@ def format_search_results(search_results: List[Dict]) -> str:
     print(f"✅ Arama sonuçları başarıyla formatlandı ({len(formatted_text)} karakter)")
     return formatted_text
 
+# ── Yardımcılar ───────────────────────────────────────────
+NO_RESULTS_REPLY = "Üzgünüm, arama sonuçlarında herhangi bir bilgi bulamadım. Lütfen farklı bir arama yapmayı deneyin veya sorunuzu yeniden formüle edin."
+NO_OPENAI_REPLY = "Üzgünüm, OpenAI API bağlantısı kurulamadı. Lütfen sistem yöneticinize başvurun."
+
+def _build_messages(query: str, mode: str, context: str) -> List[Dict]:
+    """Seçilen moda göre system prompt'u ve arama bağlamını içeren mesajları hazırlar."""
+    system_prompt = SEARCH_SYSTEM_PROMPTS.get(mode, SEARCH_SYSTEM_PROMPTS["real-estate"])
+    print(f"📄 Seçilen mod ({mode}) için system prompt kullanılıyor")
+    return [
+        {"role": "system", "content": f"{system_prompt}<br><br>{context}"},
+        {"role": "user", "content": query}
+    ]
+
+def _completion_kwargs(messages: List[Dict]) -> Dict[str, Any]:
+    return {
+        "model": "gpt-4o-mini",
+        "messages": messages,
+        "temperature": 0.4,
+        "max_tokens": 1024,
+        "timeout": 120  # 120 saniye timeout
+    }
+
+def _error_reply(exc: Exception) -> str:
+    """Hata türüne göre kullanıcıya gösterilecek açıklayıcı mesajı seçer."""
+    error_type = type(exc).__name__
+    if "timeout" in str(exc).lower() or isinstance(exc, asyncio.TimeoutError):
+        return "Üzgünüm, arama işlemi zaman aşımına uğradı. Lütfen daha sonra tekrar deneyin."
+    elif "rate limit" in str(exc).lower():
+        return "Üzgünüm, API kullanım limitine ulaşıldı. Lütfen birkaç dakika sonra tekrar deneyin."
+    elif "auth" in str(exc).lower() or "key" in str(exc).lower():
+        return "Üzgünüm, arama servisine erişim sağlanamadı. Sistem yöneticisine başvurun."
+    else:
+        return f"Üzgünüm, şu anda bir hata oluştu: {error_type}. Lütfen daha sonra tekrar deneyin."
+
 # ── Ana Fonksiyon ─────────────────────────────────────────
 async def web_search_answer(query: str, mode: str = "real-estate") -> str:
     """Google araması yapar ve OpenAI API kullanarak yanıt oluşturur."""
@@ -260,7 +313,7 @@ async def web_search_answer(query: str, mode: str = "real-estate") -> str:
         
         if not search_results:
             print("⚠️ Google araması sonuç döndürmedi")
-            return "Üzgünüm, arama sonuçlarında herhangi bir bilgi bulamadım. Lütfen farklı bir arama yapmayı deneyin veya sorunuzu yeniden formüle edin."
+            return NO_RESULTS_REPLY
 
         # ADIM 2: Sonuçları Formatla
         context = format_search_results(search_results)
@@ -268,28 +321,15 @@ async def web_search_answer(query: str, mode: str = "real-estate") -> str:
         # ADIM 3: OpenAI API ile Yanıt Oluştur
         if not openai_client:
             print("❌ OpenAI istemcisi oluşturulamamış")
-            return "Üzgünüm, OpenAI API bağlantısı kurulamadı. Lütfen sistem yöneticinize başvurun."
+            return NO_OPENAI_REPLY
         
-        # Seçilen moda göre system prompt'u seç - BU SATIR EKLENDİ
-        system_prompt = SEARCH_SYSTEM_PROMPTS.get(mode, SEARCH_SYSTEM_PROMPTS["real-estate"])
-        print(f"📄 Seçilen mod ({mode}) için system prompt kullanılıyor")
-            
         print("🧠 OpenAI API'ye istek hazırlanıyor...")
-        messages = [
-            {"role": "system", "content": f"{system_prompt}<br><br>{context}"},
-            {"role": "user", "content": query}
-        ]
+        messages = _build_messages(query, mode, context)
 
         print("📤 OpenAI API'ye istek gönderiliyor...")
         openai_start_time = time.time()
         
-        resp = await openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.4,
-            max_tokens=1024,
-            timeout=120  # 120 saniye timeout
-        )
+        resp = await chat_completion(openai_client, **_completion_kwargs(messages))
         
         openai_elapsed = time.time() - openai_start_time
         print(f"📥 OpenAI yanıtı alındı ({openai_elapsed:.2f} saniye)")
@@ -305,13 +345,55 @@ async def web_search_answer(query: str, mode: str = "real-estate") -> str:
         print(f"❌ Detaylı hata: {traceback.format_exc()}")
         
         # Daha açıklayıcı hata mesajı
-        error_type = type(exc).__name__
-        if "timeout" in str(exc).lower() or isinstance(exc, asyncio.TimeoutError):
-            return "Üzgünüm, arama işlemi zaman aşımına uğradı. Lütfen daha sonra tekrar deneyin."
-        elif "rate limit" in str(exc).lower():
-            return "Üzgünüm, API kullanım limitine ulaşıldı. Lütfen birkaç dakika sonra tekrar deneyin."
-        elif "auth" in str(exc).lower() or "key" in str(exc).lower():
-            return "Üzgünüm, arama servisine erişim sağlanamadı. Sistem yöneticisine başvurun."
+        return _error_reply(exc)
+
+async def stream_web_search_answer(query: str, mode: str = "real-estate") -> AsyncIterator[Dict[str, Any]]:
+    """`web_search_answer`ın akışlı sürümü.
+
+    Google sonuçları gelir gelmez bir `sources` olayı (formatlanmış HTML ve bağlantılar),
+    ardından modelin özet parçaları `delta` olayları olarak, en sonda da tam yanıtı
+    taşıyan `done` olayı üretilir.
+    """
+    print(f"🚀 Akışlı Web Araması Başlatılıyor: '{query}' (mod: {mode})")
+    total_start_time = time.time()
+    parts: List[str] = []
+    reply = ""
+
+    try:
+        search_results = await search_google(query)
+        if not search_results:
+            print("⚠️ Google araması sonuç döndürmedi")
+            reply = NO_RESULTS_REPLY
         else:
-            return f"Üzgünüm, şu anda bir hata oluştu: {error_type}. Lütfen daha sonra tekrar deneyin."
+            context = format_search_results(search_results)
+            yield {
+                "event": "sources",
+                "data": {
+                    "html": context,
+                    "results": [{"title": r.get("title", ""), "link": r.get("link", "")} for r in search_results]
+                }
+            }
+
+            if not openai_client:
+                print("❌ OpenAI istemcisi oluşturulamamış")
+                reply = NO_OPENAI_REPLY
+            else:
+                messages = _build_messages(query, mode, context)
+                request = _completion_kwargs(messages)
+                async with openai_slot(request):
+                    stream = await resilience.call("openai", lambda: openai_client.chat.completions.create(**request, stream=True))
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            parts.append(delta)
+                            yield {"event": "delta", "data": {"content": delta}}
+                reply = "".join(parts).strip()
+                print(f"✅ Akışlı web araması tamamlandı ({time.time() - total_start_time:.2f} saniye)")
+    except Exception as exc:
+        print(f"❌ Akışlı web araması hatası: {exc}")
+        print(f"❌ Detaylı hata: {traceback.format_exc()}")
+        reply = "".join(parts).strip() if parts else _error_reply(exc)
 
+    if not parts and reply:
+        yield {"event": "delta", "data": {"content": reply}}
+    yield {"event": "done", "data": {"reply": reply, "is_listing_response": False}}
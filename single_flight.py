@@ -0,0 +1,67 @@
+# single_flight.py - Aynı anda yürüyen özdeş işleri tek bir çağrıda birleştirme (request coalescing)
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """Aynı anahtarla eş zamanlı gelen çağrılar tek bir görevi paylaşır.
+
+    İlk çağrı işi başlatır, sonrakiler aynı görevin sonucunu (veya hatasını) bekler.
+    Görev `asyncio.shield` ile beklendiğinden bir çağıranın iptali diğerlerini etkilemez;
+    bekleyenler sayılır ve son bekleyen de iptal edilirse paylaşılan görev iptal edilir
+    (örn. gereksiz kalan spekülatif embedding isteği). İş bittiğinde anahtar silinir;
+    sonuç saklanmaz (önbellek değildir).
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}
+        self.stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self.stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["executions"] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+        else:
+            self.stats["coalesced"] += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                # Sonucu bekleyen kimse kalmadı; iş iptal edilir ve yeni çağrılar onu paylaşmaz
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # kimse beklemiyorsa "exception was never retrieved" uyarısını önler
+
+_groups: Dict[str, SingleFlight] = {}
+
+def group(name: str) -> SingleFlight:
+    """İsimli paylaşılan grup (embedding, google_search, firecrawl, property_pdf ...)."""
+    flight = _groups.get(name)
+    if flight is None:
+        flight = _groups[name] = SingleFlight(name)
+    return flight
+
+def summary() -> Dict[str, Any]:
+    return {name: {**flight.stats, "inflight": len(flight)} for name, flight in _groups.items()}
@@ -0,0 +1,37 @@
+# stage_timings.py - İstek aşamaları için hafif gecikme ölçümü
+from collections import deque
+from typing import Deque, Dict
+
+# Her aşama için tutulacak en fazla örnek sayısı (kayan pencere)
+MAX_SAMPLES_PER_STAGE = 1000
+
+_samples: Dict[str, Deque[float]] = {}
+
+def record_stage(stage: str, elapsed_seconds: float) -> None:
+    """Bir aşamanın süresini (saniye) kayan pencereye ekler."""
+    bucket = _samples.get(stage)
+    if bucket is None:
+        bucket = _samples[stage] = deque(maxlen=MAX_SAMPLES_PER_STAGE)
+    bucket.append(elapsed_seconds)
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+def timing_summary() -> Dict[str, Dict[str, float]]:
+    """Aşama başına örnek sayısı, p50 ve p95 değerlerini (ms) döndürür."""
+    summary = {}
+    for stage, bucket in _samples.items():
+        values = sorted(bucket)
+        summary[stage] = {
+            "count": len(values),
+            "p50_ms": round(_percentile(values, 50) * 1000, 1),
+            "p95_ms": round(_percentile(values, 95) * 1000, 1),
+        }
+    return summary
+
+def reset_timings() -> None:
+    """Tüm örnekleri temizler (testler için)."""
+    _samples.clear()
@@ -0,0 +1,90 @@
+# supabase_rpc.py - Supabase (PostgREST) RPC çağrıları için async istemci
+import os
+import asyncio
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+
+import resilience
+from http_clients import get_client
+
+# ---- Ayarlar ----
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Testler veya yerel PostgREST için taban adres ezilebilir (örn. http://localhost:3000)
+SUPABASE_RPC_URL = os.getenv("SUPABASE_RPC_URL")
+SUPABASE_RPC_TIMEOUT = float(os.getenv("SUPABASE_RPC_TIMEOUT", "10"))
+SUPABASE_RPC_MAX_CONCURRENCY = int(os.getenv("SUPABASE_RPC_MAX_CONCURRENCY", "10"))
+
+class SupabaseRPCError(Exception):
+    """PostgREST'in hata döndürdüğü RPC çağrıları için."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+
+class AsyncPostgrestClient:
+    """PostgREST `/rpc/<fonksiyon>` uçlarını paylaşılan httpx havuzu üzerinden çağırır.
+
+    Eşzamanlı istek sayısı bir semafor ile sınırlanır. `client_factory` ile farklı bir
+    httpx istemcisi (ör. MockTransport veya yerel sahte sunucu) verilebilir.
+    """
+
+    def __init__(self, base_url: str, api_key: str,
+                 client_factory: Callable[[], httpx.AsyncClient] = lambda: get_client("supabase"),
+                 max_concurrency: int = SUPABASE_RPC_MAX_CONCURRENCY,
+                 timeout: float = SUPABASE_RPC_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self._headers = {
+            "apikey": api_key,
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        }
+        self._client_factory = client_factory
+        self._max_concurrency = max_concurrency
+        self._timeout = timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None  # olay döngüsü içinde oluşturulur
+
+    @classmethod
+    def from_env(cls) -> Optional["AsyncPostgrestClient"]:
+        if not SUPABASE_KEY or not (SUPABASE_RPC_URL or SUPABASE_URL):
+            return None
+        base_url = SUPABASE_RPC_URL or f"{SUPABASE_URL.rstrip('/')}/rest/v1"
+        return cls(base_url, SUPABASE_KEY)
+
+    async def _request(self, method: str, path: str, **kwargs) -> Any:
+        """Tek bir PostgREST isteği. Okuma amaçlı (RPC araması, select) olduğundan geçici
+        hatalarda resilience katmanı tarafından tekrar denenir."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async def send() -> Any:
+            async with self._semaphore:
+                response = await self._client_factory().request(
+                    method,
+                    f"{self.base_url}/{path}",
+                    headers=self._headers,
+                    timeout=self._timeout,
+                    **kwargs
+                )
+            if response.status_code >= 400:
+                raise SupabaseRPCError(response.status_code, response.text[:500])
+            return response.json()
+
+        return await resilience.call("supabase", send)
+
+    async def rpc(self, function: str, params: Dict[str, Any]) -> Any:
+        """RPC fonksiyonunu çağırır ve JSON gövdesini döndürür."""
+        return await self._request("POST", f"rpc/{function}", json=params)
+
+    async def select(self, table: str, params: Dict[str, Any]) -> Any:
+        """Tablodan PostgREST sorgu parametreleriyle (select, filtre, order, limit) satır okur."""
+        return await self._request("GET", table, params=params)
+
+rpc_client: Optional[AsyncPostgrestClient] = AsyncPostgrestClient.from_env()
+
+def set_rpc_client(client: Optional[AsyncPostgrestClient]) -> None:
+    """Varsayılan RPC istemcisini değiştirir (testler ve yerel sahte sunucu için)."""
+    global rpc_client
+    rpc_client = client
@@ -41,6 +41,21 @@ def event_loop():
     yield loop
     loop.close()
 
+# ✅ ORTAK TEST YARDIMCILARI
+class FakeClock:
+    """Elle ilerletilen saat; time.monotonic yerine `clock`/`timer` parametrelerine verilir."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    """Her test için sıfırdan başlayan sahte saat (`clock.now` ile ilerletilir)"""
+    return FakeClock()
+
 # ✅ TEST ENVIRONMENT SETUP
 def pytest_configure(config):
     """Pytest configuration"""
@@ -73,3 +73,25 @@ class TestChatEndpoint:
         assert "question" in valid_request
         assert "mode" in valid_request
         assert isinstance(valid_request["conversation_history"], list)
+
+class TestChatStreamEndpoint:
+    """/chat/stream SSE endpoint testleri"""
+
+    @pytest.mark.skipif(not HAS_APP, reason="Main app not available")
+    def test_chat_stream_emits_deltas_and_done(self):
+        """Parçalar delta olarak, meta veri done olayında gelir"""
+
+        async def fake_stream(question, mode, conversation_history):
+            yield {"event": "delta", "data": {"content": "Merhaba "}}
+            yield {"event": "delta", "data": {"content": "dünya"}}
+            yield {"event": "done", "data": {"reply": "Merhaba dünya", "is_listing_response": True,
+                                             "metadata": {"mode": mode}}}
+
+        with patch('ask_handler.stream_answer_question', fake_stream):
+            response = client.post("/chat/stream", json={"question": "Test", "mode": "real-estate"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = response.text
+        assert body.index("event: delta") < body.index("event: done")
+        assert '"is_listing_response": true' in body
@@ -1,6 +1,6 @@
 # tests/unit/test_ask_handler.py
 import pytest
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch, AsyncMock, MagicMock
 import sys
 import os
 
@@ -8,6 +8,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 import ask_handler
+from intent_classifier import IntentStats
 
 @pytest.mark.asyncio
 async def test_detect_topic_real_estate():
@@ -34,3 +35,172 @@ def test_functions_exist():
     assert hasattr(ask_handler, 'answer_question')
     assert hasattr(ask_handler, 'detect_topic')
     assert callable(ask_handler.answer_question)
+
+@pytest.mark.asyncio
+async def test_speculative_fanout_runs_precalls_concurrently():
+    """İlan sorgusunda ön çağrılar aynı anda başlar, konu tespiti iptal edilir"""
+    import asyncio
+    from unittest.mock import MagicMock
+
+    started = []
+    topic_cancelled = asyncio.Event()
+
+    async def fake_listing(question):
+        started.append("is_listing")
+        await asyncio.sleep(0.05)
+        return True
+
+    async def fake_filters(question):
+        started.append("filters")
+        return {"lokasyon": "Kadıköy"}
+
+    async def fake_embedding(question):
+        started.append("embedding")
+        return [0.1, 0.2]
+
+    async def fake_topic(question):
+        started.append("topic")
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            topic_cancelled.set()
+            raise
+        return "real-estate"
+
+    async def fake_search(question, filters=None, query_embedding=None):
+        assert filters == {"lokasyon": "Kadıköy"}
+        assert query_embedding == [0.1, 0.2]
+        return []
+
+    completion = MagicMock()
+    completion.choices = [MagicMock()]
+    completion.choices[0].message.content = "İlan yanıtı"
+
+    with patch.object(ask_handler, "SPECULATIVE_FANOUT", True), \
+         patch.object(ask_handler, "CLASSIFIER_MODE", "legacy"), \
+         patch.object(ask_handler, "LOCAL_INTENT_CLASSIFIER", False), \
+         patch.object(ask_handler, "check_if_property_listing_query", fake_listing), \
+         patch.object(ask_handler, "extract_filters_from_query", fake_filters), \
+         patch.object(ask_handler, "get_embedding", fake_embedding), \
+         patch.object(ask_handler, "detect_topic", fake_topic), \
+         patch.object(ask_handler, "hybrid_search_listings", fake_search), \
+         patch.object(ask_handler, "openai_client") as mock_openai:
+        mock_openai.chat.completions.create = AsyncMock(return_value=completion)
+        result = await ask_handler.answer_question("Kadıköy'de satılık daire bul", "real-estate")
+
+    assert result["is_listing_response"] is True
+    assert result["reply"] == "İlan yanıtı"
+    assert set(started) == {"is_listing", "filters", "embedding", "topic"}
+    await asyncio.wait_for(topic_cancelled.wait(), timeout=1)
+
+@pytest.mark.asyncio
+async def test_route_query_parses_structured_response():
+    """Yönlendirici tek çağrıda ilan/konu/filtre döndürür, null filtreler atılır"""
+    from unittest.mock import MagicMock
+
+    completion = MagicMock()
+    completion.choices = [MagicMock()]
+    completion.choices[0].message.content = (
+        '{"is_listing": true, "topic": "real-estate", "filters": '
+        '{"min_fiyat": null, "max_fiyat": 5000000, "oda_sayisi": "2+1", "lokasyon": "Kadıköy"}}'
+    )
+    with patch.object(ask_handler, "openai_client") as mock_openai:
+        mock_openai.chat.completions.create = AsyncMock(return_value=completion)
+        route = await ask_handler.route_query("kadıköy'de 5 milyona kadar 2+1 daire")
+
+    assert route == {
+        "is_listing": True,
+        "topic": "real-estate",
+        "filters": {"max_fiyat": 5000000, "oda_sayisi": "2+1", "lokasyon": "Kadıköy"},
+    }
+    kwargs = mock_openai.chat.completions.create.call_args.kwargs
+    assert kwargs["response_format"]["type"] == "json_schema"
+
+@pytest.mark.asyncio
+async def test_router_mode_skips_legacy_classifiers():
+    """Router modunda eski üç sınıflandırıcı çağrılmaz"""
+    async def fail(*args, **kwargs):
+        raise AssertionError("legacy classifier should not run")
+
+    async def fake_route(question):
+        return {"is_listing": False, "topic": "finance", "filters": {}}
+
+    async def fake_embedding(question):
+        return [0.1]
+
+    with patch.object(ask_handler, "CLASSIFIER_MODE", "router"), \
+         patch.object(ask_handler, "LOCAL_INTENT_CLASSIFIER", False), \
+         patch.object(ask_handler, "route_query", fake_route), \
+         patch.object(ask_handler, "get_embedding", fake_embedding), \
+         patch.object(ask_handler, "check_if_property_listing_query", fail), \
+         patch.object(ask_handler, "detect_topic", fail), \
+         patch.object(ask_handler, "extract_filters_from_query", fail):
+        result = await ask_handler.answer_question("Borsada hangi hisseler yükselir?", "real-estate")
+
+    assert result["reply"] == ask_handler.REDIRECTION_MESSAGES["real-estate-to-finance"]
+
+@pytest.mark.asyncio
+async def test_stream_answer_question_forwards_deltas():
+    """Akışlı yanıt OpenAI parçalarını sırayla iletir ve done olayıyla biter"""
+    from unittest.mock import MagicMock
+
+    def chunk(text):
+        c = MagicMock()
+        c.choices = [MagicMock()]
+        c.choices[0].delta.content = text
+        return c
+
+    async def fake_stream():
+        for text in ["Enflasyon ", None, "fiyatların ", "artışıdır."]:
+            yield chunk(text)
+
+    async def fake_topic(question):
+        return "finance"
+
+    with patch.object(ask_handler, "detect_topic", fake_topic), \
+         patch.object(ask_handler, "openai_client") as mock_openai:
+        mock_openai.chat.completions.create = AsyncMock(return_value=fake_stream())
+        events = [e async for e in ask_handler.stream_answer_question("Enflasyon nedir?", "finance")]
+
+    deltas = [e["data"]["content"] for e in events if e["event"] == "delta"]
+    assert deltas == ["Enflasyon ", "fiyatların ", "artışıdır."]
+    assert events[-1]["event"] == "done"
+    assert events[-1]["data"]["reply"] == "Enflasyon fiyatların artışıdır."
+    assert events[-1]["data"]["is_listing_response"] is False
+    assert mock_openai.chat.completions.create.call_args.kwargs["stream"] is True
+
+@pytest.mark.asyncio
+async def test_extract_filters_skips_llm_when_confident():
+    """Kural tabanlı çıkarıcı yeterince eminse OpenAI çağrılmaz"""
+    with patch.object(ask_handler.openai_client.chat.completions, "create", AsyncMock(side_effect=AssertionError("LLM çağrılmamalı"))):
+        filters = await ask_handler.extract_filters_from_query("Kadıköy'de 5 milyona kadar 2+1 daire")
+    assert filters == {"max_fiyat": 5000000, "oda_sayisi": "2+1", "lokasyon": "Kadıköy"}
+
+@pytest.mark.asyncio
+async def test_local_intent_classifier_skips_llm_classifiers():
+    """Yerel sınıflandırıcı emin olduğunda router ve eski sınıflandırıcılar çağrılmaz"""
+    async def fail(*args, **kwargs):
+        raise AssertionError("LLM classifier should not run")
+
+    async def fake_search(question, filters=None, query_embedding=None):
+        return []
+
+    stats = IntentStats()
+    classify = MagicMock(wraps=ask_handler.classify_intent)
+    question = "Kadıköy'de satılık daire bul"
+    with patch.object(ask_handler, "LOCAL_INTENT_CLASSIFIER", True), \
+         patch.object(ask_handler, "route_query", fail), \
+         patch.object(ask_handler, "check_if_property_listing_query", fail), \
+         patch.object(ask_handler, "detect_topic", fail), \
+         patch.object(ask_handler, "hybrid_search_listings", fake_search), \
+         patch.object(ask_handler, "classify_intent", classify), \
+         patch.object(ask_handler, "intent_stats", stats):
+        is_listing, topic, listings = await ask_handler._run_real_estate_precalls(question, ask_handler.classify_intent(question))
+        classify.reset_mock()
+        redirected = await ask_handler.answer_question("Borsada hangi hisseler yükselir?", "real-estate")
+
+    assert (is_listing, topic, listings) == (True, "real-estate", [])
+    assert redirected["reply"] == ask_handler.REDIRECTION_MESSAGES["real-estate-to-finance"]
+    # Soru bir kez sınıflandırılır ve istek başına bir kez sayılır
+    assert classify.call_count == 1
+    assert (stats.local, stats.llm_fallback) == (1, 0)
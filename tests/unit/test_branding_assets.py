@@ -0,0 +1,103 @@
+# tests/unit/test_branding_assets.py
+import sys
+import os
+import io
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pdf_handler
+from branding_assets import BrandingAssetCache, prepare_image
+
+ASSETS = {
+    "photo": ("https://example.com/photo.jpg", (52, 70)),
+    "logo": ("https://example.com/logo.png", (75, 50)),
+}
+
+def _image_bytes(size=(800, 600), fmt="PNG", mode="RGBA"):
+    out = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30) if mode == "RGB" else (200, 30, 30, 128)).save(out, format=fmt)
+    return out.getvalue()
+
+class FakeDownloader:
+    def __init__(self, fail=False):
+        self.urls = []
+        self.fail = fail
+
+    async def __call__(self, url):
+        self.urls.append(url)
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise OSError("ağ hatası")
+        return _image_bytes(fmt="JPEG" if url.endswith(".jpg") else "PNG",
+                            mode="RGB" if url.endswith(".jpg") else "RGBA")
+
+def test_prepare_image_downscales_and_keeps_alpha():
+    data = prepare_image(_image_bytes((800, 600)), (75, 50), scale=2)
+    with Image.open(io.BytesIO(data)) as image:
+        assert image.format == "PNG"
+        assert image.size[0] <= 150 and image.size[1] <= 100
+        assert image.mode == "RGBA"
+
+@pytest.mark.asyncio
+async def test_assets_are_downloaded_once_for_concurrent_renders():
+    """Eş zamanlı PDF'ler görselleri tek seferde indirir; sonraki render'lar ağa çıkmaz"""
+    downloader = FakeDownloader()
+    cache = BrandingAssetCache(ASSETS, directory="", downloader=downloader)
+    snapshots = await asyncio.gather(cache.snapshot(), cache.snapshot(), cache.snapshot())
+    assert all(set(s) == {"photo", "logo"} for s in snapshots)
+    await cache.snapshot()
+    assert sorted(downloader.urls) == sorted(url for url, _ in ASSETS.values())
+    assert snapshots[0]["logo"] is snapshots[1]["logo"]
+
+@pytest.mark.asyncio
+async def test_local_file_overrides_url(tmp_path):
+    (tmp_path / "logo.png").write_bytes(_image_bytes())
+    downloader = FakeDownloader()
+    cache = BrandingAssetCache(ASSETS, directory=str(tmp_path), downloader=downloader)
+    assets = await cache.snapshot()
+    assert assets["logo"].source == "file"
+    assert downloader.urls == ["https://example.com/photo.jpg"]
+
+@pytest.mark.asyncio
+async def test_stale_asset_is_refreshed_in_background(clock):
+    downloader = FakeDownloader()
+    cache = BrandingAssetCache({"logo": ASSETS["logo"]}, directory="", refresh_interval=100,
+                               downloader=downloader, clock=clock)
+    first = await cache.get("logo")
+    clock.now = 150
+    assert await cache.get("logo") is first  # eski kopya beklemeden döner
+    await cache._refresh_tasks["logo"]
+    assert len(downloader.urls) == 2
+    assert (await cache.get("logo")) is not first
+
+@pytest.mark.asyncio
+async def test_failed_asset_is_skipped_until_retry_interval(clock):
+    downloader = FakeDownloader(fail=True)
+    cache = BrandingAssetCache({"logo": ASSETS["logo"]}, directory="", retry_after=60,
+                               downloader=downloader, clock=clock)
+    assert await cache.snapshot() == {}
+    assert await cache.snapshot() == {}
+    assert len(downloader.urls) == 1
+    clock.now = 61
+    downloader.fail = False
+    assert set(await cache.snapshot()) == {"logo"}
+
+@pytest.mark.asyncio
+async def test_pdf_renders_without_network():
+    """Görseller indirilemese bile PDF üretilir"""
+    cache = BrandingAssetCache(ASSETS, directory="", downloader=FakeDownloader(fail=True))
+    data = {"title": "Moda'da 2+1 Daire", "portfoy_no": "P123", "price": "4.500.000",
+            "specs": {"Oda Sayısı": "2+1"}, "description": "Denize yakın."}
+    with patch.object(pdf_handler, "branding_assets", cache):
+        pdf = await pdf_handler.create_compact_pdf(data)
+    assert pdf.startswith(b"%PDF")
+
+    cache = BrandingAssetCache(ASSETS, directory="", downloader=FakeDownloader())
+    with patch.object(pdf_handler, "branding_assets", cache):
+        with_images = await pdf_handler.create_compact_pdf(data)
+    assert len(with_images) > len(pdf)
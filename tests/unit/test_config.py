@@ -0,0 +1,19 @@
+# tests/unit/test_config.py
+import sys
+import os
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from config import env_flag
+
+def test_env_flag_values_and_default():
+    """1/true/yes/on açık sayılır, diğer değerler kapalı; tanımsızsa varsayılan döner"""
+    for value in ("1", "true", " TRUE ", "yes", "On"):
+        with patch.dict(os.environ, {"SIBEL_TEST_FLAG": value}):
+            assert env_flag("SIBEL_TEST_FLAG", False) is True
+    for value in ("0", "false", "off", ""):
+        with patch.dict(os.environ, {"SIBEL_TEST_FLAG": value}):
+            assert env_flag("SIBEL_TEST_FLAG", True) is False
+    with patch.dict(os.environ, {}, clear=True):
+        assert env_flag("SIBEL_TEST_FLAG", True) is True
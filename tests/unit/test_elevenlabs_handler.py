@@ -0,0 +1,197 @@
+# tests/unit/test_elevenlabs_handler.py
+import sys
+import os
+import json
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import elevenlabs_handler
+from tts_cache import TTSCache
+
+AUDIO = b"ID3" + bytes(range(256)) * 40
+
+def _app():
+    app = FastAPI()
+    app.include_router(elevenlabs_handler.router)
+    return app
+
+@pytest.fixture(autouse=True)
+def settings():
+    with patch.object(elevenlabs_handler, "ELEVENLABS_API_KEY", "xi-test"), \
+         patch.object(elevenlabs_handler, "ELEVENLABS_STREAM_CHUNK_SIZE", 1024), \
+         patch("resilience._breakers", {}), patch("resilience.backoff_delay", lambda attempt: 0), \
+         patch.object(elevenlabs_handler, "tts_cache", TTSCache(enabled=False)), \
+         patch.object(elevenlabs_handler, "_upstream_slots", None):
+        yield
+
+def _upstream(handler):
+    return patch.object(elevenlabs_handler, "get_client",
+                        lambda name: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+@pytest.mark.asyncio
+async def test_audio_is_relayed_from_streaming_endpoint_in_chunks():
+    """Ses, ElevenLabs /stream endpoint'inden parça parça iletilir"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=AUDIO, headers={"content-type": "audio/mpeg"})
+
+    with _upstream(handler):
+        async with httpx.AsyncClient(app=_app(), base_url="http://test") as client:
+            async with client.stream("POST", "/generate-speech", json={"text": "Merhaba"}) as response:
+                chunks = [chunk async for chunk in response.aiter_raw()]
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/mpeg"
+    assert "content-length" not in response.headers
+    assert b"".join(chunks) == AUDIO
+    assert requests[0].url.path.endswith(f"/{elevenlabs_handler.ELEVENLABS_VOICE_ID}/stream")
+
+@pytest.mark.asyncio
+async def test_relay_yields_bounded_chunks_and_closes_upstream():
+    """Upstream gövdesi sınırlı boyutta parçalarla iletilir; okuma bitince bağlantı kapatılır"""
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=AUDIO)))
+    response = await client.send(client.build_request("POST", "http://upstream/stream"), stream=True)
+
+    chunks = [chunk async for chunk in elevenlabs_handler._UpstreamAudio(response).chunks()]
+    assert b"".join(chunks) == AUDIO
+    assert len(chunks) > 1 and max(len(chunk) for chunk in chunks) <= 1024
+    assert response.is_closed
+
+@pytest.mark.asyncio
+async def test_slot_is_released_when_upstream_read_finishes():
+    """Slot, istemci sesi okumasa (yavaş dinleyici / yanıt başlamadan ayrılma) da upstream bitince bırakılır"""
+    with _upstream(lambda request: httpx.Response(200, content=AUDIO)), \
+         patch.object(elevenlabs_handler, "ELEVENLABS_MAX_CONCURRENCY", 1):
+        audio = await elevenlabs_handler._open_segment("Merhaba", {})
+        assert elevenlabs_handler._upstream_slots._value == 0
+        await asyncio.wait_for(audio._task, 1)  # hiç aktarılmadı
+
+        assert elevenlabs_handler._upstream_slots._value == 1
+        assert b"".join([chunk async for chunk in audio.chunks()]) == AUDIO  # gövde arabellekte
+
+@pytest.mark.asyncio
+async def test_upstream_error_is_reported_before_streaming():
+    def handler(request):
+        return httpx.Response(401, json={"detail": {"status": "quota_exceeded"}})
+
+    with _upstream(handler):
+        async with httpx.AsyncClient(app=_app(), base_url="http://test") as client:
+            response = await client.post("/generate-speech", json={"text": "Merhaba"})
+    assert response.status_code == 429
+
+@pytest.mark.asyncio
+async def test_transient_error_is_retried_before_first_byte():
+    attempts = []
+
+    def handler(request):
+        attempts.append(1)
+        if len(attempts) == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, content=AUDIO)
+
+    with _upstream(handler):
+        async with httpx.AsyncClient(app=_app(), base_url="http://test") as client:
+            response = await client.post("/generate-speech", json={"text": "Merhaba"})
+    assert response.status_code == 200
+    assert response.content == AUDIO
+    assert len(attempts) == 2
+
+@pytest.mark.asyncio
+async def test_repeated_sentences_are_served_from_cache(tmp_path):
+    """Cümleler ayrı önbelleklenir; kısmen tekrar eden yanıtta sadece yeni cümle seslendirilir"""
+    texts = []
+
+    def handler(request):
+        text = json.loads(request.content)["text"]
+        texts.append(text)
+        return httpx.Response(200, content=f"<{text}>".encode("utf-8"))
+
+    cache = TTSCache(enabled=True, directory=str(tmp_path))
+    with _upstream(handler), patch.object(elevenlabs_handler, "tts_cache", cache):
+        async with httpx.AsyncClient(app=_app(), base_url="http://test") as client:
+            first = await client.post("/generate-speech", json={"text": "Merhaba! Size nasıl yardımcı olabilirim?", "pipeline": True})
+            second = await client.post("/generate-speech", json={"text": "Merhaba! Kadıköy'de 3 ilan buldum.", "pipeline": True})
+
+    assert first.content == "<Merhaba!><Size nasıl yardımcı olabilirim?>".encode("utf-8")
+    assert second.content == "<Merhaba!><Kadıköy'de 3 ilan buldum.>".encode("utf-8")
+    assert texts == ["Merhaba!", "Size nasıl yardımcı olabilirim?", "Kadıköy'de 3 ilan buldum."]
+    assert cache.summary()["memory_hits"] == 1
+
+@pytest.mark.asyncio
+async def test_pipeline_synthesizes_sentences_concurrently_and_keeps_order():
+    """Cümle hattında parçalar eş zamanlı (sınırlı) üretilir ama metindeki sırayla iletilir"""
+    active, peak = 0, 0
+    delays = {"Bir.": 0.03, "İki.": 0.02, "Üç.": 0.001, "Dört.": 0.01, "Beş.": 0.001}
+
+    async def handler(request):
+        nonlocal active, peak
+        text = json.loads(request.content)["text"]
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(delays[text])
+        active -= 1
+        return httpx.Response(200, content=f"<{text}>".encode("utf-8"))
+
+    with _upstream(handler), patch.object(elevenlabs_handler, "TTS_PIPELINE_CONCURRENCY", 2):
+        async with httpx.AsyncClient(app=_app(), base_url="http://test") as client:
+            response = await client.post("/generate-speech", json={
+                "text": "<p>Bir.</p><ul><li>İki.</li><li>Üç.</li></ul> Dört. Beş.", "pipeline": True})
+
+    assert response.status_code == 200
+    assert response.content.decode("utf-8") == "<Bir.><İki.><Üç.><Dört.><Beş.>"
+    assert peak == 2
+
+@pytest.mark.asyncio
+async def test_upstream_connections_are_capped_across_requests():
+    """Eş zamanlı isteklerin cümle hatları ElevenLabs bağlantı sınırını birlikte aşamaz"""
+    active, peak = 0, 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200, content=b"<ses>")
+
+    text = "Bir. İki. Üç. Dört."
+    with _upstream(handler), patch.object(elevenlabs_handler, "ELEVENLABS_MAX_CONCURRENCY", 2):
+        async with httpx.AsyncClient(app=_app(), base_url="http://test") as client:
+            responses = await asyncio.gather(*(
+                client.post("/generate-speech", json={"text": text, "pipeline": True}) for _ in range(3)))
+
+    assert [r.content for r in responses] == [b"<ses>" * 4] * 3
+    assert peak == 2
+    assert elevenlabs_handler._upstream_slots._value == 2  # tüm slotlar geri bırakıldı
+
+@pytest.mark.asyncio
+async def test_short_text_is_sent_as_single_request_without_pipeline(tmp_path):
+    """Varsayılan ayarlarla (önbellek açık) kısa metin cümlelere bölünmeden tek istekle seslendirilir"""
+    texts = []
+
+    def handler(request):
+        text = json.loads(request.content)["text"]
+        texts.append(text)
+        return httpx.Response(200, content=f"<{text}>".encode("utf-8"))
+
+    cache = TTSCache(enabled=True, directory=str(tmp_path))
+    with _upstream(handler), patch.object(elevenlabs_handler, "tts_cache", cache):
+        async with httpx.AsyncClient(app=_app(), base_url="http://test") as client:
+            first = await client.post("/generate-speech", json={"text": "Merhaba! Nasılsınız?"})
+            repeated = await client.post("/generate-speech", json={"text": "<p>Merhaba!</p>\n<p>Nasılsınız?</p>"})
+            # Cümleleri uzun bir yanıtta önbelleğe girdiyse kısa metin istek yapılmadan birleştirilir
+            await client.post("/generate-speech", json={"text": "Bir. İki.", "pipeline": True})
+            assembled = await client.post("/generate-speech", json={"text": "İki. Bir."})
+
+    assert texts == ["Merhaba! Nasılsınız?", "Bir.", "İki."]
+    # HTML'li metin de düz metne çevrilip aynı anahtarla önbellekten sunulur
+    assert first.content == repeated.content == "<Merhaba! Nasılsınız?>".encode("utf-8")
+    assert assembled.content == "<İki.><Bir.>".encode("utf-8")
@@ -0,0 +1,55 @@
+# tests/unit/test_embedding_cache.py
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from embedding_cache import EmbeddingCache
+
+@pytest.mark.asyncio
+async def test_memory_hit_uses_normalized_key():
+    """Büyük/küçük harf ve boşluk farkı aynı anahtara düşer"""
+    cache = EmbeddingCache(max_items=8)
+    await cache.set("Kadıköy'de  3+1", "text-embedding-3-small", [0.5, 0.25])
+
+    assert await cache.get("  kadıköy'de 3+1 ", "text-embedding-3-small") == [0.5, 0.25]
+    assert await cache.get("kadıköy'de 3+1", "another-model") is None
+    assert cache.stats["memory_hits"] == 1
+    assert cache.stats["misses"] == 1
+
+@pytest.mark.asyncio
+async def test_vectors_stored_as_float32_bytes():
+    """Vektörler float32 byte dizisi olarak saklanır"""
+    cache = EmbeddingCache(max_items=8)
+    await cache.set("test", "m", [0.1, 0.2, 0.3])
+    (blob,) = cache._memory.values()
+    assert isinstance(blob, bytes)
+    assert len(blob) == 3 * 4
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_new_instance(tmp_path):
+    """Disk katmanı yeni bir süreçte (örnekte) de isabet verir"""
+    first = EmbeddingCache(max_items=8, backend="disk", directory=str(tmp_path))
+    await first.set("tapu masrafı", "m", [1.0, 2.0])
+
+    second = EmbeddingCache(max_items=8, backend="disk", directory=str(tmp_path))
+    assert await second.get("tapu masrafı", "m") == [1.0, 2.0]
+    assert second.stats["persistent_hits"] == 1
+
+@pytest.mark.asyncio
+async def test_get_embedding_skips_api_on_hit():
+    """Önbellek isabetinde OpenAI çağrılmaz"""
+    import ask_handler
+
+    response = MagicMock()
+    response.data = [MagicMock(embedding=[0.5, 0.75])]
+    cache = EmbeddingCache(max_items=8)
+    with patch.object(ask_handler, "embedding_cache", cache), \
+         patch.object(ask_handler, "openai_client") as mock_openai:
+        mock_openai.embeddings.create = AsyncMock(return_value=response)
+        assert await ask_handler.get_embedding("Moda'da kiralık") == [0.5, 0.75]
+        assert await ask_handler.get_embedding("moda'da kiralık") == [0.5, 0.75]
+
+    mock_openai.embeddings.create.assert_called_once()
@@ -0,0 +1,57 @@
+# tests/unit/test_filter_extractor.py
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from filter_extractor import FILTER_EXTRACTOR_MIN_CONFIDENCE, FilterExtractionStats, extract_filters_locally
+
+def test_common_patterns_resolved_locally():
+    """Fiyat, oda sayısı ve ekli lokasyon LLM'siz çıkarılır"""
+    filters, confidence = extract_filters_locally("Kadıköy'de 5 milyona kadar 3+1 daire")
+    assert filters == {"max_fiyat": 5000000, "oda_sayisi": "3+1", "lokasyon": "Kadıköy"}
+    assert confidence >= FILTER_EXTRACTOR_MIN_CONFIDENCE
+
+    filters, _ = extract_filters_locally("beşiktaştaki stüdyo daireler")
+    assert filters == {"oda_sayisi": "1+0", "lokasyon": "Beşiktaş"}
+
+def test_price_directions_and_ranges():
+    """Alt/üst sınır ifadeleri ve aralıklar doğru alana yazılır"""
+    assert extract_filters_locally("2,5 milyon TL üzeri villa Sarıyer")[0] == {"min_fiyat": 2500000, "lokasyon": "Sarıyer"}
+    assert extract_filters_locally("3-5 milyon arası Üsküdar")[0] == {"min_fiyat": 3000000, "max_fiyat": 5000000, "lokasyon": "Üsküdar"}
+    assert extract_filters_locally("en fazla 750 bin ₺ ataşehir")[0] == {"max_fiyat": 750000, "lokasyon": "Ataşehir"}
+    # Metrekare fiyat olarak okunmaz
+    assert extract_filters_locally("5.000.000 TL altı 120 m2 daire maltepe")[0] == {"max_fiyat": 5000000, "lokasyon": "Maltepe"}
+
+def test_low_confidence_when_unsure():
+    """Bilinmeyen yer, birden fazla lokasyon veya açıklanamayan sayı LLM'e bırakılır"""
+    assert extract_filters_locally("bodrum'da villa")[1] < FILTER_EXTRACTOR_MIN_CONFIDENCE
+    assert extract_filters_locally("moda ve bostancıda daire")[1] < FILTER_EXTRACTOR_MIN_CONFIDENCE
+    assert extract_filters_locally("2 katlı ev pendik")[1] < FILTER_EXTRACTOR_MIN_CONFIDENCE
+    assert extract_filters_locally("bana bir ev bul")[1] < FILTER_EXTRACTOR_MIN_CONFIDENCE
+
+def test_unresolved_place_names_lower_confidence():
+    """Büyük harfli veya bulunma ekli ama sözlükte olmayan yer adları LLM'e bırakılır"""
+    assert extract_filters_locally("Bodrumda 3+1 villa")[1] < FILTER_EXTRACTOR_MIN_CONFIDENCE
+    assert extract_filters_locally("İzmir Karşıyaka 3+1 daire")[1] < FILTER_EXTRACTOR_MIN_CONFIDENCE
+    assert extract_filters_locally("Antalya 5 milyona kadar")[1] < FILTER_EXTRACTOR_MIN_CONFIDENCE
+    # Sık kelimeler ve şehir adı güveni düşürmez
+    filters, confidence = extract_filters_locally("Satılık daire İstanbul Kadıköy'de")
+    assert filters == {"lokasyon": "Kadıköy"}
+    assert confidence >= FILTER_EXTRACTOR_MIN_CONFIDENCE
+
+def test_ambiguous_place_needs_listing_context():
+    """Kulüp/günlük kelime olarak da geçen yer adı eksizse emlak bağlamı ister"""
+    assert "lokasyon" not in extract_filters_locally("Fenerbahçe maçı")[0]
+    assert extract_filters_locally("Fenerbahçe 3+1 daire")[0]["lokasyon"] == "Fenerbahçe"
+    assert extract_filters_locally("Moda'da 2+1")[0]["lokasyon"] == "Moda"
+
+def test_coverage_stats():
+    """Kapsama oranı yerel/LLM sayaçlarından hesaplanır"""
+    stats = FilterExtractionStats()
+    stats.record(True, {"lokasyon": "Kadıköy"})
+    stats.record(True, {"oda_sayisi": "2+1"})
+    stats.record(False, {})
+    summary = stats.summary()
+    assert summary["coverage"] == 0.667
+    assert summary["local_fields"]["lokasyon"] == 1
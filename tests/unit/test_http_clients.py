@@ -0,0 +1,48 @@
+# tests/unit/test_http_clients.py
+import pytest
+import sys
+import os
+from unittest.mock import patch
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import http_clients
+from http_clients import HttpClientRegistry
+
+@pytest.mark.asyncio
+async def test_registry_reuses_client_per_upstream():
+    """Aynı upstream için aynı istemci döner, farklı upstream'ler ayrı havuz kullanır"""
+    registry = HttpClientRegistry()
+    google = registry.get("google")
+    assert registry.get("google") is google
+    assert registry.get("firecrawl") is not google
+    await registry.shutdown()
+    assert google.is_closed
+
+@pytest.mark.asyncio
+async def test_timeout_override_from_env():
+    """HTTP_TIMEOUT_<AD> ortam değişkeni profil zaman aşımını ezer"""
+    registry = HttpClientRegistry()
+    with patch.dict(os.environ, {"HTTP_TIMEOUT_ELEVENLABS": "45"}):
+        client = registry.get("elevenlabs")
+    assert client.timeout.read == 45.0
+    await registry.shutdown()
+
+@pytest.mark.asyncio
+async def test_search_google_uses_shared_client():
+    """search_google paylaşılan 'google' istemcisi üzerinden gider"""
+    import search_handler
+
+    def handler(request):
+        assert request.url.params["q"] == "dolar kuru"
+        return httpx.Response(200, json={"items": [{"title": "USD", "link": "https://example.com"}]})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with patch.object(search_handler, "GOOGLE_API_KEY", "test-key"), \
+         patch.dict(http_clients.registry._clients, {"google": client}):
+        results = await search_handler.search_google("dolar kuru")
+
+    assert results == [{"title": "USD", "link": "https://example.com"}]
+    await client.aclose()
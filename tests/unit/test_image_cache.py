@@ -0,0 +1,91 @@
+# tests/unit/test_image_cache.py
+import sys
+import os
+import asyncio
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from image_cache import ImageResultCache, image_key
+
+PARAMS = {"model": "dall-e-3", "size": "1024x1024", "quality": "standard"}
+
+def _generator(calls):
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return f"https://img.example/{len(calls)}.png"
+    return generate
+
+def test_image_key_normalizes_prompt_and_includes_params():
+    assert image_key("Modern salon  dekorasyonu", **PARAMS) == image_key(" modern SALON dekorasyonu ", **PARAMS)
+    assert image_key("modern salon", **PARAMS) != image_key("modern salon", **{**PARAMS, "size": "1792x1024"})
+
+@pytest.mark.asyncio
+async def test_same_prompt_is_served_from_cache_until_ttl(clock):
+    """Aynı prompt TTL süresince yeniden üretilmez; TTL sonunda (URL süresi dolmadan) yenilenir"""
+    cache = ImageResultCache(enabled=True, ttl=3000, persist_dir="", timer=clock)
+    calls = []
+
+    first = await cache.get_or_generate("modern salon dekorasyonu", _generator(calls), **PARAMS)
+    second = await cache.get_or_generate("Modern Salon Dekorasyonu", _generator(calls), **PARAMS)
+    assert first == second and len(calls) == 1
+
+    clock.now = 3001
+    third = await cache.get_or_generate("modern salon dekorasyonu", _generator(calls), **PARAMS)
+    assert third != first and len(calls) == 2
+    assert cache.summary()["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_prompts_generate_once():
+    cache = ImageResultCache(enabled=True, persist_dir="")
+    calls = []
+    results = await asyncio.gather(*(cache.get_or_generate("bahçeli villa", _generator(calls), **PARAMS) for _ in range(3)))
+    assert len(set(results)) == 1
+    assert len(calls) == 1
+    assert cache.summary()["coalesced"] == 2
+
+@pytest.mark.asyncio
+async def test_failures_are_not_cached():
+    cache = ImageResultCache(enabled=True, persist_dir="")
+
+    async def failing():
+        raise RuntimeError("content_policy_violation")
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_generate("x", failing, **PARAMS)
+    calls = []
+    await cache.get_or_generate("x", _generator(calls), **PARAMS)
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_persisted_images_get_local_url(tmp_path):
+    """Yerel kopya açıkken görsel diske yazılır ve süresi dolmayan yerel URL döner"""
+    async def download(url):
+        return b"\x89PNG-data"
+
+    cache = ImageResultCache(enabled=True, persist_dir=str(tmp_path), downloader=download,
+                             public_base_url="https://api.sibelgpt.com/")
+    calls = []
+    url = await cache.get_or_generate("loft daire", _generator(calls), **PARAMS)
+    name = url.rsplit("/", 1)[1]
+    assert url.startswith("https://api.sibelgpt.com/image/files/")
+    assert cache.file_path(name).read_bytes() == b"\x89PNG-data"
+    assert cache.file_path("../secret.png") is None
+
+    # Yeni süreç (boş bellek) aynı dosyayı diskten bulur; genel adres yoksa isteğin adresi kullanılır
+    restarted = ImageResultCache(enabled=True, persist_dir=str(tmp_path), downloader=download, public_base_url="")
+    again = await restarted.get_or_generate("loft daire", _generator(calls), **PARAMS, base_url="http://test/")
+    assert again == f"http://test/image/files/{name}"
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_download_failure_falls_back_to_remote_url(tmp_path):
+    async def download(url):
+        raise OSError("bağlantı hatası")
+
+    cache = ImageResultCache(enabled=True, persist_dir=str(tmp_path), downloader=download)
+    url = await cache.get_or_generate("stüdyo daire", _generator([]), **PARAMS)
+    assert url == "https://img.example/1.png"
+    assert list(tmp_path.iterdir()) == []
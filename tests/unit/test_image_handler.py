@@ -0,0 +1,108 @@
+# tests/unit/test_image_handler.py
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import image_handler
+
+def _image_response(url="https://img.example/1.png"):
+    return SimpleNamespace(data=[SimpleNamespace(url=url)])
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(image_handler.router)
+    return httpx.AsyncClient(app=app, base_url="http://test")
+
+@pytest.fixture(autouse=True)
+def clean_jobs():
+    with patch.dict(image_handler._jobs, clear=True), patch("resilience._breakers", {}), \
+         patch.object(image_handler.image_cache, "enabled", False):
+        yield
+
+@pytest.mark.asyncio
+async def test_sync_mode_returns_image_url(client):
+    """job=false iken eski yanıt biçimi korunur ve async istemci kullanılır"""
+    generate = AsyncMock(return_value=_image_response())
+    with patch.object(image_handler.openai_client.images, "generate", generate):
+        async with client:
+            response = await client.post("/image", json={"prompt": "deniz manzaralı ev"})
+    assert response.json() == {"image_url": "https://img.example/1.png"}
+    assert generate.await_args.kwargs["prompt"] == "deniz manzaralı ev"
+
+@pytest.mark.asyncio
+async def test_sync_mode_returns_error_on_failure(client):
+    generate = AsyncMock(side_effect=ValueError("içerik politikası"))
+    with patch.object(image_handler.openai_client.images, "generate", generate):
+        async with client:
+            response = await client.post("/image", json={"prompt": "x"})
+    assert response.json() == {"error": "içerik politikası"}
+    assert generate.await_count == 1  # görsel üretimi tekrar denenmez
+
+@pytest.mark.asyncio
+async def test_job_mode_returns_immediately_and_can_be_polled(client):
+    """job=true iken istek üretim bitmeden 202 ile döner; sonuç durum uç noktasından alınır"""
+    release = asyncio.Event()
+
+    async def slow_generate(**kwargs):
+        await release.wait()
+        return _image_response()
+
+    with patch.object(image_handler.openai_client.images, "generate", slow_generate):
+        async with client:
+            response = await client.post("/image", json={"prompt": "villa", "job": True})
+            assert response.status_code == 202
+            body = response.json()
+            assert body["status"] == "pending"
+            assert body["status_url"] == f"/image/jobs/{body['job_id']}"
+
+            await asyncio.sleep(0)
+            status = (await client.get(body["status_url"])).json()
+            assert status["status"] == "running"
+
+            release.set()
+            await image_handler._jobs[body["job_id"]].finished.wait()
+            status = (await client.get(body["status_url"])).json()
+    assert status == {"job_id": body["job_id"], "status": "done", "image_url": "https://img.example/1.png"}
+
+@pytest.mark.asyncio
+async def test_job_events_stream_sends_done_event(client):
+    generate = AsyncMock(return_value=_image_response("https://img.example/2.png"))
+    with patch.object(image_handler.openai_client.images, "generate", generate):
+        async with client:
+            body = (await client.post("/image", json={"prompt": "daire", "job": True})).json()
+            response = await client.get(body["events_url"])
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "event: done" in response.text
+    assert "https://img.example/2.png" in response.text
+
+@pytest.mark.asyncio
+async def test_unknown_job_returns_404(client):
+    async with client:
+        response = await client.get("/image/jobs/yok")
+    assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_concurrency_is_capped():
+    active, peak = 0, 0
+
+    async def slow_generate(**kwargs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return _image_response()
+
+    with patch.object(image_handler.openai_client.images, "generate", slow_generate), \
+         patch.object(image_handler, "_semaphore", asyncio.Semaphore(2)):
+        await asyncio.gather(*(image_handler.generate_image_url(f"p{i}") for i in range(5)))
+    assert peak == 2
@@ -0,0 +1,54 @@
+# tests/unit/test_intent_classifier.py
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from intent_classifier import INTENT_CLASSIFIER_MIN_CONFIDENCE, classify_intent
+from intent_eval import evaluate
+
+def test_listing_queries_detected():
+    """Arama fiili, mülk tipi veya filtre içeren sorular ilan araması sayılır"""
+    for question in ["Kadıköy'de satılık daire bul", "20 milyona kadar 3+1 daire arıyorum", "Maltepe'de villa göster"]:
+        intent = classify_intent(question)
+        assert intent["is_listing"] is True
+        assert intent["listing_confidence"] >= INTENT_CLASSIFIER_MIN_CONFIDENCE
+        assert intent["topic"] == "real-estate"
+
+def test_information_questions_are_not_listings():
+    """Bilgi soruları ilan araması değildir"""
+    for question in ["Ev alırken nelere dikkat etmeliyim?", "Tapu masrafları nasıl hesaplanır?"]:
+        intent = classify_intent(question)
+        assert intent["is_listing"] is False
+        assert intent["listing_confidence"] >= INTENT_CLASSIFIER_MIN_CONFIDENCE
+
+def test_information_cues_block_confident_listing_decision():
+    """İlan kelimesi geçen bilgi soruları kendinden emin şekilde ilan aramasına gönderilmez"""
+    for question in ["satılık daire ilanı nasıl verilir", "3+1 daire kira getirisi hesaplama", "evim satılık mı olsun kiralık mı"]:
+        intent = classify_intent(question)
+        assert not (intent["is_listing"] and intent["listing_confidence"] >= INTENT_CLASSIFIER_MIN_CONFIDENCE), question
+
+def test_price_limit_is_not_read_as_gold():
+    """"... TL altında" fiyat sınırıdır; "altın" (finans) olarak sayılmaz"""
+    intent = classify_intent("3 milyon TL altında stüdyo")
+    assert intent["topic"] == "real-estate"
+    assert intent["is_listing"] is True
+    assert classify_intent("Altın mı dolar mı?")["topic"] == "finance"
+
+def test_topics_and_uncertain_cases():
+    """Finans/zihin koçu konuları ayrılır, anahtar kelime yoksa LLM'e bırakılır"""
+    assert classify_intent("Borsada hangi hisseler yükselir?")["topic"] == "finance"
+    assert classify_intent("Son zamanlarda çok stresliyim")["topic"] == "mind-coach"
+    assert classify_intent("Bugün hava nasıl?")["topic_confidence"] < INTENT_CLASSIFIER_MIN_CONFIDENCE
+
+def test_evaluate_reports_coverage_and_agreement():
+    """Değerlendirme kapsama ve uyum oranını raporlar"""
+    labels = {
+        "Enflasyon nedir?": {"question": "Enflasyon nedir?", "is_listing": False, "topic": "finance"},
+        "Kadıköy'de satılık daire bul": {"question": "Kadıköy'de satılık daire bul", "is_listing": True, "topic": "general"},
+    }
+    report = evaluate(list(labels), labels)
+    assert report["total"] == 2
+    assert report["is_listing"] == {"coverage": 1.0, "agreement": 1.0}
+    assert report["topic"]["agreement"] == 0.5
+    assert report["disagreements"][0]["field"] == "topic"
@@ -0,0 +1,154 @@
+# tests/unit/test_listing_index.py
+import pytest
+import sys
+import os
+from unittest.mock import patch
+
+import httpx
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import supabase_rpc
+from listing_index import ListingIndex
+from listing_store import acquire_writer_lock
+from supabase_rpc import AsyncPostgrestClient
+
+ROWS = [
+    {"id": 1, "baslik": "Moda 2+1", "ilce": "Kadıköy", "mahalle": "Moda", "fiyat": "4.500.000 ₺",
+     "oda_sayisi": "2+1", "embedding": "[1, 0, 0]", "updated_at": "2025-06-01T10:00:00"},
+    {"id": 2, "baslik": "Bostancı 3+1", "ilce": "Kadıköy", "mahalle": "Bostancı", "fiyat_numeric": 9000000,
+     "oda_sayisi": "3 + 1", "embedding": [0.9, 0.1, 0], "updated_at": "2025-06-02T10:00:00"},
+    {"id": 3, "baslik": "Levent 3+1", "ilce": "Beşiktaş", "mahalle": "Levent", "fiyat_numeric": 25000000,
+     "oda_sayisi": "3+1", "embedding": [0, 1, 0], "updated_at": "2025-06-03T10:00:00"},
+]
+
+def _index():
+    index = ListingIndex()
+    index.upsert(ROWS, replace=True)
+    return index
+
+def test_search_ranks_by_cosine_and_applies_threshold():
+    """Sonuçlar benzerliğe göre sıralanır, eşik altı elenir"""
+    results = _index().search([1, 0, 0], {}, match_threshold=0.4, match_count=25)
+    assert [r["id"] for r in results] == [1, 2]
+    assert "embedding" not in results[0]
+    assert results[0]["similarity"] == pytest.approx(1.0)
+
+def test_search_filters_price_room_and_location():
+    """fiyat/oda/lokasyon filtreleri sütun dizileri üzerinden uygulanır"""
+    index = _index()
+    assert [r["id"] for r in index.search([1, 0, 0], {"max_fiyat": 5000000}, 0.0, 25)] == [1]
+    assert [r["id"] for r in index.search([1, 1, 0], {"oda_sayisi": "3+1"}, 0.0, 25)] == [2, 3]
+    assert [r["id"] for r in index.search([1, 1, 0], {"lokasyon": "KADIKÖY"}, 0.0, 25)] == [2, 1]
+    assert [r["id"] for r in index.search([1, 1, 0], {"lokasyon": "bostancı"}, 0.0, 25)] == [2]
+
+def test_search_top_k():
+    """match_count kadar sonuç döner"""
+    assert len(_index().search([1, 1, 0], {}, 0.0, 2)) == 2
+
+@pytest.mark.asyncio
+async def test_incremental_sync_requests_updated_at_delta(tmp_path):
+    """İkinci senkronizasyon sadece updated_at deltasını ister ve satırı günceller"""
+    requests = []
+
+    def handler(request):
+        requests.append(dict(request.url.params))
+        if "updated_at" not in request.url.params:
+            return httpx.Response(200, json=ROWS)
+        changed = dict(ROWS[0], fiyat="3.000.000 ₺", updated_at="2025-06-04T10:00:00")
+        return httpx.Response(200, json=[changed])
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    stand_in = AsyncPostgrestClient("http://stand-in", "anon", client_factory=lambda: client)
+    index = ListingIndex()
+    with patch.object(supabase_rpc, "rpc_client", stand_in), \
+         patch("listing_index.LISTING_INDEX_DIR", str(tmp_path)):
+        assert await index.sync() == 3
+        assert await index.sync() == 1
+
+    assert requests[1]["updated_at"] == "gt.2025-06-03T10:00:00"
+    assert len(index) == 3
+    # Yazıcı da yazdığı sürümü memmap ile geri açar
+    assert isinstance(index._snapshot.matrix, np.memmap)
+    assert index.disk_version == (tmp_path / "CURRENT").read_text()
+    assert [r["id"] for r in index.search([1, 0, 0], {"max_fiyat": 3500000}, 0.0, 25)] == [1]
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_sync_rebuilds_off_the_event_loop(tmp_path):
+    """Embedding ayrıştırma ve matris kurulumu olay döngüsü thread'inde yapılmaz"""
+    import threading
+
+    threads = []
+    build = ListingIndex._build
+
+    def spy(self, rows, replace):
+        threads.append(threading.current_thread())
+        return build(self, rows, replace)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, json=ROWS)))
+    stand_in = AsyncPostgrestClient("http://stand-in", "anon", client_factory=lambda: client)
+    index = ListingIndex()
+    with patch.object(supabase_rpc, "rpc_client", stand_in), patch.object(ListingIndex, "_build", spy), \
+         patch("listing_index.LISTING_INDEX_DIR", ""):
+        assert await index.sync() == 3
+
+    assert threads and threads[0] is not threading.main_thread()
+    assert len(index) == 3
+    await client.aclose()
+
+def test_disk_store_roundtrip_uses_memmap(tmp_path):
+    """İndeks diske yazılır, yeniden açıldığında matris memmap olur ve arama aynı sonucu verir"""
+    index = _index()
+    index.last_updated_at = "2025-06-03T10:00:00"
+    index.save_to_disk(str(tmp_path))
+
+    reopened = ListingIndex()
+    assert reopened.load_from_disk(str(tmp_path))
+    assert isinstance(reopened._snapshot.matrix, np.memmap)
+    assert reopened.last_updated_at == "2025-06-03T10:00:00"
+    assert [r["id"] for r in reopened.search([1, 1, 0], {"lokasyon": "bostancı"}, 0.0, 25)] == [2]
+
+def test_disk_store_pointer_switches_atomically(tmp_path):
+    """Yeni yazım CURRENT işaretçisini yeni sürüme taşır"""
+    index = _index()
+    index.save_to_disk(str(tmp_path))
+    first = (tmp_path / "CURRENT").read_text()
+
+    index.upsert([dict(ROWS[0], id=4, updated_at="2025-06-05T10:00:00")])
+    index.save_to_disk(str(tmp_path))
+    assert (tmp_path / "CURRENT").read_text() != first
+
+    reopened = ListingIndex()
+    reopened.load_from_disk(str(tmp_path))
+    assert len(reopened) == 4
+
+@pytest.mark.asyncio
+async def test_follower_switches_to_new_version(tmp_path):
+    """Yazıcı olmayan worker CURRENT değişince yeni sürümü açar, değişmediyse dokunmaz"""
+    writer = _index()
+    writer.save_to_disk(str(tmp_path))
+    follower = ListingIndex()
+    with patch("listing_index.LISTING_INDEX_DIR", str(tmp_path)):
+        assert await follower.follow() is True
+        assert await follower.follow() is False
+        writer.upsert([dict(ROWS[0], id=4, updated_at="2025-06-05T10:00:00")])
+        writer.save_to_disk(str(tmp_path))
+        assert await follower.follow() is True
+    assert len(follower) == 4
+    assert follower.last_updated_at == "2025-06-05T10:00:00"
+
+def test_writer_lock_is_exclusive(tmp_path):
+    """Aynı dizin için yazıcı kilidini tek süreç (açık dosya) tutabilir"""
+    first = acquire_writer_lock(str(tmp_path))
+    assert first is not None
+    assert acquire_writer_lock(str(tmp_path)) is None
+    first.close()
+    second = acquire_writer_lock(str(tmp_path))
+    assert second is not None
+    second.close()
+
+def test_load_from_missing_directory(tmp_path):
+    """Disk indeksi yoksa False döner"""
+    assert ListingIndex().load_from_disk(str(tmp_path / "yok")) is False
@@ -0,0 +1,116 @@
+# tests/unit/test_openai_scheduler.py
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import openai_scheduler
+from openai_scheduler import (PRIORITY_CLASSIFIER, PRIORITY_COMPLETION, OpenAIQueueTimeout,
+                              OpenAIScheduler, current_client, estimate_tokens)
+
+async def _hold(scheduler, order, name, client="anonymous", priority=PRIORITY_COMPLETION, hold=0.0):
+    current_client.set(client)
+    async with scheduler.slot("gpt-4o", 10, priority):
+        order.append(name)
+        await asyncio.sleep(hold)
+
+@pytest.mark.asyncio
+async def test_global_concurrency_limit():
+    """Aynı anda en fazla max_concurrency çağrı yürütülür"""
+    scheduler = OpenAIScheduler(max_concurrency=2, rpm=0, tpm=0)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with scheduler.slot("gpt-4o", 10):
+            peak = max(peak, scheduler.active)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(call() for _ in range(6)))
+    assert peak == 2
+    assert scheduler.active == 0
+    assert scheduler.summary()["admitted"] == 6
+
+@pytest.mark.asyncio
+async def test_classifier_priority_and_fair_queueing():
+    """Sınıflandırıcılar öne geçer, aynı öncelikte istemciler sırayla hizmet alır"""
+    scheduler = OpenAIScheduler(max_concurrency=1, rpm=0, tpm=0)
+    order = []
+    blocker = asyncio.create_task(_hold(scheduler, order, "blocker", hold=0.05))
+    await asyncio.sleep(0)
+
+    tasks = [asyncio.create_task(_hold(scheduler, order, name, client))
+             for name, client in [("a1", "A"), ("a2", "A"), ("a3", "A"), ("b1", "B")]]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(_hold(scheduler, order, "classifier", "C", PRIORITY_CLASSIFIER)))
+    await asyncio.sleep(0)
+    assert scheduler.queue_depth == 5
+
+    await asyncio.gather(blocker, *tasks)
+    assert order == ["blocker", "classifier", "a1", "b1", "a2", "a3"]
+
+@pytest.mark.asyncio
+async def test_request_budget_delays_calls():
+    """RPM bütçesi dolunca çağrı pencere boşalana kadar bekler"""
+    scheduler = OpenAIScheduler(max_concurrency=10, rpm=2, tpm=0)
+    with patch.object(openai_scheduler._Budget, "WINDOW", 0.1):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(3):
+            async with scheduler.slot("gpt-4o-mini", 10, PRIORITY_CLASSIFIER):
+                pass
+        assert loop.time() - start >= 0.09
+
+@pytest.mark.asyncio
+async def test_queue_timeout_raises():
+    """Kuyrukta süre aşımında hata verilir ve yer sızdırılmaz"""
+    scheduler = OpenAIScheduler(max_concurrency=1, rpm=0, tpm=0, queue_timeout=0.02)
+    order = []
+    blocker = asyncio.create_task(_hold(scheduler, order, "blocker", hold=0.1))
+    await asyncio.sleep(0)
+    with pytest.raises(OpenAIQueueTimeout):
+        async with scheduler.slot("gpt-4o", 10):
+            pass
+    await blocker
+    assert scheduler.active == 0
+    assert scheduler.summary()["timeouts"] == 1
+
+def test_estimate_tokens_includes_output_budget():
+    """Tahmin girdi uzunluğu ve max_tokens'ı içerir"""
+    request = {"messages": [{"role": "user", "content": "x" * 400}], "max_tokens": 200}
+    assert estimate_tokens(request) == 301
+
+class _FlakyCompletions:
+    """İlk çağrıda zaman aşımı veren sahte chat.completions"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **request):
+        self.calls += 1
+        if self.calls == 1:
+            raise httpx.ReadTimeout("zaman aşımı")
+        return SimpleNamespace(usage=None)
+
+@pytest.mark.asyncio
+async def test_long_completions_are_not_retried_while_holding_a_slot():
+    """Uzun zaman aşımlı yanıt çağrısı tekrar denenmez; kısa sınıflandırıcı çağrısı denenir"""
+    with patch.object(openai_scheduler, "scheduler", OpenAIScheduler(rpm=0, tpm=0)), \
+         patch("resilience._breakers", {}), patch("resilience.backoff_delay", lambda attempt: 0):
+        completions = _FlakyCompletions()
+        client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        with pytest.raises(httpx.ReadTimeout):
+            await openai_scheduler.chat_completion(client, model="gpt-4o", messages=[], timeout=120)
+        assert completions.calls == 1
+        assert openai_scheduler.scheduler.active == 0
+
+        completions = _FlakyCompletions()
+        client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        await openai_scheduler.chat_completion(client, PRIORITY_CLASSIFIER, model="gpt-4o-mini", messages=[], timeout=10)
+        assert completions.calls == 2
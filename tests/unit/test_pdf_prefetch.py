@@ -0,0 +1,136 @@
+# tests/unit/test_pdf_prefetch.py
+import sys
+import os
+import asyncio
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import single_flight
+from pdf_prefetch import PdfPrefetcher
+
+class FakeStorage:
+    def __init__(self, delay=0.01):
+        self.files = set()
+        self.builds = []
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+
+    async def build(self, property_id):
+        self.builds.append(property_id)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        if property_id == "HATA":
+            raise RuntimeError("scrape hatası")
+        self.files.add(property_id)
+        return b"%PDF"
+
+    def exists(self, property_id):
+        return property_id in self.files
+
+async def _drain(prefetcher):
+    await prefetcher._queue.join()
+    await prefetcher.stop()
+
+@pytest.mark.asyncio
+async def test_top_listings_are_built_with_bounded_concurrency():
+    """İlk N ilan kuyruğa alınır ve en fazla `workers` kadar eş zamanlı üretilir"""
+    storage = FakeStorage()
+    prefetcher = PdfPrefetcher(storage.build, storage.exists, enabled=True, id_field="portfoy_no", workers=2)
+    listings = [{"portfoy_no": f"P{i}"} for i in range(5)]
+
+    assert prefetcher.enqueue_listings(listings, limit=4) == ["P0", "P1", "P2", "P3"]
+    await _drain(prefetcher)
+    assert sorted(storage.builds) == ["P0", "P1", "P2", "P3"]
+    assert storage.peak == 2
+    assert prefetcher.stats["built"] == 4
+
+@pytest.mark.asyncio
+async def test_duplicates_and_stored_pdfs_are_skipped():
+    storage = FakeStorage()
+    storage.files.add("VAR")
+    prefetcher = PdfPrefetcher(storage.build, storage.exists, enabled=True, id_field="portfoy_no", workers=1)
+
+    assert prefetcher.enqueue_listings([{"portfoy_no": "A"}, {"portfoy_no": "A"}, {"portfoy_no": "VAR"},
+                                        {"portfoy_no": "../etc"}, {"baslik": "id yok"}, {"portfoy_no": ""}], limit=6) == ["A"]
+    await _drain(prefetcher)
+    assert storage.builds == ["A"]
+    assert prefetcher.stats["deduplicated"] == 1
+    assert prefetcher.stats["already_stored"] == 1
+    assert prefetcher.stats["missing_id"] == 2  # portföy numarası olmayan satırlar atlanır
+
+@pytest.mark.asyncio
+async def test_click_during_prefetch_shares_the_same_build():
+    """Ön üretim sürerken gelen tıklama aynı üretimi bekler"""
+    storage = FakeStorage(delay=0.05)
+    prefetcher = PdfPrefetcher(storage.build, storage.exists, enabled=True, id_field="portfoy_no", workers=1)
+    prefetcher.enqueue("TIK")
+    await asyncio.sleep(0.01)
+    assert await single_flight.group("property_pdf").do("TIK", lambda: storage.build("TIK")) == b"%PDF"
+    await _drain(prefetcher)
+    assert storage.builds == ["TIK"]
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_and_cancelled_jobs_do_not_run():
+    storage = FakeStorage(delay=0.02)
+    prefetcher = PdfPrefetcher(storage.build, storage.exists, enabled=True, id_field="portfoy_no", workers=1, queue_size=2)
+    assert prefetcher.enqueue("A") and prefetcher.enqueue("B")
+    assert not prefetcher.enqueue("C")  # kuyruk dolu, sohbet beklemez
+    prefetcher.cancel(["B"])
+    await _drain(prefetcher)
+    assert storage.builds == ["A"]
+    assert prefetcher.stats["dropped"] == 1
+    assert prefetcher.stats["cancelled"] == 1
+
+@pytest.mark.asyncio
+async def test_new_turn_cancels_previous_listing_set():
+    """Aynı istemcinin yeni sohbet turu, önceki listeden başlamamış işleri iptal eder"""
+    storage = FakeStorage(delay=0.02)
+    prefetcher = PdfPrefetcher(storage.build, storage.exists, enabled=True, id_field="portfoy_no", workers=1)
+    assert prefetcher.enqueue_listings([{"portfoy_no": "A"}, {"portfoy_no": "B"}, {"portfoy_no": "C"}], owner="1.2.3.4") == ["A", "B", "C"]
+    prefetcher.enqueue_listings([{"portfoy_no": "X"}], owner="5.6.7.8")  # başka istemci etkilenmez
+    await asyncio.sleep(0.005)  # A çalışıyor
+    assert prefetcher.enqueue_listings([{"portfoy_no": "C"}, {"portfoy_no": "D"}], owner="1.2.3.4") == ["D"]
+    await _drain(prefetcher)
+    assert storage.builds == ["A", "C", "X", "D"]
+    assert prefetcher.stats["cancelled"] == 1  # B
+
+@pytest.mark.asyncio
+async def test_stale_jobs_expire_and_failures_are_counted():
+    now = [0.0]
+    storage = FakeStorage()
+    prefetcher = PdfPrefetcher(storage.build, storage.exists, enabled=True, id_field="portfoy_no", workers=1,
+                               max_wait=10, clock=lambda: now[0])
+    prefetcher.enqueue("HATA")
+    await prefetcher._queue.join()
+    prefetcher.enqueue("ESKI")
+    now[0] = 60
+    await _drain(prefetcher)
+    assert storage.builds == ["HATA"]
+    assert prefetcher.stats["failed"] == 1
+    assert prefetcher.stats["expired"] == 1
+
+@pytest.mark.asyncio
+async def test_stop_cancels_running_workers():
+    storage = FakeStorage(delay=10)
+    prefetcher = PdfPrefetcher(storage.build, storage.exists, enabled=True, id_field="portfoy_no", workers=1)
+    prefetcher.enqueue("UZUN")
+    await asyncio.sleep(0.01)
+    await asyncio.wait_for(prefetcher.stop(), timeout=1)
+    assert prefetcher.summary()["workers"] == 0
+
+def test_prefetch_needs_portfolio_column():
+    """Portföy numarası sütunu tanımlanmadan (varsayılan) ön üretim açılmaz"""
+    storage = FakeStorage()
+    prefetcher = PdfPrefetcher(storage.build, storage.exists, enabled=True, id_field="")
+    assert prefetcher.enabled is False
+    assert prefetcher.enqueue_listings([{"id": 42, "portfoy_no": "A"}]) == []
+
+def test_disabled_prefetcher_ignores_listings():
+    storage = FakeStorage()
+    prefetcher = PdfPrefetcher(storage.build, storage.exists, enabled=False)
+    assert prefetcher.enqueue_listings([{"portfoy_no": "A"}]) == []
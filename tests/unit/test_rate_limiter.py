@@ -0,0 +1,84 @@
+# tests/unit/test_rate_limiter.py
+import sys
+import os
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from rate_limiter import InMemoryTokenBucket, RateLimiter, RedisSlidingWindowLimiter, parse_route_limits
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_and_refills(clock):
+    """Limit dolunca istek reddedilir, jetonlar zamanla yenilenir"""
+    bucket = InMemoryTokenBucket(clock=clock)
+    results = [await bucket.hit("ip", 3, 60) for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert results[-1].retry_after == pytest.approx(20.0)
+
+    clock.now += 20
+    assert (await bucket.hit("ip", 3, 60)).allowed
+    assert (await bucket.hit("other-ip", 3, 60)).allowed  # anahtarlar birbirinden bağımsız
+
+@pytest.mark.asyncio
+async def test_time_wheel_expires_idle_keys(clock):
+    """Kovası dolan anahtarlar tarama yapılmadan zaman çarkından silinir"""
+    bucket = InMemoryTokenBucket(clock=clock, wheel_size=120)
+    for i in range(50):
+        await bucket.hit(f"ip-{i}", 10, 60)
+    assert len(bucket) == 50
+
+    clock.now += 7  # 1 jeton 6 saniyede yenilenir
+    await bucket.hit("new-ip", 10, 60)
+    assert len(bucket) == 1
+
+    clock.now += 10_000  # çarkın tam turundan uzun boşluk
+    await bucket.hit("late-ip", 10, 60)
+    assert len(bucket) == 1
+
+@pytest.mark.asyncio
+async def test_route_matching_uses_longest_prefix(clock):
+    """Limitler route önekine göre seçilir, limitsiz yollar serbesttir"""
+    limits = parse_route_limits("/chat=2/60,/chat/stream=1/60,/image=5/60,bozuk")
+    limiter = RateLimiter(InMemoryTokenBucket(clock=clock), limits)
+
+    assert limiter.match_route("/chat").limit == 2
+    assert limiter.match_route("/chat/stream").limit == 1
+    assert limiter.match_route("/chatbot") is None
+    assert await limiter.check("/health", "1.1.1.1") is None
+
+    assert (await limiter.check("/chat/stream", "1.1.1.1")).allowed
+    assert not (await limiter.check("/chat/stream", "1.1.1.1")).allowed
+    assert (await limiter.check("/chat", "1.1.1.1")).allowed  # route'lar ayrı sayılır
+
+@pytest.mark.asyncio
+async def test_redis_limiter_falls_back_to_memory_on_error():
+    """Redis hatasında istek worker içi limitle değerlendirilir"""
+    class BrokenRedis:
+        def register_script(self, script):
+            async def run(keys, args):
+                raise ConnectionError("redis kapalı")
+            return run
+
+    limiter = RedisSlidingWindowLimiter(client=BrokenRedis())
+    assert [(await limiter.hit("ip", 1, 60)).allowed for _ in range(2)] == [True, False]
+
+@pytest.mark.asyncio
+async def test_redis_sliding_window_shared_between_instances():
+    """İki ayrı limiter (iki worker) aynı Redis penceresini paylaşır"""
+    redis_asyncio = pytest.importorskip("redis.asyncio")
+    client = redis_asyncio.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    try:
+        await client.ping()
+    except Exception:
+        pytest.skip("Redis sunucusu yok")
+
+    prefix = f"test-ratelimit-{os.getpid()}"
+    first = RedisSlidingWindowLimiter(client=client, prefix=prefix)
+    second = RedisSlidingWindowLimiter(client=client, prefix=prefix)
+    assert (await first.hit("ip", 2, 60)).allowed
+    assert (await second.hit("ip", 2, 60)).allowed
+    blocked = await first.hit("ip", 2, 60)
+    assert not blocked.allowed and blocked.retry_after > 0
+    await client.delete(f"{prefix}:ip")
+    await client.close()
@@ -0,0 +1,82 @@
+# tests/unit/test_render_pool.py
+import sys
+import os
+import time
+import asyncio
+import threading
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pdf_handler
+from render_pool import RenderPool, RenderPoolSaturated
+
+PROPERTY = {"title": "Moda'da 2+1 Daire", "portfoy_no": "P123", "price": "4.500.000",
+            "specs": {"Oda Sayısı": "2+1", "Isıtma": "Kombi"}, "description": "Denize yakın.\nMetroya 5 dk."}
+
+def _blocking(event: threading.Event) -> str:
+    event.wait(5)
+    return "bitti"
+
+@pytest.mark.asyncio
+async def test_work_runs_off_the_event_loop():
+    """Havuzdaki iş sürerken olay döngüsü başka işleri çalıştırmaya devam eder"""
+    pool = RenderPool("thread", workers=1, queue_size=0)
+    release = threading.Event()
+    job = asyncio.ensure_future(pool.run(_blocking, release))
+    await asyncio.sleep(0.01)
+    assert not job.done()  # döngü bloklanmadı
+    release.set()
+    assert await job == "bitti"
+    pool.shutdown()
+
+@pytest.mark.asyncio
+async def test_saturated_pool_rejects_and_recovers():
+    pool = RenderPool("thread", workers=1, queue_size=1)
+    release = threading.Event()
+    jobs = [asyncio.ensure_future(pool.run(_blocking, release)) for _ in range(2)]
+    await asyncio.sleep(0)
+    with pytest.raises(RenderPoolSaturated):
+        await pool.run(_blocking, release)
+    release.set()
+    assert await asyncio.gather(*jobs) == ["bitti", "bitti"]
+    await asyncio.sleep(0.01)
+    assert pool.summary()["inflight"] == 0
+    assert pool.stats["rejected"] == 1
+    assert await pool.run(time.time) > 0
+    pool.shutdown()
+
+@pytest.mark.asyncio
+async def test_process_pool_renders_pdf():
+    pool = RenderPool("process", workers=1, queue_size=0)
+    try:
+        pdf = await pool.run(pdf_handler.render_compact_pdf, PROPERTY, {}, datetime(2024, 1, 1))
+    finally:
+        pool.shutdown()
+    assert pdf.startswith(b"%PDF")
+
+def test_render_is_synchronous_and_needs_no_assets():
+    """Render fonksiyonu ağ/disk kullanmaz; görsel verilmezse başlık görselsiz çizilir"""
+    assert pdf_handler.render_compact_pdf(PROPERTY, {}, datetime(2024, 1, 1)).startswith(b"%PDF")
+
+@pytest.mark.asyncio
+async def test_build_returns_503_when_render_pool_is_saturated(tmp_path):
+    pool = RenderPool("thread", workers=1, queue_size=0)
+    release = threading.Event()
+    busy = asyncio.ensure_future(pool.run(_blocking, release))
+    await asyncio.sleep(0)
+    with patch.object(pdf_handler, "pdf_render_pool", pool), \
+         patch.object(pdf_handler, "PDF_STORAGE_DIR", tmp_path), \
+         patch.object(pdf_handler, "scrape_property_with_firecrawl", AsyncMock(return_value={"data": {"markdown": ""}})), \
+         patch.object(pdf_handler.branding_assets, "snapshot", AsyncMock(return_value={})):
+        with pytest.raises(HTTPException) as excinfo:
+            await pdf_handler.build_property_pdf("P123")
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers["Retry-After"] == "5"
+    release.set()
+    await busy
+    pool.shutdown()
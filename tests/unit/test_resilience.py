@@ -0,0 +1,110 @@
+# tests/unit/test_resilience.py
+import sys
+import os
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError
+
+@pytest.fixture(autouse=True)
+def _isolated_breakers():
+    with patch.dict(resilience._breakers, clear=True), \
+         patch.object(resilience, "backoff_delay", return_value=0.0):
+        yield
+
+def _response(status):
+    return httpx.Response(status, request=httpx.Request("GET", "https://upstream.test"))
+
+@pytest.mark.asyncio
+async def test_retries_transient_errors_until_success():
+    """Geçici hatalar tekrar denenir, başarılı yanıt döner"""
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            return resilience.check_status(_response(503))
+        return "ok"
+
+    assert await resilience.call("test-upstream", flaky) == "ok"
+    assert len(calls) == 3
+    assert resilience.get_breaker("test-upstream").failures == 0
+
+@pytest.mark.asyncio
+async def test_non_retryable_and_non_idempotent_calls_fail_fast():
+    """4xx hatası ve idempotent olmayan çağrı tekrar denenmez"""
+    calls = []
+
+    async def bad_request():
+        calls.append(1)
+        raise httpx.HTTPStatusError("400", request=_response(400).request, response=_response(400))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await resilience.call("test-upstream", bad_request)
+
+    async def timeout():
+        calls.append(1)
+        raise httpx.ReadTimeout("yavaş")
+
+    with pytest.raises(httpx.ReadTimeout):
+        await resilience.call("test-upstream", timeout, idempotent=False)
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_breaker_opens_and_recovers_after_reset_timeout():
+    """Ardışık hatalarda devre açılır, reset süresi sonunda tek deneme ile kapanır"""
+    now = [100.0]
+    breaker = CircuitBreaker("test-upstream", failure_threshold=2, reset_timeout=30, clock=lambda: now[0])
+    resilience._breakers["test-upstream"] = breaker
+
+    async def down():
+        raise httpx.ConnectError("bağlantı yok")
+
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectError):
+            await resilience.call("test-upstream", down, attempts=1)
+    assert breaker.state == "open" and resilience.is_open("test-upstream")
+
+    async def up():
+        return "ok"
+
+    with pytest.raises(CircuitOpenError):
+        await resilience.call("test-upstream", up)
+
+    now[0] += 31
+    assert breaker.state == "half-open"
+    assert await resilience.call("test-upstream", up) == "ok"
+    assert breaker.state == "closed"
+
+@pytest.mark.asyncio
+async def test_hedged_request_returns_faster_attempt():
+    """İlk istek gecikirse ikinci istek başlatılır ve ilk biten sonuç kullanılır"""
+    started = []
+
+    async def slow_then_fast():
+        started.append(1)
+        await asyncio.sleep(1 if len(started) == 1 else 0.01)
+        return len(started)
+
+    result = await asyncio.wait_for(resilience.call("test-upstream", slow_then_fast, hedge_after=0.02), timeout=0.5)
+    assert result == 2
+    assert len(started) == 2
+
+@pytest.mark.asyncio
+async def test_listing_search_skipped_while_supabase_circuit_open():
+    """Supabase devresi açıkken ilan araması degrade modda atlanır"""
+    import ask_handler
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("arama yapılmamalı")
+
+    with patch.object(ask_handler.listing_index, "_snapshot", None), \
+         patch.object(ask_handler.resilience, "is_open", return_value=True), \
+         patch.object(ask_handler, "get_embedding", fail):
+        assert await ask_handler.hybrid_search_listings("Kadıköy'de daire") == []
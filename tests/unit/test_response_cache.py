@@ -0,0 +1,43 @@
+# tests/unit/test_response_cache.py
+import sys
+import os
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from response_cache import ResponseCache
+
+def test_similar_question_hits_above_threshold():
+    """Eşik üzerindeki benzer soru önceki yanıtı döndürür"""
+    cache = ResponseCache(enabled=True, threshold=0.95)
+    cache.store("real-estate", [1.0, 0.0, 0.0], {"reply": "Tapu masrafı...", "is_listing_response": False})
+
+    assert cache.lookup("real-estate", [0.99, 0.05, 0.0])["reply"] == "Tapu masrafı..."
+    assert cache.lookup("real-estate", [0.0, 1.0, 0.0]) is None
+    assert cache.lookup("finance", [1.0, 0.0, 0.0]) is None  # modlar ayrı tutulur
+
+def test_listing_responses_excluded_by_default():
+    """İlan yanıtları listing_ttl=0 iken saklanmaz"""
+    cache = ResponseCache(enabled=True, listing_ttl=0)
+    cache.store("real-estate", [1.0, 0.0], {"reply": "İlanlar", "is_listing_response": True})
+    assert cache.lookup("real-estate", [1.0, 0.0]) is None
+
+def test_entries_expire_after_ttl():
+    """TTL dolan kayıt döndürülmez"""
+    cache = ResponseCache(enabled=True, ttl=10)
+    with patch("response_cache.time.time", return_value=1000.0):
+        cache.store("finance", [0.0, 1.0], {"reply": "Enflasyon...", "is_listing_response": False})
+    with patch("response_cache.time.time", return_value=1011.0):
+        assert cache.lookup("finance", [0.0, 1.0]) is None
+
+def test_least_recently_used_evicted_when_full():
+    """Kapasite dolunca en az kullanılan kayıt atılır"""
+    cache = ResponseCache(enabled=True, max_items=2)
+    cache.store("finance", [1.0, 0.0, 0.0], {"reply": "a"})
+    cache.store("finance", [0.0, 1.0, 0.0], {"reply": "b"})
+    assert cache.lookup("finance", [1.0, 0.0, 0.0])["reply"] == "a"  # "a" yeniden kullanıldı
+
+    cache.store("finance", [0.0, 0.0, 1.0], {"reply": "c"})
+    assert cache.lookup("finance", [0.0, 1.0, 0.0]) is None
+    assert cache.lookup("finance", [1.0, 0.0, 0.0])["reply"] == "a"
+    assert cache.lookup("finance", [0.0, 0.0, 1.0])["reply"] == "c"
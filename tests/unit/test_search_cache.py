@@ -0,0 +1,64 @@
+# tests/unit/test_search_cache.py
+import sys
+import os
+import asyncio
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from search_cache import SearchResultCache, classify_query
+
+def test_query_classes():
+    """Kur/hava gibi değişken sorgular kısa, tanım soruları uzun TTL sınıfına düşer"""
+    assert classify_query("Dolar kuru ne kadar?") == "volatile"
+    assert classify_query("bugün İstanbul hava durumu") == "volatile"
+    assert classify_query("son dakika deprem haberleri") == "news"
+    assert classify_query("Enflasyon nedir") == "evergreen"
+    assert classify_query("kurs fiyatları") == "default"
+
+@pytest.mark.asyncio
+async def test_ttl_depends_on_query_class(clock):
+    """Değişken sorgu kısa sürede, tanım sorusu daha geç yenilenir"""
+    cache = SearchResultCache(enabled=True, ttls={"volatile": 60, "news": 600, "default": 3600, "evergreen": 86400}, timer=clock)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return [{"title": f"sonuç {len(calls)}"}]
+
+    await cache.get_or_fetch("Dolar kuru", 5, fetch)
+    await cache.get_or_fetch("  dolar   KURU ", 5, fetch)  # normalize anahtar
+    await cache.get_or_fetch("Enflasyon nedir", 5, fetch)
+    assert len(calls) == 2
+
+    clock.now = 120
+    await cache.get_or_fetch("Dolar kuru", 5, fetch)
+    await cache.get_or_fetch("Enflasyon nedir", 5, fetch)
+    assert len(calls) == 3
+    await cache.get_or_fetch("Enflasyon nedir", 7, fetch)  # farklı num ayrı anahtar
+    assert len(calls) == 4
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_queries_coalesced():
+    """Aynı anda gelen aynı sorgular tek upstream çağrısı yapar, boş sonuç saklanmaz"""
+    cache = SearchResultCache(enabled=True)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return [{"title": "kur"}]
+
+    results = await asyncio.gather(*(cache.get_or_fetch("dolar kuru", 5, fetch) for _ in range(5)))
+    assert len(calls) == 1
+    assert all(r == [{"title": "kur"}] for r in results)
+    assert cache.summary()["coalesced"] == 4
+
+    async def empty():
+        calls.append(1)
+        return []
+
+    await cache.get_or_fetch("sonuçsuz sorgu", 5, empty)
+    await cache.get_or_fetch("sonuçsuz sorgu", 5, empty)
+    assert len(calls) == 3
@@ -26,3 +26,37 @@ def test_functions_exist():
     assert hasattr(search_handler, 'search_google')
     assert hasattr(search_handler, 'web_search_answer')
     assert callable(search_handler.search_google)
+
+@pytest.mark.asyncio
+async def test_stream_web_search_emits_sources_before_deltas():
+    """Kaynaklar model yanıtından önce gönderilir"""
+    from unittest.mock import MagicMock
+
+    def chunk(text):
+        c = MagicMock()
+        c.choices = [MagicMock()]
+        c.choices[0].delta.content = text
+        return c
+
+    async def fake_stream():
+        for text in ["1 USD ", "32,48 TL."]:
+            yield chunk(text)
+
+    results = [{"title": "Döviz", "link": "https://example.com", "snippet": "USD/TRY"}]
+    with patch.object(search_handler, "search_google", AsyncMock(return_value=results)), \
+         patch.object(search_handler, "openai_client") as mock_openai:
+        mock_openai.chat.completions.create = AsyncMock(return_value=fake_stream())
+        events = [e async for e in search_handler.stream_web_search_answer("dolar kuru", "finance")]
+
+    assert [e["event"] for e in events] == ["sources", "delta", "delta", "done"]
+    assert events[0]["data"]["results"] == [{"title": "Döviz", "link": "https://example.com"}]
+    assert events[-1]["data"]["reply"] == "1 USD 32,48 TL."
+
+@pytest.mark.asyncio
+async def test_stream_web_search_without_results():
+    """Sonuç yoksa tek bir açıklama mesajı ve done gönderilir"""
+    with patch.object(search_handler, "search_google", AsyncMock(return_value=[])):
+        events = [e async for e in search_handler.stream_web_search_answer("xyz")]
+
+    assert [e["event"] for e in events] == ["delta", "done"]
+    assert events[-1]["data"]["reply"] == search_handler.NO_RESULTS_REPLY
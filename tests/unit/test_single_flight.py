@@ -0,0 +1,97 @@
+# tests/unit/test_single_flight.py
+import sys
+import os
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from single_flight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_execution():
+    """Aynı anahtarla eş zamanlı çağrılar tek bir işi bekler"""
+    flight = SingleFlight("test")
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return "sonuç"
+
+    results = await asyncio.gather(*(flight.do("k", work) for _ in range(4)), flight.do("other", work))
+    assert results == ["sonuç"] * 5
+    assert len(runs) == 2
+    assert flight.stats == {"calls": 5, "executions": 2, "coalesced": 3}
+    assert len(flight) == 0
+
+    await flight.do("k", work)  # iş bittikten sonra yeni çağrı yeniden çalışır
+    assert len(runs) == 3
+
+@pytest.mark.asyncio
+async def test_errors_propagate_and_cancellation_is_isolated():
+    """Hata tüm bekleyenlere iletilir, bir bekleyenin iptali diğerini etkilemez"""
+    flight = SingleFlight("test")
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream hatası")
+
+    results = await asyncio.gather(flight.do("k", failing), flight.do("k", failing), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return 42
+
+    first = asyncio.create_task(flight.do("s", slow))
+    second = asyncio.create_task(flight.do("s", slow))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == 42
+
+@pytest.mark.asyncio
+async def test_work_is_cancelled_when_last_waiter_is_cancelled():
+    """Bekleyen kalmayınca paylaşılan iş iptal edilir; sonraki çağrı işi yeniden başlatır"""
+    flight = SingleFlight("test")
+    started, finished = [], []
+
+    async def slow():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        finished.append(1)
+        return 42
+
+    waiters = [asyncio.create_task(flight.do("k", slow)) for _ in range(2)]
+    await asyncio.sleep(0)
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    assert len(flight) == 0
+
+    assert await flight.do("k", slow) == 42
+    assert len(started) == 2 and len(finished) == 1
+
+@pytest.mark.asyncio
+async def test_get_embedding_coalesces_identical_requests():
+    """Aynı metin için eş zamanlı embedding istekleri tek API çağrısı yapar"""
+    import ask_handler
+
+    calls = []
+
+    async def fake_create(text):
+        calls.append(text)
+        await asyncio.sleep(0.01)
+        return [0.1, 0.2]
+
+    async def miss(*args):
+        return None
+
+    with patch.object(ask_handler.embedding_cache, "get", miss), \
+         patch.object(ask_handler, "_create_embedding", fake_create):
+        results = await asyncio.gather(ask_handler.get_embedding("Kadıköy daire"),
+                                       ask_handler.get_embedding("  kadıköy   DAİRE"))
+    assert results == [[0.1, 0.2], [0.1, 0.2]]
+    assert len(calls) == 1
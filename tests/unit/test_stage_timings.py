@@ -0,0 +1,18 @@
+# tests/unit/test_stage_timings.py
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import stage_timings
+
+def test_timing_summary_percentiles():
+    """p50/p95 değerleri milisaniye cinsinden hesaplanır"""
+    stage_timings.reset_timings()
+    for ms in range(1, 101):
+        stage_timings.record_stage("embedding", ms / 1000)
+
+    summary = stage_timings.timing_summary()["embedding"]
+    assert summary["count"] == 100
+    assert 49 <= summary["p50_ms"] <= 52
+    assert 94 <= summary["p95_ms"] <= 96
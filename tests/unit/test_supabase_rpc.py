@@ -0,0 +1,78 @@
+# tests/unit/test_supabase_rpc.py
+import asyncio
+import json
+import pytest
+import sys
+import os
+from unittest.mock import patch
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import supabase_rpc
+from supabase_rpc import AsyncPostgrestClient, SupabaseRPCError
+
+def _stand_in(handler):
+    """PostgREST yerine geçen sahte sunucu (httpx MockTransport)"""
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client, (lambda: client)
+
+@pytest.mark.asyncio
+async def test_rpc_posts_params_with_auth_headers():
+    """RPC çağrısı doğru uca, anahtar başlıklarıyla gider"""
+    def handler(request):
+        assert request.url.path == "/rest/v1/rpc/search_listings_hybrid"
+        assert request.headers["apikey"] == "anon"
+        assert json.loads(request.content) == {"match_count": 3}
+        return httpx.Response(200, json=[{"baslik": "3+1 Daire"}])
+
+    client, factory = _stand_in(handler)
+    rpc = AsyncPostgrestClient("http://stand-in/rest/v1", "anon", client_factory=factory)
+    assert await rpc.rpc("search_listings_hybrid", {"match_count": 3}) == [{"baslik": "3+1 Daire"}]
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_rpc_raises_on_error_status():
+    """PostgREST hata kodu SupabaseRPCError olarak yükselir"""
+    client, factory = _stand_in(lambda request: httpx.Response(400, json={"message": "bad"}))
+    rpc = AsyncPostgrestClient("http://stand-in", "anon", client_factory=factory)
+    with pytest.raises(SupabaseRPCError) as exc_info:
+        await rpc.rpc("search_listings_hybrid", {})
+    assert exc_info.value.status_code == 400
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_rpc_concurrency_is_bounded():
+    """Eşzamanlı istek sayısı max_concurrency ile sınırlanır"""
+    active = 0
+    peak = 0
+
+    class SlowTransport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return httpx.Response(200, json=[])
+
+    client = httpx.AsyncClient(transport=SlowTransport())
+    rpc = AsyncPostgrestClient("http://stand-in", "anon", client_factory=lambda: client, max_concurrency=2)
+    await asyncio.gather(*(rpc.rpc("search_listings_hybrid", {}) for _ in range(6)))
+    assert peak == 2
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_hybrid_search_uses_async_rpc():
+    """hybrid_search_listings async RPC istemcisini kullanır"""
+    import ask_handler
+
+    client, factory = _stand_in(lambda request: httpx.Response(200, json=[{"baslik": "Moda 2+1"}]))
+    stand_in = AsyncPostgrestClient("http://stand-in", "anon", client_factory=factory)
+    with patch.object(ask_handler, "SUPABASE_ASYNC_RPC", True), \
+         patch.object(supabase_rpc, "rpc_client", stand_in):
+        listings = await ask_handler.hybrid_search_listings("Moda 2+1", filters={}, query_embedding=[0.1, 0.2])
+
+    assert listings == [{"baslik": "Moda 2+1"}]
+    await client.aclose()
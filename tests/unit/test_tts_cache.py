@@ -0,0 +1,79 @@
+# tests/unit/test_tts_cache.py
+import sys
+import os
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from tts_cache import TTSCache, audio_key, split_sentences
+
+SETTINGS = {"stability": 0.75, "similarity_boost": 0.85}
+
+def test_split_sentences():
+    """Metin cümle sonlarından ve satır sonlarından bölünür"""
+    text = "Merhaba!  Size nasıl yardımcı olabilirim?\nKadıköy'de 3 ilan buldum... İlki 2+1 daire."
+    assert split_sentences(text) == [
+        "Merhaba!",
+        "Size nasıl yardımcı olabilirim?",
+        "Kadıköy'de 3 ilan buldum...",
+        "İlki 2+1 daire.",
+    ]
+    assert split_sentences("  ") == []
+
+def test_long_sentence_is_split_on_commas():
+    sentence = "Bu daire, deniz manzaralı, geniş balkonlu, yeni yapılmış bir binada yer alıyor"
+    chunks = split_sentences(sentence, max_chars=30)
+    assert all(len(chunk) <= 30 for chunk in chunks)
+    assert " ".join(chunks) == sentence
+
+def test_audio_key_covers_text_voice_model_and_settings():
+    key = audio_key("Merhaba!", "voice", "model", SETTINGS)
+    assert key == audio_key(" Merhaba! ", "voice", "model", {"similarity_boost": 0.85, "stability": 0.75})
+    assert key != audio_key("Merhaba!", "other-voice", "model", SETTINGS)
+    assert key != audio_key("Merhaba!", "voice", "other-model", SETTINGS)
+    assert key != audio_key("Merhaba!", "voice", "model", {**SETTINGS, "stability": 0.5})
+    assert key != audio_key("merhaba!", "voice", "model", SETTINGS)
+
+@pytest.mark.asyncio
+async def test_disk_is_opened_on_first_use(tmp_path):
+    """Önbellek nesnesi oluşturulurken dizin açılmaz/oluşturulmaz; ilk yazımda açılır"""
+    directory = tmp_path / "tts"
+    cache = TTSCache(enabled=True, directory=str(directory))
+    assert not directory.exists()
+    assert cache.summary()["disk_bytes"] is None
+    await cache.set("tts:a", b"mp3-a")
+    assert directory.exists()
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_restart(tmp_path):
+    cache = TTSCache(enabled=True, directory=str(tmp_path))
+    await cache.set("tts:a", b"mp3-a")
+    assert await cache.get("tts:a") == b"mp3-a"
+
+    restarted = TTSCache(enabled=True, directory=str(tmp_path))
+    assert await restarted.get("tts:a") == b"mp3-a"
+    assert await restarted.get("tts:b") is None
+    assert restarted.summary()["disk_hits"] == 1
+    assert restarted.summary()["misses"] == 1
+
+@pytest.mark.asyncio
+async def test_memory_tier_is_bounded_by_bytes():
+    cache = TTSCache(enabled=True, directory="", memory_bytes=10)
+    await cache.set("tts:a", b"123456")
+    await cache.set("tts:b", b"123456")  # a tahliye edilir
+    await cache.set("tts:big", b"x" * 50)  # bellek katmanından büyük, saklanmaz
+    assert await cache.get("tts:a") is None
+    assert await cache.get("tts:b") == b"123456"
+    assert cache.summary()["memory_bytes"] <= 10
+
+@pytest.mark.asyncio
+async def test_disabled_cache_is_noop():
+    cache = TTSCache(enabled=False, directory="")
+    await cache.set("tts:a", b"mp3")
+    assert await cache.get("tts:a") is None
+
+def test_html_reply_is_split_into_plain_sentences():
+    from text_utils import strip_html
+    html_reply = "<p>3 ilan buldum &amp; listeledim</p><ul style='x'><li><b>Kadıköy</b> 2+1</li><li>Moda 3+1</li></ul>Başka?"
+    assert split_sentences(strip_html(html_reply)) == ["3 ilan buldum & listeledim", "Kadıköy 2+1", "Moda 3+1", "Başka?"]
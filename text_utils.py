@@ -0,0 +1,24 @@
+# text_utils.py - Türkçe metin normalizasyonu (önbellek anahtarları ve kural tabanlı analiz için)
+import re
+import html
+
+_TURKISH_UPPER_MAP = str.maketrans({"İ": "i", "I": "ı"})
+_WHITESPACE_RE = re.compile(r"\s+")
+# Blok etiketleri satır sonuna çevrilir (cümle sınırı olarak kalsın); diğer etiketler silinir
+_BLOCK_TAG_RE = re.compile(r"<\s*(br|/p|/div|/li|/h[1-6]|/tr|li)\b[^>]*>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_STYLE_SCRIPT_RE = re.compile(r"<(style|script)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+
+def turkish_lower(text: str) -> str:
+    """Türkçe kurallarına uygun küçük harfe çevirir (İ -> i, I -> ı)."""
+    return text.translate(_TURKISH_UPPER_MAP).lower()
+
+def normalize_query(text: str) -> str:
+    """Sorguyu önbellek anahtarı için normalize eder: küçük harf, tek boşluk, baş/son boşluk yok."""
+    return _WHITESPACE_RE.sub(" ", turkish_lower(text or "")).strip()
+
+def strip_html(text: str) -> str:
+    """HTML yanıtı düz metne çevirir (seslendirme için): etiketler silinir, entity'ler çözülür."""
+    text = _STYLE_SCRIPT_RE.sub(" ", text or "")
+    text = _BLOCK_TAG_RE.sub("\n", text)
+    return html.unescape(_TAG_RE.sub(" ", text))
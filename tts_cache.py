@@ -0,0 +1,155 @@
+# tts_cache.py - ElevenLabs ses çıktıları için içerik adresli (metin + ses ayarları) önbellek
+import os
+import re
+import asyncio
+import json
+import hashlib
+from typing import Any, Dict, List, Optional
+
+from cachetools import LRUCache
+
+from config import env_flag
+
+# ---- Ayarlar ----
+TTS_CACHE_ENABLED = env_flag("TTS_CACHE_ENABLED", True)
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "./cache/tts")
+# Disk katmanının toplam boyut sınırı; dolduğunda en az kullanılan kayıtlar silinir
+TTS_CACHE_SIZE_LIMIT = int(os.getenv("TTS_CACHE_SIZE_LIMIT", str(512 * 1024 * 1024)))
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+# Tek cümle bu uzunluğu aşarsa virgül/boşluktan bölünür
+TTS_CHUNK_MAX_CHARS = int(os.getenv("TTS_CHUNK_MAX_CHARS", "400"))
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s+|\n+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    parts = []
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(", ", 0, max_chars)
+        cut = cut + 1 if cut > 0 else sentence.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        parts.append(sentence[:cut].strip())
+        sentence = sentence[cut:].strip()
+    if sentence:
+        parts.append(sentence)
+    return parts
+
+def split_sentences(text: str, max_chars: int = TTS_CHUNK_MAX_CHARS) -> List[str]:
+    """Metni cümle sınırlarından parçalar; her parça ayrı seslendirilip ayrı önbelleklenir.
+
+    Böylece kısmen tekrar eden yanıtlarda (aynı selamlama, aynı kapanış cümlesi) ortak
+    cümleler önbellekten gelir.
+    """
+    chunks = []
+    for sentence in _SENTENCE_END_RE.split(text or ""):
+        sentence = _WHITESPACE_RE.sub(" ", sentence).strip()
+        if sentence:
+            chunks.extend(_split_long(sentence, max_chars))
+    return chunks
+
+def audio_key(text: str, voice_id: str, model_id: str, voice_settings: Dict[str, Any]) -> str:
+    """Metin, ses, model ve ses ayarlarının sha256 özeti (ayar sırası anahtarı etkilemez)."""
+    raw = json.dumps({
+        "text": _WHITESPACE_RE.sub(" ", text).strip(),
+        "voice": voice_id,
+        "model": model_id,
+        "settings": voice_settings or {},
+    }, sort_keys=True, ensure_ascii=False)
+    return "tts:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class TTSCache:
+    """MP3 parçalarını saklayan iki katmanlı önbellek.
+
+    1. katman: bayt boyutuyla sınırlı süreç içi LRU. 2. katman: boyut sınırlı diskcache
+    (least-recently-used tahliye). Disk ilk okuma/yazmada açılır (import sırasında dizin
+    oluşturulmaz); açılamazsa sadece bellek kullanılır. diskcache engelleyen SQLite G/Ç
+    yaptığından disk çağrıları olay döngüsü dışında (iş parçacığında) yürütülür.
+    Disk hataları loglanır ve ıska gibi davranılır.
+    """
+
+    def __init__(self, enabled: bool = TTS_CACHE_ENABLED, directory: str = TTS_CACHE_DIR,
+                 size_limit: int = TTS_CACHE_SIZE_LIMIT, memory_bytes: int = TTS_CACHE_MEMORY_BYTES):
+        self.enabled = enabled
+        self.directory = directory
+        self.size_limit = size_limit
+        self._memory: LRUCache = LRUCache(maxsize=memory_bytes, getsizeof=len)
+        self._disk = None
+        self._disk_opened = False
+        self.stats: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stored_bytes": 0}
+
+    async def _open_disk(self):
+        if self._disk_opened:
+            return self._disk
+        return await asyncio.to_thread(self._get_disk)
+
+    def _get_disk(self):
+        if not self._disk_opened:
+            self._disk_opened = True
+            if self.enabled and self.directory:
+                try:
+                    import diskcache
+                    self._disk = diskcache.Cache(self.directory, size_limit=self.size_limit,
+                                                 eviction_policy="least-recently-used")
+                    print(f"✅ TTS disk önbelleği hazır: {self.directory}")
+                except Exception as e:
+                    print(f"⚠️ TTS disk önbelleği açılamadı, sadece bellek kullanılacak: {e}")
+        return self._disk
+
+    def _remember(self, key: str, audio: bytes) -> None:
+        try:
+            self._memory[key] = audio
+        except ValueError:
+            pass  # bellek katmanından büyük parça sadece diskte tutulur
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        audio = self._memory.get(key)
+        if audio is not None:
+            self.stats["memory_hits"] += 1
+            return audio
+        disk = await self._open_disk()
+        if disk is not None:
+            try:
+                audio = await asyncio.to_thread(disk.get, key)
+            except Exception as e:
+                print(f"⚠️ TTS disk önbelleği okuma hatası: {e}")
+                audio = None
+            if audio is not None:
+                self.stats["disk_hits"] += 1
+                self._remember(key, audio)
+                return audio
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, audio: bytes) -> None:
+        if not self.enabled or not audio:
+            return
+        self._remember(key, audio)
+        self.stats["stored_bytes"] += len(audio)
+        disk = await self._open_disk()
+        if disk is not None:
+            try:
+                await asyncio.to_thread(disk.set, key, audio)
+            except Exception as e:
+                print(f"⚠️ TTS disk önbelleği yazma hatası: {e}")
+
+    def summary(self) -> Dict[str, Any]:
+        lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        disk_bytes = None
+        if self._disk is not None:  # istatistik için disk açılmaz
+            try:
+                disk_bytes = self._disk.volume()
+            except Exception:
+                pass
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "memory_bytes": self._memory.currsize,
+            "disk_bytes": disk_bytes,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+tts_cache = TTSCache()